@@ -0,0 +1,50 @@
+"""
+Throughput of Poly.determine() as the number of threads grows.
+
+Every thread hammers determine() on its own Poly objects; all of them
+resolve through the shared process-wide type cache.
+
+    python benchmarks/determine_threads.py
+"""
+import threading
+import time
+
+from shapeless.main import Poly, type_cache
+
+CALLS_PER_THREAD = 200_000
+THREAD_COUNTS = (1, 2, 4, 8, 16, 32)
+VALUES = (1, "a", 1.5, b"x", None, [1], {"a": 1}, (1,))
+
+
+def worker(barrier, calls):
+    polys = [Poly(v) for v in VALUES]
+    barrier.wait()
+    for i in range(calls // len(polys)):
+        for p in polys:
+            p.determine()
+
+
+def run(threads):
+    barrier = threading.Barrier(threads + 1)
+    pool = [threading.Thread(target=worker, args=(barrier, CALLS_PER_THREAD))
+            for _ in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return threads * CALLS_PER_THREAD / elapsed
+
+
+def main():
+    print(f"{'threads':>8} {'calls/s':>14}")
+    for threads in THREAD_COUNTS:
+        type_cache.reset_stats()
+        print(f"{threads:>8} {run(threads):>14,.0f}")
+    print(type_cache.stats())
+
+
+if __name__ == '__main__':
+    main()
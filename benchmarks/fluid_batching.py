@@ -0,0 +1,74 @@
+"""
+Async fluid: the overhead of the async wrapper over a bare coroutine
+function, and a lookup service with a fixed cost per round trip
+(simulated with asyncio.sleep) called once per value, with a
+concurrency limit, versus micro-batched.
+
+    python benchmarks/fluid_batching.py
+"""
+import asyncio
+import time
+
+from shapeless import fluid
+
+CALLS = 20_000
+ROUND_TRIP = 0.001
+LIMIT = 50
+
+
+async def bare(x):
+    return x
+
+
+wrapped = fluid(bare)
+
+
+@fluid(max_concurrency=LIMIT)
+async def lookup_one(key):
+    await asyncio.sleep(ROUND_TRIP)
+    return key.data * 2
+
+
+@fluid(batch_size=256, batch_window=0.001, max_concurrency=LIMIT)
+async def lookup_many(keys):
+    await asyncio.sleep(ROUND_TRIP)
+    return [key.data * 2 for key in keys]
+
+
+def timed(coro):
+    start = time.perf_counter()
+    result = asyncio.run(coro)
+    return time.perf_counter() - start, result
+
+
+async def sequential(func, n):
+    for i in range(n):
+        await func(i)
+
+
+async def concurrent(func, n):
+    return await asyncio.gather(*(func(i) for i in range(n)))
+
+
+def main():
+    n = 200_000
+    base, _ = timed(sequential(bare, n))
+    over, _ = timed(sequential(wrapped, n))
+    print(f'await bare coroutine        {base / n * 1e9:7.0f} ns/call')
+    print(f'await async fluid wrapper   {over / n * 1e9:7.0f} ns/call')
+
+    print(f'{CALLS} concurrent lookups, {ROUND_TRIP * 1e3:.0f} ms per round trip, '
+          f'at most {LIMIT} in flight')
+    for name, func in (('one call per value', lookup_one),
+                       ('micro-batched', lookup_many)):
+        func.metrics.reset()
+        seconds, results = timed(concurrent(func, CALLS))
+        assert results == [i * 2 for i in range(CALLS)]
+        m = func.metrics
+        print(f'  {name:20} {seconds * 1e3:8.1f} ms  {CALLS / seconds:9.0f} calls/s  '
+              f'batches={m.batches} mean batch={m.mean_batch_size:.1f} '
+              f'mean latency={m.mean_latency * 1e3:.2f} ms max={m.max_latency * 1e3:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+fluid(cache=...): a call of an uncached fluid function versus a cache
+hit, for hashable and unhashable arguments, with functools.lru_cache on
+the bare function for reference.
+
+    python benchmarks/fluid_cache.py
+"""
+import functools
+import time
+
+from shapeless import FluidCache, fluid
+
+N = 200_000
+
+
+def score(text, weight=1):
+    # Stands in for a pure function worth caching.
+    return sum(map(ord, str(text))) * weight
+
+
+@fluid
+def plain(text, weight=1):
+    return score(text.data, weight)
+
+
+@fluid(cache=True)
+def cached(text, weight=1):
+    return score(text.data, weight)
+
+
+@fluid(cache=FluidCache(maxsize=1024, ttl=60))
+def cached_ttl(text, weight=1):
+    return score(text.data, weight)
+
+
+lru = functools.lru_cache(maxsize=1024)(score)
+
+
+def best(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    keys = [f'symbol-{i % 100}' for i in range(N)]
+    lists = [[i % 100, 'a'] for i in range(N)]
+    rows = [
+        ('bare score()', lambda: [score(k) for k in keys]),
+        ('fluid, no cache', lambda: [plain(k) for k in keys]),
+        ('fluid(cache=True)', lambda: [cached(k) for k in keys]),
+        ('fluid(cache=FluidCache(ttl))', lambda: [cached_ttl(k) for k in keys]),
+        ('lru_cache(score)', lambda: [lru(k) for k in keys]),
+        ('fluid, no cache, list arg', lambda: [plain(v) for v in lists]),
+        ('fluid(cache=True), list arg', lambda: [cached(v) for v in lists]),
+    ]
+    for name, func in rows:
+        seconds = best(func)
+        print(f'{name:30} {seconds / N * 1e9:7.0f} ns/call')
+    print(cached.cache.stats())
+
+
+if __name__ == '__main__':
+    main()
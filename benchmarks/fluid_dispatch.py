@@ -0,0 +1,47 @@
+"""
+Cost of fluid's multiple dispatch compared with branching on determine()
+inside a single fluid function.
+
+    python benchmarks/fluid_dispatch.py
+"""
+import timeit
+
+from shapeless.main import fluid
+
+
+@fluid
+def branching(a, b):
+    ta, tb = a.determine(), b.determine()
+    if ta is int and tb is int:
+        return 1
+    if ta is float and tb is float:
+        return 2
+    if ta is str and tb is str:
+        return 3
+    if ta is bytes and tb is bytes:
+        return 4
+    return 0
+
+
+@fluid
+def dispatching(a, b):
+    return 0
+
+
+dispatching.register(int, int)(lambda a, b: 1)
+dispatching.register(float, float)(lambda a, b: 2)
+dispatching.register(str, str)(lambda a, b: 3)
+dispatching.register(bytes, bytes)(lambda a, b: 4)
+
+
+def main():
+    number = 500_000
+    for args in ((1, 2), (b"a", b"b"), ([], [])):
+        for fn in (branching, dispatching):
+            best = min(timeit.repeat(lambda: fn(*args), number=number, repeat=3))
+            print(f"{fn.__name__:>12} {type(args[0]).__name__:>6}: "
+                  f"{best / number * 1e9:7.0f} ns/call")
+
+
+if __name__ == '__main__':
+    main()
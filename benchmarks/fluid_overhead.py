@@ -0,0 +1,55 @@
+"""
+Per-call overhead of @fluid compared with the undecorated function and
+with the old generic *args/**kwargs wrapper.
+
+    python benchmarks/fluid_overhead.py
+"""
+import logging
+import timeit
+
+from shapeless.main import Poly, fluid
+
+
+def generic_wrapper(func):
+    # The wrapper fluid used before it generated one per signature.
+    def wrapper(*args, **kwargs):
+        poly_args = [Poly(arg) for arg in args]
+        poly_kwargs = {k: Poly(v) for k, v in kwargs.items()}
+        try:
+            return func(*poly_args, **poly_kwargs)
+        except Exception as e:
+            logging.error(f"Error in function applying the fluid wrapper {func.__name__}: {e}")
+            raise
+    return wrapper
+
+
+def add(a, b, c=0):
+    return c
+
+
+generic = generic_wrapper(add)
+specialized = fluid(add)
+
+CASES = {
+    'undecorated': add,
+    'generic wrapper': generic,
+    'specialized wrapper': specialized,
+}
+
+
+def main():
+    number = 1_000_000
+    baseline = None
+    for label, fn in CASES.items():
+        positional = min(timeit.repeat(lambda: fn(1, 2), number=number, repeat=3))
+        keyword = min(timeit.repeat(lambda: fn(1, b=2, c=3), number=number, repeat=3))
+        if baseline is None:
+            baseline = positional, keyword
+        print(f"{label:>20}: {positional / number * 1e9:7.0f} ns/call positional "
+              f"(+{(positional - baseline[0]) / number * 1e9:.0f}), "
+              f"{keyword / number * 1e9:7.0f} ns/call keyword "
+              f"(+{(keyword - baseline[1]) / number * 1e9:.0f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+asdict()/astuple() with the compiled per-class converters, compared
+with the previous recursive version that deep-copied every leaf.
+
+    python benchmarks/liquid_asdict.py
+"""
+import copy
+import timeit
+from typing import Any
+
+from shapeless.liquid import asdict, astuple, fields, liquid
+
+
+def recursive_asdict(obj, dict_factory=dict):
+    # asdict() as it was before the converters were compiled.
+    if hasattr(type(obj), '__liquid_fields__'):
+        return dict_factory([(f.name, recursive_asdict(getattr(obj, f.name), dict_factory))
+                             for f in fields(obj)])
+    elif isinstance(obj, (list, tuple)):
+        return type(obj)(recursive_asdict(v, dict_factory) for v in obj)
+    elif isinstance(obj, dict):
+        return type(obj)((recursive_asdict(k, dict_factory), recursive_asdict(v, dict_factory))
+                         for k, v in obj.items())
+    return copy.deepcopy(obj)
+
+
+@liquid
+class Point:
+    x: float
+    y: float
+    label: str = ''
+
+
+@liquid
+class Shape:
+    name: str
+    points: list
+    meta: Any = None
+
+
+def main():
+    flat = Point(1.0, 2.0, 'a')
+    nested = Shape('poly', [Point(i, i) for i in range(20)], {'color': 'red'})
+    assert asdict(nested) == recursive_asdict(nested)
+    for label, obj in (('flat', flat), ('nested', nested)):
+        n = 20_000
+        before = timeit.timeit(lambda: recursive_asdict(obj), number=n) / n
+        after = timeit.timeit(lambda: asdict(obj), number=n) / n
+        as_tuple = timeit.timeit(lambda: astuple(obj), number=n) / n
+        print(f"{label:>6}: recursive {before * 1e6:7.2f} us   "
+              f"asdict {after * 1e6:7.2f} us ({before / after:.1f}x)   "
+              f"astuple {as_tuple * 1e6:7.2f} us")
+
+
+if __name__ == '__main__':
+    main()
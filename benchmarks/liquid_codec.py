@@ -0,0 +1,54 @@
+"""
+LiquidCodec versus pickle for one liquid class: payload size and
+encode/decode time, for single records and for a batch, plus reading
+one field of one record through view_many().
+
+    python benchmarks/liquid_codec.py
+"""
+import pickle
+import random
+import timeit
+
+from shapeless.binary import LiquidCodec
+from shapeless.liquid import liquid
+
+N = 100_000
+
+
+@liquid
+class Trade:
+    symbol: str
+    price: float
+    size: int
+    buy: bool
+
+
+def per_call(fn, number):
+    return timeit.timeit(fn, number=number) / number
+
+
+def main():
+    codec = LiquidCodec(Trade)
+    trade = Trade("ACME", 101.25, 300, True)
+    trades = [Trade(f"S{i % 500}", i * 0.25, i, i % 2 == 0) for i in range(N)]
+
+    data, pickled = codec.encode(trade), pickle.dumps(trade)
+    print(f"single record: codec {len(data):4} B  pickle {len(pickled):4} B")
+    print(f"  round trip:  codec {per_call(lambda: codec.decode(codec.encode(trade)), 20_000) * 1e6:6.2f} us"
+          f"  pickle {per_call(lambda: pickle.loads(pickle.dumps(trade)), 20_000) * 1e6:6.2f} us")
+
+    batch, pickled = codec.encode_many(trades), pickle.dumps(trades)
+    print(f"{N:,} records: codec {len(batch) / N:5.1f} B/record  pickle {len(pickled) / N:5.1f} B/record")
+    print(f"  encode:      codec {per_call(lambda: codec.encode_many(trades), 3) * 1e3:6.1f} ms"
+          f"  pickle {per_call(lambda: pickle.dumps(trades), 3) * 1e3:6.1f} ms")
+    print(f"  decode:      codec {per_call(lambda: codec.decode_many(batch), 3) * 1e3:6.1f} ms"
+          f"  pickle {per_call(lambda: pickle.loads(pickled), 3) * 1e3:6.1f} ms")
+
+    views = codec.view_many(batch)
+    index = random.randrange(N)
+    print(f"  one field:   view_many()[i].price {per_call(lambda: views[index].price, 100_000) * 1e9:5.0f} ns"
+          f"  (pickle has to load everything)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Building liquid instances from string records: shifting every field by
+hand with Poly(v).shift(T) before construction, versus coerce=True,
+which does the conversion inside the generated __init__.  Also the
+cost of coerce=True when the values already have the right types.
+
+    python benchmarks/liquid_coerce.py
+"""
+import timeit
+from typing import Optional
+
+from shapeless.liquid import fields, liquid
+from shapeless.main import Poly
+
+
+@liquid
+class Trade:
+    id: int
+    price: float
+    size: int
+    venue: str
+    note: Optional[str] = None
+
+
+@liquid(coerce=True)
+class CoercedTrade:
+    id: int
+    price: float
+    size: int
+    venue: str
+    note: Optional[str] = None
+
+
+STRINGS = ('42', '101.25', '300', 'XNAS')
+TYPED = (42, 101.25, 300, 'XNAS')
+TYPES = [f.type.data for f in fields(Trade)][:4]
+
+
+def by_hand():
+    return Trade(*[Poly(v).shift(t) for v, t in zip(STRINGS, TYPES)])
+
+
+def ns(func, number=100_000):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e9
+
+
+def main():
+    assert by_hand() == Trade(*TYPED)
+    assert CoercedTrade(*STRINGS) == CoercedTrade(*TYPED)
+    rows = [
+        ('strings, Poly.shift by hand', ns(by_hand)),
+        ('strings, coerce=True', ns(lambda: CoercedTrade(*STRINGS))),
+        ('typed, plain liquid', ns(lambda: Trade(*TYPED))),
+        ('typed, coerce=True', ns(lambda: CoercedTrade(*TYPED))),
+    ]
+    for label, t in rows:
+        print(f'{label:<30}{t:>8.0f} ns')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+One million rows of a liquid class as a list of instances versus a
+LiquidFrame: memory, filtering and sorting.
+
+    python benchmarks/liquid_frame.py
+"""
+import time
+import tracemalloc
+
+from shapeless.frame import LiquidFrame
+from shapeless.liquid import liquid
+
+N = 10 ** 6
+
+
+@liquid
+class Tick:
+    id: int
+    price: float
+    size: int
+
+
+def measure(build):
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    ticks, list_bytes = measure(lambda: [Tick(i, i * 0.5, i % 100) for i in range(N)])
+    frame, frame_bytes = measure(lambda: LiquidFrame(Tick, ticks))
+    print(f"memory:  list {list_bytes / N:6.1f} B/row   frame {frame_bytes / N:6.1f} B/row")
+
+    list_filter = timed(lambda: [t for t in ticks if t.size > 50])
+    frame_filter = timed(lambda: frame[frame["size"] > 50])
+    print(f"filter:  list {list_filter * 1e3:6.1f} ms      frame {frame_filter * 1e3:6.1f} ms"
+          f"  ({list_filter / frame_filter:.0f}x)")
+
+    list_sort = timed(lambda: sorted(ticks, key=lambda t: t.size))
+    frame_sort = timed(lambda: frame.sort("size"))
+    print(f"sort:    list {list_sort * 1e3:6.1f} ms      frame {frame_sort * 1e3:6.1f} ms"
+          f"  ({list_sort / frame_sort:.0f}x)")
+
+    appended = LiquidFrame(Tick)
+    append = timed(lambda: [appended.append(t) for t in ticks[:100_000]])
+    print(f"append:  {100_000 / append:,.0f} rows/s one at a time")
+
+    back = timed(frame.to_instances)
+    print(f"to_instances: {N / back:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Building many liquid instances: one cls(*row) or cls(**row) call per
+record versus from_records(), as a list, as a generator, and with a
+process pool.
+
+    python benchmarks/liquid_from_records.py
+"""
+import time
+
+from shapeless.liquid import liquid
+
+N = 500_000
+
+
+@liquid
+class Trade:
+    id: int
+    price: float
+    size: int
+    venue: str
+    flag: bool = False
+
+
+def best(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    tuples = [(i, i * 0.5, i % 100, 'XNAS', False) for i in range(N)]
+    dicts = [dict(id=i, price=i * 0.5, size=i % 100, venue='XNAS', flag=False) for i in range(N)]
+    assert Trade.from_records(tuples[:10]) == [Trade(*t) for t in tuples[:10]]
+    assert Trade.from_records(dicts[:10]) == [Trade(**d) for d in dicts[:10]]
+    rows = [
+        ('tuples, Trade(*t)', lambda: [Trade(*t) for t in tuples]),
+        ('tuples, from_records', lambda: Trade.from_records(tuples)),
+        ('tuples, from_records iterator', lambda: sum(1 for _ in Trade.from_records(tuples, iterator=True))),
+        ('dicts, Trade(**d)', lambda: [Trade(**d) for d in dicts]),
+        ('dicts, from_records', lambda: Trade.from_records(dicts)),
+    ]
+    for processes in (2, 4):
+        rows.append((f'tuples, from_records processes={processes}',
+                     lambda processes=processes: Trade.from_records(
+                         tuples, processes=processes, chunksize=50_000)))
+    for label, func in rows:
+        seconds = best(func, 1 if 'processes' in label else 3)
+        print(f'{label:<40}{N / seconds:>14,.0f} records/s')
+
+
+if __name__ == '__main__':
+    main()
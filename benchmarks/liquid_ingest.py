@@ -0,0 +1,88 @@
+"""
+Reading a CSV and a JSON lines file into liquid instances, in rows/sec:
+csv.DictReader or json.loads with a conversion per field and cls(**row)
+versus read_csv() and read_jsonl().
+
+    python benchmarks/liquid_ingest.py
+"""
+import csv
+import json
+import os
+import tempfile
+import time
+
+from shapeless import liquid, read_csv, read_jsonl
+
+N = 300_000
+
+
+@liquid
+class Trade:
+    id: int
+    symbol: str
+    price: float
+    size: int
+    live: bool = False
+
+
+def best(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def by_hand_csv(path):
+    out = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            out.append(Trade(id=int(row['id']), symbol=row['symbol'],
+                             price=float(row['price']), size=int(row['size']),
+                             live=row['live'] == 'true'))
+    return out
+
+
+def by_hand_jsonl(path):
+    out = []
+    with open(path) as f:
+        for line in f:
+            row = json.loads(line)
+            out.append(Trade(id=int(row['id']), symbol=row['symbol'],
+                             price=float(row['price']), size=int(row['size']),
+                             live=bool(row.get('live', False))))
+    return out
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    csv_path = os.path.join(tmp, 'trades.csv')
+    jsonl_path = os.path.join(tmp, 'trades.jsonl')
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'symbol', 'price', 'size', 'live'])
+        for i in range(N):
+            writer.writerow([i, 'XNAS', i * 0.5, i % 100, 'true' if i % 2 else 'false'])
+    with open(jsonl_path, 'w') as f:
+        for i in range(N):
+            f.write(json.dumps({'id': i, 'symbol': 'XNAS', 'price': i * 0.5,
+                                'size': i % 100, 'live': bool(i % 2)}) + '\n')
+    assert list(read_csv(Trade, csv_path)) == by_hand_csv(csv_path)
+    assert list(read_jsonl(Trade, jsonl_path)) == by_hand_jsonl(jsonl_path)
+
+    rows = [
+        ('csv, DictReader + Trade(**row)', lambda: by_hand_csv(csv_path)),
+        ('csv, read_csv', lambda: list(read_csv(Trade, csv_path))),
+        ('csv, read_csv batches', lambda: [b for b in read_csv(Trade, csv_path).batches()]),
+        ('jsonl, json.loads + Trade(**row)', lambda: by_hand_jsonl(jsonl_path)),
+        ('jsonl, read_jsonl', lambda: list(read_jsonl(Trade, jsonl_path))),
+    ]
+    print(f'{N} rows')
+    for name, func in rows:
+        seconds = best(func)
+        print(f'{name:34} {N / seconds / 1e6:6.2f}M rows/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Defining many liquid classes eagerly and with lazy=True, where the
+comparison, repr and frozen methods are only generated on first use.
+"cold" clears the compiled-code cache before each round, as a fresh
+process importing a module of liquid classes would see it.
+
+    python benchmarks/liquid_lazy.py
+"""
+import time
+
+from shapeless.liquid import _compile_fn, make_liquid
+
+CLASSES = 2000
+
+
+def define(lazy, cold):
+    specs = [[(f'f{i}_{j}', int) for j in range(i % 6 + 1)] for i in range(CLASSES)]
+    if cold:
+        _compile_fn.cache_clear()
+    start = time.perf_counter()
+    for i, fields in enumerate(specs):
+        make_liquid(f'C{i}', fields, order=True, frozen=True, lazy=lazy)
+    return time.perf_counter() - start
+
+
+def main():
+    for cold in (True, False):
+        label = 'cold' if cold else 'warm'
+        eager = min(define(False, cold) for _ in range(3))
+        lazy = min(define(True, cold) for _ in range(3))
+        print(f"{label}: eager {CLASSES / eager:8,.0f} classes/s   "
+              f"lazy {CLASSES / lazy:8,.0f} classes/s  ({eager / lazy:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Cost of validate=True: assigning to a field and constructing an
+instance, against a plain attribute store on an ordinary class, a
+liquid without validation, and a Poly descriptor.
+
+    python benchmarks/liquid_validate.py
+"""
+import timeit
+from typing import Dict, List
+
+from shapeless.liquid import liquid
+from shapeless.main import Poly
+
+
+class Plain:
+    def __init__(self, x, tags):
+        self.x = x
+        self.tags = tags
+
+
+@liquid
+class Unchecked:
+    x: int
+    tags: List[str]
+
+
+@liquid(validate=True)
+class Checked:
+    x: int
+    tags: List[str]
+
+
+@liquid(validate=True, slots=True)
+class CheckedSlots:
+    x: int
+    tags: List[str]
+
+
+class WithPoly:
+    x = Poly(0)
+
+
+@liquid(validate=True)
+class Nested:
+    scores: Dict[str, List[float]]
+
+
+TAGS = ['a', 'b', 'c']
+SCORES = {f'k{i}': [float(i)] * 4 for i in range(8)}
+
+
+def ns(stmt, number=500_000):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e9
+
+
+def main():
+    objs = {'plain class': Plain(1, TAGS), 'liquid': Unchecked(1, TAGS),
+            'liquid validate=True': Checked(1, TAGS),
+            'liquid validate+slots': CheckedSlots(1, TAGS), 'Poly descriptor': WithPoly()}
+    ns(lambda: None)  # warm up
+    base = ns(lambda obj=objs['plain class']: setattr(obj, 'x', 2))
+    print(f"{'obj.x = 2':<28}{'ns':>8}{'vs plain':>10}")
+    for label, obj in objs.items():
+        t = ns(lambda obj=obj: setattr(obj, 'x', 2))
+        print(f'{label:<28}{t:>8.0f}{t / base:>9.1f}x')
+
+    print(f"\n{'obj.x (read)':<28}{'ns':>8}")
+    for label, obj in objs.items():
+        print(f'{label:<28}{ns(lambda obj=obj: obj.x):>8.0f}')
+
+    print(f"\n{'construct (int, List[str])':<28}{'ns':>8}{'vs plain':>10}")
+    base = ns(lambda: Plain(1, TAGS), 200_000)
+    for label, cls in [('plain class', Plain), ('liquid', Unchecked),
+                       ('liquid validate=True', Checked),
+                       ('liquid validate+slots', CheckedSlots)]:
+        t = ns(lambda cls=cls: cls(1, TAGS), 200_000)
+        print(f'{label:<28}{t:>8.0f}{t / base:>9.1f}x')
+    t = ns(lambda: Nested(SCORES), 100_000)
+    print(f"{'Dict[str, List[float]], 8x4':<28}{t:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Converting a column of strings to int: one Poly.shift() per value versus
+a single PolyArray.shift() over the whole column.
+
+    python benchmarks/poly_array.py
+"""
+import time
+
+from shapeless.array import PolyArray
+from shapeless.main import Poly
+
+N = 10 ** 6
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    clean = [str(i) for i in range(N)]
+    dirty = list(clean)
+    dirty[N // 2] = "x"
+    column, dirty_column = PolyArray(clean), PolyArray(dirty)
+
+    per_value = timed(lambda: [Poly(v).shift(int) for v in clean])
+    bulk = timed(lambda: column.shift(int))
+    bulk_dirty = timed(lambda: dirty_column.shift(int))
+    print(f"Poly.shift:                 {N / per_value:>14,.0f} values/s")
+    print(f"PolyArray.shift:            {N / bulk:>14,.0f} values/s")
+    print(f"PolyArray.shift (1 bad):    {N / bulk_dirty:>14,.0f} values/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Poly.of(): allocations and time of wrapping repetitive immutable values
+(enum-like labels and small ints) in a new Poly each, versus the shared
+Polys of the intern table.
+
+    python benchmarks/poly_intern.py
+"""
+import time
+import tracemalloc
+
+from shapeless import Poly
+from shapeless.main import intern_table
+
+N = 500_000
+LABELS = ['buy', 'sell', 'hold', 'cancel']
+
+
+def best(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def allocated(func):
+    # Blocks and bytes still allocated after func() (its result is kept).
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = func()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    del result
+    return sum(s.count_diff for s in stats), sum(s.size_diff for s in stats)
+
+
+def main():
+    values = [LABELS[i % 4] if i % 2 else i % 100 for i in range(N)]
+    print(f'{N} values, {len(set(values))} distinct')
+    for name, func in (('[Poly(v) for v]', lambda: [Poly(v) for v in values]),
+                       ('[Poly.of(v) for v]', lambda: [Poly.of(v) for v in values])):
+        blocks, size = allocated(func)
+        print(f'  {name:28} {blocks:8} blocks {size / 1e6:7.1f} MB kept  '
+              f'{best(func) / N * 1e9:5.0f} ns/value')
+    print(intern_table.stats())
+
+
+if __name__ == '__main__':
+    main()
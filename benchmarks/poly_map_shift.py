@@ -0,0 +1,48 @@
+"""
+Shifting many values: Poly(v).shift(target) one value at a time versus
+Poly.map_shift() in this process and with 1, 2, 4 and 8 worker processes.
+A cheap conversion (str -> int) and a costly one (str -> Fraction).
+
+Worker processes only pay off with that many free cores and a conversion
+that costs more than sending the value there and back.
+
+    python benchmarks/poly_map_shift.py
+"""
+import os
+import time
+from fractions import Fraction
+
+from shapeless import Poly
+
+N = 400_000
+
+
+def best(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    print(f'{N} values, {os.cpu_count()} CPUs')
+    for target, values in [
+        (int, [str(i) for i in range(N)]),
+        (Fraction, [f'{i}/{i % 97 + 1}' for i in range(N)]),
+    ]:
+        assert list(Poly.map_shift(values[:100], target, workers=2)) == [target(v) for v in values[:100]]
+        rows = [('Poly(v).shift()', lambda: [Poly(v).shift(target) for v in values]),
+                ('map_shift, workers=0', lambda: list(Poly.map_shift(values, target, workers=0)))]
+        for workers in (1, 2, 4, 8):
+            rows.append((f'map_shift, workers={workers}',
+                         lambda workers=workers: list(Poly.map_shift(values, target, workers=workers))))
+        print(f'str -> {target.__name__}')
+        for name, func in rows:
+            seconds = best(func)
+            print(f'  {name:24} {seconds * 1e3:8.1f} ms  {N / seconds / 1e6:6.2f}M values/s')
+
+
+if __name__ == '__main__':
+    main()
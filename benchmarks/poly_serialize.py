@@ -0,0 +1,53 @@
+"""
+Poly.serialize()/deserialize() with the tagged codec format versus
+pickle: payload size and round-trip latency, for values from a single
+scalar up to large containers.
+
+    python benchmarks/poly_serialize.py
+"""
+import pickle
+import timeit
+
+from shapeless.codec import default_codecs
+from shapeless.liquid import liquid
+
+
+@liquid
+class User:
+    id: int
+    name: str
+    scores: list
+
+
+VALUES = {
+    'None': None,
+    'small int': 42,
+    'float': 3.14159,
+    'short str': 'hello',
+    'bytes 1 KiB': bytes(1024),
+    'list of 10 ints': list(range(10)),
+    'dict of 100': {f'key{i}': i for i in range(100)},
+    'liquid': User(1, 'ada', [1.0, 2.0]),
+    'list of 1000 liquids': [User(i, f'user{i}', [float(i)]) for i in range(1000)],
+    'list of 100k ints': list(range(100_000)),
+}
+
+
+def round_trip(dumps, loads, value):
+    number = max(1, 20_000 // max(1, len(pickle.dumps(value)) // 64))
+    return timeit.timeit(lambda: loads(dumps(value)), number=number) / number
+
+
+def main():
+    print(f"{'value':>22}  {'codec B':>9} {'pickle B':>9}  {'codec us':>10} {'pickle us':>10}")
+    for label, value in VALUES.items():
+        data, pickled = default_codecs.dumps(value), pickle.dumps(value)
+        assert default_codecs.loads(data) == value
+        codec_time = round_trip(default_codecs.dumps, default_codecs.loads, value)
+        pickle_time = round_trip(pickle.dumps, pickle.loads, value)
+        print(f"{label:>22}  {len(data):>9,} {len(pickled):>9,}  "
+              f"{codec_time * 1e6:>10.2f} {pickle_time * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
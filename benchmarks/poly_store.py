@@ -0,0 +1,74 @@
+"""
+PolyStore throughput: appending records, reading them back at random
+through the memory map, and iterating in order.  With NumPy installed,
+also loading a large array stored with out-of-band pickle buffers
+against pickle.loads() of the same array.
+
+    python benchmarks/poly_store.py
+"""
+import os
+import pickle
+import random
+import tempfile
+import time
+
+from shapeless.store import PolyStore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+N = 200_000
+
+
+def rate(label, count, seconds):
+    print(f'{label:>28}: {count / seconds:>12,.0f} records/s  ({seconds * 1e6 / count:.2f} us each)')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'values.plys')
+        values = [{'id': i, 'name': f'user{i}', 'score': i * 0.5} for i in range(N)]
+
+        start = time.perf_counter()
+        with PolyStore(path, 'w') as store:
+            store.extend(values)
+        rate('append', N, time.perf_counter() - start)
+        print(f'{"file size":>28}: {os.path.getsize(path):>12,} bytes')
+
+        start = time.perf_counter()
+        store = PolyStore(path, 'r')
+        print(f'{"open":>28}: {(time.perf_counter() - start) * 1e6:>12.0f} us')
+        order = random.sample(range(N), N)
+        start = time.perf_counter()
+        for i in order:
+            store[i]
+        rate('random access', N, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in store:
+            pass
+        rate('iterate', N, time.perf_counter() - start)
+        store.close()
+
+        if np is not None:
+            array = np.random.rand(4096, 4096)
+            with PolyStore(path, 'w', allow_pickle=True) as store:
+                store.append(array)
+            with PolyStore(path, 'r', allow_pickle=True) as store:
+                start = time.perf_counter()
+                loaded = store[0]
+                mapped = time.perf_counter() - start
+                assert (loaded == array).all()
+                del loaded
+            pickled = pickle.dumps(array, protocol=5)
+            start = time.perf_counter()
+            pickle.loads(pickled)
+            copied = time.perf_counter() - start
+            print(f'{"128 MiB array, store[0]":>28}: {mapped * 1e3:>12.3f} ms')
+            print(f'{"128 MiB array, pickle.loads":>28}: {copied * 1e3:>12.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
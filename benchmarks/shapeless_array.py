@@ -0,0 +1,62 @@
+"""
+Throughput of shapeless_array(*range(10**6)), before and after Poly
+dropped its per-instance __dict__, mapping dicts and lock.
+
+"Before" is reproduced with a Poly-like class that allocates what the
+old __init__ did.
+
+    python benchmarks/shapeless_array.py
+"""
+import threading
+import time
+import tracemalloc
+
+from shapeless.main import Poly, shapeless_array
+
+N = 10 ** 6
+
+
+class DictPoly:
+    def __init__(self, data, verbose=False):
+        self.data = data
+        self.verbose = verbose
+        self.type_mapping = {}
+        self.alias_mapping = {}
+        self.lock = threading.Lock()
+
+
+def dict_shapeless_array(*args):
+    return [DictPoly(arg).data for arg in args]
+
+
+def timed(fn, args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def footprint(cls, n=100_000):
+    data = object()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objs = [cls(data) for _ in range(n)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del objs
+    return sum(s.size_diff for s in after.compare_to(before, 'filename')) / n
+
+
+def main():
+    values = range(N)
+    before = timed(dict_shapeless_array, values)
+    after = timed(shapeless_array, values)
+    print(f"before: {N / before:>14,.0f} elements/s  {footprint(DictPoly):6.0f} B/Poly")
+    print(f"after:  {N / after:>14,.0f} elements/s  {footprint(Poly):6.0f} B/Poly")
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Method-call latency on @shapeless classes compared with undecorated ones
+and with the old per-call *args/**kwargs wrapper.
+
+    python benchmarks/shapeless_methods.py
+"""
+import timeit
+
+from shapeless.main import Poly, shapeless
+
+
+class Plain:
+    def method(self, a, b):
+        return a
+
+    @staticmethod
+    def static(a, b):
+        return a
+
+    @classmethod
+    def klass(cls, a, b):
+        return a
+
+
+def old_shapeless(cls):
+    for attr_name, attr_value in list(cls.__dict__.items()):
+        if callable(attr_value):
+            def wrapper(*args, attr_value=attr_value, **kwargs):
+                poly_args = [Poly(arg).data for arg in args]
+                poly_kwargs = {k: Poly(v).data for k, v in kwargs.items()}
+                return attr_value(*poly_args, **poly_kwargs)
+            setattr(cls, attr_name, wrapper)
+    return cls
+
+
+Old = old_shapeless(type('Old', (), {'method': Plain.__dict__['method']}))
+Decorated = shapeless(type('Decorated', (Plain,), dict(Plain.__dict__)))
+Verbose = shapeless(type('Verbose', (Plain,), dict(Plain.__dict__)), verbose=True)
+
+
+def bench(label, stmt, number=1_000_000):
+    best = min(timeit.repeat(stmt, number=number, repeat=3))
+    print(f"{label:>38}: {best / number * 1e9:7.0f} ns/call")
+
+
+def main():
+    for name, cls in (('undecorated', Plain), ('old @shapeless', Old),
+                      ('@shapeless', Decorated), ('@shapeless(verbose=True)', Verbose)):
+        obj = cls()
+        bench(f"{name} method", lambda: obj.method(1, 2))
+        if cls is not Old:
+            bench(f"{name} staticmethod", lambda: cls.static(1, 2))
+            bench(f"{name} classmethod", lambda: cls.klass(1, 2))
+
+
+if __name__ == '__main__':
+    main()
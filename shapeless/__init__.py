@@ -1,3 +1,11 @@
 from shapeless.liquid import *
 from shapeless.liquid import liquid
-from shapeless.main import Poly, fluid, shapeless
+from shapeless.main import FluidCache, Poly, fluid, shapeless
+from shapeless.batching import FluidMetrics
+from shapeless.array import PolyArray
+from shapeless.convert import ConverterRegistry, converters
+from shapeless.frame import LiquidFrame, LiquidRow
+from shapeless.binary import LiquidCodec
+from shapeless.codec import CodecRegistry, default_codecs
+from shapeless.store import PolyStore
+from shapeless.ingest import LiquidReader, RowError, read_csv, read_jsonl
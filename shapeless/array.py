@@ -0,0 +1,358 @@
+import logging
+from typing import Any, NamedTuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+from shapeless.convert import converters
+from shapeless.main import type_cache
+from shapeless.typecheck import compile_validator
+
+# Python targets that have a native NumPy dtype.  Everything else is
+# shifted element by element into an object array.
+_NATIVE_DTYPES = {
+    int: 'int64',
+    float: 'float64',
+    complex: 'complex128',
+    bool: 'bool',
+    str: 'str',
+    bytes: 'bytes',
+}
+
+# dtype.kind -> the Python type a single element comes back as.
+_KIND_TYPES = {
+    'b': bool,
+    'i': int,
+    'u': int,
+    'f': float,
+    'c': complex,
+    'U': str,
+    'S': bytes,
+}
+
+# Exceptions that mean a value can't be shifted, rather than a bug:
+# int(None) raises TypeError, int('x') ValueError, np.int8(300)
+# OverflowError.
+_SHIFT_ERRORS = (ValueError, TypeError, OverflowError)
+
+# Columns are converted in chunks so that one bad value only sends its
+# own chunk down the per-element path, not the whole column.
+CHUNK_SIZE = 1 << 16
+
+
+class ShiftResult(NamedTuple):
+    """
+    The outcome of PolyArray.shift().
+
+    values:  The converted column.  Slots that failed hold the fill value.
+    failed:  A boolean mask, True where the value could not be shifted.
+    indices: The positions of the failed values.
+    """
+    values: Any
+    failed: Any
+    indices: Any
+
+    @property
+    def ok(self):
+        return not len(self.indices)
+
+
+class ValidationResult(NamedTuple):
+    """
+    The outcome of PolyArray.validate().
+
+    failed:  A boolean mask, True where the value is not of the target type.
+    indices: The positions of the failed values.
+    """
+    failed: Any
+    indices: Any
+
+    @property
+    def ok(self):
+        return not len(self.indices)
+
+
+class PolyArray:
+    """
+    A column of values handled as a whole.
+
+    PolyArray is the bulk counterpart of Poly: determine(), shift() and
+    validate() run over an entire NumPy array at once instead of one value
+    per call.  Failures are reported as a boolean mask plus the offending
+    indices; pass strict=True to get the same TypeError that Poly raises
+    for the first bad value instead.
+
+    PolyArray requires NumPy.
+
+    ###### USAGE EXAMPLES ######
+
+    ```
+    from shapeless import PolyArray
+
+    column = PolyArray(["1", "2", "x", "4"])
+
+    result = column.shift(int)
+    print(result.values)   # [1 2 0 4]
+    print(result.indices)  # [2]
+
+    column.shift(int, strict=True)  # TypeError: Cannot shape shift x to <class 'int'>
+    ```
+    """
+
+    __slots__ = ('data', 'verbose')
+
+    def __init__(self, data: Any, verbose: bool = False):
+        """
+        Initialize a new PolyArray object.
+
+        :param data: An array or any iterable of values.
+        :param verbose: If True, log all operations. Default is False.
+        """
+        if np is None:
+            raise ImportError("PolyArray requires numpy: pip install numpy")
+        if isinstance(data, np.ndarray):
+            self.data = data.ravel()
+        else:
+            if not isinstance(data, (list, tuple)):
+                data = list(data)
+            # Only homogeneous scalar columns get a native dtype.  NumPy
+            # would quietly turn [1, "a"] into strings and choke on ragged
+            # lists, so anything else is kept as objects.
+            data_types = set(map(type, data))
+            if len(data_types) == 1 and data_types.pop() in _NATIVE_DTYPES:
+                self.data = np.asarray(data)
+            else:
+                self.data = np.empty(len(data), dtype=object)
+                for i, value in enumerate(data):
+                    self.data[i] = value
+        self.verbose = verbose
+        if verbose:
+            logging.info(f"Created a new PolyArray with {len(self.data)} values")
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data.tolist())
+
+    def determine(self):
+        """
+        Determine the type of the values in the column.
+
+        :return: The element type if every value shares it, otherwise object.
+        """
+        data_type = _KIND_TYPES.get(self.data.dtype.kind)
+        if data_type is None:
+            data_types = set(map(type, self.data.tolist()))
+            data_type = data_types.pop() if len(data_types) == 1 else object
+        data_type = type_cache.resolve(data_type)
+        if self.verbose:
+            logging.info(f"Determined type of column: {data_type}")
+        return data_type
+
+    def shift(self, target, *, strict: bool = False, fill: Any = None):
+        """
+        Attempt to shift every value in the column to the target type.
+
+        :param target: The target type, either a Python type or a NumPy dtype.
+            Values that NumPy cannot convert go through ``converters``.
+            Values out of the range of a NumPy integer type fail rather
+            than wrap around.
+        :param strict: If True, raise on the first value that cannot be shifted.
+        :param fill: The value stored in slots that failed. Default is the
+            dtype's zero (NaN for floats, None for object columns).
+        :return: A ShiftResult.
+        :raises TypeError: In strict mode, if a value cannot be shifted.
+        """
+        dtype = _target_dtype(target)
+        n = len(self.data)
+        values = np.empty(n, dtype=dtype if dtype is not None else object)
+        if dtype is not None and dtype.kind in 'US':
+            # The itemsize of a string column is only known once converted.
+            values = values.astype(object)
+        failed = np.zeros(n, dtype=bool)
+
+        for start in range(0, n, CHUNK_SIZE):
+            chunk = self.data[start:start + CHUNK_SIZE]
+            converted = None
+            if dtype is not None:
+                converted = _convert_native(chunk, target, dtype)
+            if converted is not None:
+                values[start:start + len(chunk)] = converted
+                continue
+            for offset, value in enumerate(chunk.tolist()):
+                try:
+                    shifted = converters.convert(value, target)
+                except _SHIFT_ERRORS:
+                    if strict:
+                        if self.verbose:
+                            logging.error(f"Failed to shape shift {value} to {target}")
+                        raise TypeError(f"Cannot shape shift {value} to {target}")
+                    failed[start + offset] = True
+                    continue
+                try:
+                    values[start + offset] = shifted
+                except OverflowError:
+                    # Python ints outgrow int64: fall back to objects.
+                    values = values.astype(object)
+                    values[start + offset] = shifted
+
+        if dtype is not None and dtype.kind in 'US':
+            values = values.astype(dtype)
+        indices = np.flatnonzero(failed)
+        if len(indices):
+            values[indices] = _fill_value(values.dtype) if fill is None else fill
+            if self.verbose:
+                logging.error(f"Failed to shape shift {len(indices)} values to {target}")
+        return ShiftResult(values, failed, indices)
+
+    def validate(self, target, *, strict: bool = False):
+        """
+        Validate that every value in the column is of the target type.
+
+        :param target: The target type: a class, a tuple of classes, or
+            any typing annotation that Poly.validate() accepts, such as
+            ``List[int]`` or ``Optional[str]``.
+        :param strict: If True, raise on the first value of the wrong type.
+        :return: A ValidationResult.
+        :raises TypeError: In strict mode, if a value is not of the target type.
+        """
+        element_type = _KIND_TYPES.get(self.data.dtype.kind)
+        if not isinstance(target, (type, tuple)):
+            check = compile_validator(target)
+            failed = np.fromiter(
+                (not check(v) for v in self.data.tolist()),
+                dtype=bool,
+                count=len(self.data),
+            )
+        elif element_type is not None:
+            # A typed column is homogeneous: one check covers every value.
+            if issubclass(element_type, target):
+                failed = np.zeros(len(self.data), dtype=bool)
+            else:
+                failed = np.ones(len(self.data), dtype=bool)
+        else:
+            failed = np.fromiter(
+                (not isinstance(v, target) for v in self.data.tolist()),
+                dtype=bool,
+                count=len(self.data),
+            )
+        indices = np.flatnonzero(failed)
+        if len(indices):
+            value = self.data[indices[0]]
+            value = value.item() if isinstance(value, np.generic) else value
+            if self.verbose:
+                logging.error(f"{value} is not of type {target}")
+            if strict:
+                raise TypeError(f"{value} is not of type {target}")
+        return ValidationResult(failed, indices)
+
+
+def _target_dtype(target):
+    # The dtype to convert into natively, or None for the per-element
+    # object path.
+    name = _NATIVE_DTYPES.get(target)
+    if name is not None:
+        return np.dtype(name)
+    if isinstance(target, np.dtype):
+        return target
+    if isinstance(target, type) and issubclass(target, np.generic):
+        return np.dtype(target)
+    return None
+
+
+def _convert_native(chunk, target, dtype):
+    # Convert a chunk with a single astype() call.  Returns None when the
+    # chunk holds a value that NumPy rejects (or that NumPy would convert
+    # differently from target()), so the caller retries it value by value.
+    kind = chunk.dtype.kind
+    if target is bool and kind in 'USO':
+        # bool("False") is True: NumPy's string parsing disagrees.
+        return None
+    if (dtype.kind == 'S' and kind in 'UO') or (dtype.kind == 'U' and kind == 'S'):
+        # NumPy encodes str to bytes and decodes back; bytes('a') raises
+        # and str(b'a') is "b'a'".
+        return None
+    if kind == 'O' and dtype.kind not in 'OUS':
+        # Object columns may hold anything; only trust astype() for
+        # plain Python numbers.
+        if not all(type(v) in (int, float, bool) for v in chunk.tolist()):
+            return None
+    if kind in 'fc' and dtype.kind in 'iub':
+        # NumPy silently wraps NaN, inf and out-of-range floats.
+        if not np.isfinite(chunk).all():
+            return None
+        if dtype.kind in 'iu':
+            info = np.iinfo(dtype)
+            if len(chunk) and not (info.min - 1 < chunk.real.min()
+                                   and chunk.real.max() < info.max + 1):
+                return None
+    if dtype.kind in 'iu':
+        # NumPy wraps ints around too: np.int8 takes 300 as 44.
+        if kind in 'iu':
+            return _narrow(chunk, dtype)
+        if kind in 'USO' and dtype != np.int64:
+            wide = _convert_native(chunk, target, np.dtype(np.int64))
+            return None if wide is None else _narrow(wide, dtype)
+    if kind == 'U' and dtype.kind == 'i':
+        parsed = _parse_decimal(chunk)
+        if parsed is not None:
+            return parsed
+    try:
+        return chunk.astype(dtype)
+    except (ValueError, OverflowError, TypeError):
+        return None
+
+
+def _narrow(values, dtype):
+    # values as dtype, or None if any of them is out of its range.
+    info = np.iinfo(dtype)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        return None
+    return values.astype(dtype)
+
+
+def _parse_decimal(chunk):
+    # Parse a column of plain decimal strings ("42", "-7") straight from
+    # their code points, one digit position at a time across the whole
+    # chunk.  Returns None if anything else shows up (whitespace,
+    # underscores, empty strings, too many digits) and lets astype()
+    # handle it.
+    width = chunk.dtype.itemsize // 4
+    if width == 0 or width > 18 or not len(chunk):
+        return None
+    codes = np.ascontiguousarray(chunk).view(np.uint32).reshape(len(chunk), width)
+    first = codes[:, 0]
+    negative = first == ord('-')
+    signed = negative | (first == ord('+'))
+    digits = codes.astype(np.int64) - ord('0')
+    # NumPy pads short strings with trailing NULs.
+    padding = codes == 0
+    is_digit = (digits >= 0) & (digits <= 9)
+    is_digit[:, 0] |= signed
+    if not (is_digit | padding).all():
+        return None
+    lengths = width - padding.sum(axis=1)
+    if (lengths - signed).min() <= 0:
+        return None
+    values = np.zeros(len(chunk), dtype=np.int64)
+    for column in range(width):
+        take = is_digit[:, column] & ~padding[:, column]
+        if column == 0:
+            take &= ~signed
+        values = np.where(take, values * 10 + digits[:, column], values)
+    return np.where(negative, -values, values)
+
+
+def _fill_value(dtype):
+    if dtype.kind == 'f':
+        return np.nan
+    if dtype.kind == 'c':
+        return complex(np.nan, np.nan)
+    if dtype.kind == 'O':
+        return None
+    if dtype.kind in 'US':
+        return dtype.type()
+    return dtype.type(0)
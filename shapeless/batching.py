@@ -0,0 +1,229 @@
+import asyncio
+import functools
+import inspect
+import threading
+import weakref
+
+from shapeless.main import Poly, _fluid_log_error
+
+
+class FluidMetrics:
+    """
+    Call, batch and latency counters of a batched or limited fluid function.
+
+    Latencies are measured on the event loop's clock, from the moment a
+    call is made until its result is ready, so they include the time
+    spent waiting for a batch to fill and for a concurrency slot.
+
+    :ivar calls: The number of calls that completed, successfully or not.
+    :ivar errors: The number of those that raised.
+    :ivar batches: The number of times the function itself was called.
+    :ivar max_batch_size: The most calls coalesced into one batch.
+    :ivar in_flight: The number of batches running right now.
+    :ivar max_in_flight: The most batches that ran at the same time.
+    :ivar total_latency: The sum of the call latencies, in seconds.
+    :ivar max_latency: The longest call latency, in seconds.
+    """
+
+    __slots__ = ('calls', 'errors', 'batches', 'batched_calls', 'max_batch_size',
+                 'in_flight', 'max_in_flight', 'total_latency', 'max_latency')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Set every counter back to zero.
+        """
+        self.calls = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_calls = 0
+        self.max_batch_size = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def mean_batch_size(self):
+        return self.batched_calls / self.batches if self.batches else 0.0
+
+    @property
+    def mean_latency(self):
+        return self.total_latency / self.calls if self.calls else 0.0
+
+    def snapshot(self):
+        """
+        Get the counters.
+
+        :return: A dict of every counter, with mean_batch_size and mean_latency.
+        """
+        stats = {name: getattr(self, name) for name in self.__slots__}
+        stats['mean_batch_size'] = self.mean_batch_size
+        stats['mean_latency'] = self.mean_latency
+        return stats
+
+    def __repr__(self):
+        return (f'FluidMetrics(calls={self.calls}, errors={self.errors}, '
+                f'batches={self.batches}, mean_batch_size={self.mean_batch_size:.1f}, '
+                f'mean_latency={self.mean_latency * 1e3:.3f}ms)')
+
+    def _started(self, size):
+        self.batches += 1
+        self.batched_calls += size
+        if size > self.max_batch_size:
+            self.max_batch_size = size
+        self.in_flight += 1
+        if self.in_flight > self.max_in_flight:
+            self.max_in_flight = self.in_flight
+
+    def _finished(self, latency, failed):
+        self.calls += 1
+        self.errors += failed
+        self.total_latency += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+
+class _LoopState:
+    # What a batched function keeps per event loop: futures and asyncio
+    # primitives belong to the loop they were made on.
+    __slots__ = ('pending', 'timer', 'semaphore', 'tasks')
+
+    def __init__(self, max_concurrency):
+        self.pending = []
+        self.timer = None
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        # Running batch tasks: the loop only keeps weak references.
+        self.tasks = set()
+
+
+class _Batcher:
+    # Coalesces concurrent calls into one call of a batch function.
+
+    def __init__(self, func, batch_size, batch_window, max_concurrency, metrics):
+        self.func = func
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_concurrency = max_concurrency
+        self.metrics = metrics
+        self._states = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _state(self, loop):
+        try:
+            return self._states[loop]
+        except KeyError:
+            with self._lock:
+                return self._states.setdefault(loop, _LoopState(self.max_concurrency))
+
+    def submit(self, value):
+        # Queue a call; return the future its result will be set on.
+        loop = asyncio.get_running_loop()
+        state = self._state(loop)
+        future = loop.create_future()
+        state.pending.append((Poly(value), future, loop.time()))
+        if len(state.pending) >= self.batch_size:
+            self._flush(loop, state)
+        elif state.timer is None:
+            if self.batch_window:
+                state.timer = loop.call_later(self.batch_window, self._flush, loop, state)
+            else:
+                # No window: coalesce the calls made before the loop
+                # gets around to it.
+                state.timer = loop.call_soon(self._flush, loop, state)
+        return future
+
+    def _flush(self, loop, state):
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        batch = state.pending
+        if not batch:
+            return
+        state.pending = []
+        task = loop.create_task(self._run(loop, state, batch))
+        state.tasks.add(task)
+        task.add_done_callback(state.tasks.discard)
+
+    async def _run(self, loop, state, batch):
+        if state.semaphore is None:
+            await self._call(loop, batch)
+        else:
+            async with state.semaphore:
+                await self._call(loop, batch)
+
+    async def _call(self, loop, batch):
+        metrics = self.metrics
+        metrics._started(len(batch))
+        try:
+            results = self.func([value for value, _, _ in batch])
+            if inspect.isawaitable(results):
+                results = await results
+            results = list(results)
+            if len(results) != len(batch):
+                raise ValueError(f"{self.func.__name__} returned {len(results)} "
+                                 f"results for a batch of {len(batch)}")
+        except Exception as e:
+            _fluid_log_error(self.func, e)
+            results = [e] * len(batch)
+        finally:
+            metrics.in_flight -= 1
+        now = loop.time()
+        for (_, future, start), result in zip(batch, results):
+            failed = isinstance(result, BaseException)
+            metrics._finished(now - start, failed)
+            if future.done():
+                # The caller gave up (cancelled) while it waited.
+                continue
+            if failed:
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def batched(func, *, batch_size=None, batch_window=None, max_concurrency=None):
+    # fluid() with batching options: return the async function callers
+    # await, one value per call.
+    if batch_size is None and batch_window is None:
+        return _limited(func, max_concurrency)
+    metrics = FluidMetrics()
+    batcher = _Batcher(func, batch_size or float('inf'), batch_window or 0.0,
+                       max_concurrency, metrics)
+    submit = batcher.submit
+
+    async def wrapper(value):
+        return await submit(value)
+    functools.wraps(func)(wrapper)
+    wrapper.metrics = metrics
+    return wrapper
+
+
+def _limited(func, max_concurrency):
+    # An async fluid function with at most max_concurrency calls running
+    # at a time, per event loop.
+    metrics = FluidMetrics()
+    semaphores = weakref.WeakKeyDictionary()
+    lock = threading.Lock()
+
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        semaphore = semaphores.get(loop)
+        if semaphore is None:
+            with lock:
+                semaphore = semaphores.setdefault(loop, asyncio.Semaphore(max_concurrency))
+        start = loop.time()
+        failed = True
+        async with semaphore:
+            metrics._started(1)
+            try:
+                result = await func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                metrics.in_flight -= 1
+                metrics._finished(loop.time() - start, failed)
+    functools.wraps(func)(wrapper)
+    wrapper.metrics = metrics
+    return wrapper
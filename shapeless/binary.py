@@ -0,0 +1,469 @@
+import hashlib
+import struct
+import sys
+import types
+import typing
+
+from shapeless.liquid import _create_fn, fields, is_liquid
+
+# Every payload starts with MAGIC, the format version, the payload kind
+# and the schema fingerprint.
+MAGIC = b'LQ'
+VERSION = 1
+_HEADER = struct.Struct('<2sBB8s')
+_SINGLE, _BATCH = 0, 1
+_COUNT = struct.Struct('<Q')
+
+_UNION_TYPES = (typing.Union,)
+if sys.version_info >= (3, 10):
+    _UNION_TYPES += (types.UnionType,)
+
+# Annotation -> (kind, struct format of its fixed part).  str and bytes
+# store their length in the fixed part and their contents after it.
+_KINDS = {
+    int: ('int', 'q'),
+    float: ('float', 'd'),
+    bool: ('bool', '?'),
+    complex: ('complex', 'dd'),
+    str: ('str', 'I'),
+    bytes: ('bytes', 'I'),
+}
+
+
+class LiquidCodec:
+    """
+    A compact binary format for the instances of one liquid class.
+
+    The format is derived from fields(cls) and their annotations: int,
+    float, bool and complex fields are packed with fixed-width struct
+    formats, str and bytes fields are stored length-prefixed, and any of
+    them may be Optional.  Field names and class paths are not repeated
+    in the payload.  Instead every payload carries a fingerprint of the
+    schema, and reading a payload written for a different schema fails
+    straight away.
+
+    decode() and decode_many() build instances.  view() and view_many()
+    read over a memoryview of the payload without copying it and only
+    unpack a field when it is accessed.
+
+    ###### USAGE EXAMPLES ######
+
+    ```
+    from shapeless import LiquidCodec, liquid
+
+    @liquid
+    class Trade:
+        symbol: str
+        price: float
+        size: int
+
+    codec = LiquidCodec(Trade)
+    data = codec.encode(Trade("A", 10.5, 100))   # 39 bytes
+    codec.decode(data)                          # Trade(symbol='A', price=10.5, size=100)
+
+    batch = codec.encode_many([Trade("A", 10.5, 100), Trade("B", 3.0, 5)])
+    codec.view_many(batch)[1].price             # 3.0, without decoding the rest
+    ```
+    """
+
+    def __init__(self, cls):
+        """
+        Initialize a new LiquidCodec object.
+
+        :param cls: The liquid class.
+        :raises TypeError: If a field's annotation has no binary encoding.
+        """
+        if not isinstance(cls, type) or not is_liquid(cls):
+            raise TypeError(f"LiquidCodec needs a liquid class, not {cls!r}")
+        self.cls = cls
+        try:
+            hints = typing.get_type_hints(cls)
+        except Exception:
+            hints = {}
+        self._fields = []
+        for f in fields(cls):
+            annotation = hints.get(f.name, f.type.data)
+            kind, optional = _field_kind(annotation)
+            if kind is None:
+                raise TypeError(f"Cannot encode field {f.name!r} of "
+                                f"{cls.__qualname__}: {annotation!r}")
+            self._fields.append((f.name, kind, optional))
+
+        schema = (cls.__module__, cls.__qualname__,
+                  tuple((name, kind, optional) for name, kind, optional in self._fields))
+        self.fingerprint = hashlib.blake2b(repr(schema).encode(), digest_size=8).digest()
+
+        self._fixed = struct.Struct('<' + ''.join(
+            ('?' if optional else '') + _KINDS_BY_NAME[kind]
+            for _, kind, optional in self._fields))
+        self._offsets = _field_offsets(self._fields)
+        self._encode, self._decode = _compile(cls, self._fields, self._fixed)
+        namespace = {name: property(_field_reader(*spec)) for name, spec in self._offsets.items()}
+        namespace['__slots__'] = ()
+        self._view = type(f'{cls.__name__}View', (RecordView,), namespace)
+
+    @property
+    def fixed_size(self):
+        """
+        The size in bytes of a record's fixed-width part.
+        """
+        return self._fixed.size
+
+    def encode(self, obj):
+        """
+        Encode one instance.
+
+        :param obj: An instance of the codec's class.
+        :return: The payload.
+        :raises TypeError: If a field value does not match its annotation, or
+            does not fit its fixed width.
+        """
+        out = bytearray(_HEADER.pack(MAGIC, VERSION, _SINGLE, self.fingerprint))
+        self._encode_checked((obj,), out, [], 0)
+        return bytes(out)
+
+    def encode_many(self, objs):
+        """
+        Encode a list of instances into one contiguous payload.
+
+        The payload holds the number of records and an offset table, so
+        view_many() can get at any record directly.
+
+        :param objs: Instances of the codec's class.
+        :return: The payload.
+        :raises TypeError: If a field value does not match its annotation, or
+            does not fit its fixed width.
+        """
+        objs = list(objs)
+        out = bytearray(_HEADER.pack(MAGIC, VERSION, _BATCH, self.fingerprint))
+        out += _COUNT.pack(len(objs))
+        table = len(out)
+        out += bytes(8 * len(objs))
+        offsets = []
+        self._encode_checked(objs, out, offsets, len(out))
+        struct.pack_into(f'<{len(objs)}Q', out, table, *offsets)
+        return bytes(out)
+
+    def decode(self, data):
+        """
+        Decode one instance.
+
+        The instance is filled in directly: __init__ and __post_init__ are
+        not run, just as with pickle.
+
+        :param data: A payload from encode(), as any bytes-like object.
+        :return: The instance.
+        :raises ValueError: If the payload is malformed or was written for a
+            different schema.
+        """
+        self._check(data, _SINGLE)
+        return self._decode_checked(_readable(data), _HEADER.size, 1, whole=True)[0]
+
+    def decode_many(self, data):
+        """
+        Decode a payload from encode_many().
+
+        :param data: The payload, as any bytes-like object.
+        :return: A list of instances.
+        :raises ValueError: If the payload is malformed or was written for a
+            different schema.
+        """
+        buffer = self._check(data, _BATCH)
+        count, = _COUNT.unpack_from(buffer, _HEADER.size)
+        return self._decode_checked(_readable(data), _HEADER.size + _COUNT.size + 8 * count,
+                                    count, whole=True)
+
+    def view(self, data):
+        """
+        Get a lazy view of a payload from encode().
+
+        :param data: The payload, as any bytes-like object.  It is not copied.
+        :return: A RecordView.
+        """
+        return self._view(self, self._check(data, _SINGLE), _HEADER.size)
+
+    def view_many(self, data):
+        """
+        Get lazy views of a payload from encode_many().
+
+        :param data: The payload, as any bytes-like object.  It is not copied.
+        :return: A RecordBatch, a sequence of RecordViews.
+        """
+        buffer = self._check(data, _BATCH)
+        count, = _COUNT.unpack_from(buffer, _HEADER.size)
+        table = _HEADER.size + _COUNT.size
+        offsets = buffer[table:table + 8 * count]
+        if len(offsets) != 8 * count:
+            raise ValueError("Truncated liquid payload")
+        if sys.byteorder == 'little':
+            # The table is little-endian: read it in place.
+            offsets = offsets.cast('Q')
+        else:
+            offsets = struct.unpack(f'<{count}Q', offsets)
+        return RecordBatch(self, buffer, table + 8 * count, offsets)
+
+    def _encode_checked(self, objs, out, offsets, start):
+        try:
+            self._encode(objs, out, offsets, start)
+        except struct.error as e:
+            raise TypeError(f"Cannot encode a {self.cls.__qualname__}: {e}") from None
+
+    def _decode_checked(self, buffer, offset, count, whole=False):
+        # whole: the records must end exactly where the buffer does.
+        try:
+            objs, end = self._decode(buffer, offset, count)
+        except (struct.error, UnicodeDecodeError, TypeError) as e:
+            # TypeError: a validate=True liquid refused a value.
+            raise ValueError(f"Malformed liquid payload: {e}") from None
+        if whole and end != len(buffer):
+            raise ValueError(f"Malformed liquid payload: {len(buffer) - end} "
+                             f"trailing bytes")
+        return objs
+
+    def _check(self, data, kind):
+        buffer = memoryview(data).cast('B')
+        try:
+            magic, version, payload_kind, fingerprint = _HEADER.unpack_from(buffer)
+        except struct.error:
+            raise ValueError("Truncated liquid payload") from None
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a liquid payload")
+        if fingerprint != self.fingerprint:
+            raise ValueError(f"Schema fingerprint mismatch: the payload was not "
+                             f"written for this version of {self.cls.__qualname__}")
+        if payload_kind != kind:
+            raise ValueError("Expected a " + ("single record" if kind == _SINGLE else "batch")
+                             + " payload; use " + ("decode_many()" if kind == _SINGLE else "decode()"))
+        return buffer
+
+
+class RecordView:
+    """
+    A lazy view of one encoded record.
+
+    Fields are unpacked from the underlying buffer when they are read.
+    str fields are decoded on access; bytes fields are returned as
+    memoryview slices of the buffer, without copying.  Each codec has its
+    own subclass with a property per field.
+    """
+
+    __slots__ = ('_codec', '_buffer', '_offset', '_tail')
+
+    def __init__(self, codec: LiquidCodec, buffer, offset: int):
+        self._codec = codec
+        self._buffer = buffer
+        self._offset = offset
+        self._tail = None
+
+    def __repr__(self):
+        values = ', '.join(f"{name}={getattr(self, name)!r}"
+                           for name, _, _ in self._codec._fields)
+        return f"{self._codec.cls.__qualname__}({values})"
+
+    def to_instance(self):
+        """
+        Decode the record into an instance.
+
+        :return: The instance.
+        """
+        return self._codec._decode_checked(self._buffer, self._offset, 1)[0]
+
+    def _tail_offsets(self):
+        # Where each str/bytes field's contents start.
+        if self._tail is None:
+            codec = self._codec
+            position = self._offset + codec._fixed.size
+            tail = []
+            for name, kind, optional in codec._fields:
+                if kind in ('str', 'bytes'):
+                    _, _, field_offset, unpack_from, _ = codec._offsets[name]
+                    tail.append(position)
+                    base = self._offset + field_offset
+                    if not optional or self._buffer[base]:
+                        position += unpack_from(self._buffer, base + optional)[0]
+            self._tail = tail
+        return self._tail
+
+
+class RecordBatch:
+    """
+    Lazy views of the records of a payload from LiquidCodec.encode_many().
+    """
+
+    __slots__ = ('_codec', '_buffer', '_start', '_offsets')
+
+    def __init__(self, codec, buffer, start, offsets):
+        self._codec = codec
+        self._buffer = buffer
+        self._start = start
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        return self._codec._view(self._codec, self._buffer, self._start + self._offsets[index])
+
+    def __iter__(self):
+        view, codec, buffer, start = self._codec._view, self._codec, self._buffer, self._start
+        for offset in self._offsets:
+            yield view(codec, buffer, start + offset)
+
+
+_KINDS_BY_NAME = {kind: fmt for kind, fmt in _KINDS.values()}
+
+
+def _readable(data):
+    # Decoding builds new objects anyway, and slicing bytes is cheaper
+    # than slicing a memoryview, so only wrap what isn't bytes already.
+    return data if type(data) is bytes else memoryview(data).cast('B')
+
+
+def _field_kind(annotation):
+    # Return (kind, optional) for an annotation, or (None, False).
+    optional = False
+    if typing.get_origin(annotation) in _UNION_TYPES:
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        if len(args) != 1 or len(args) == len(typing.get_args(annotation)):
+            return None, False
+        annotation, optional = args[0], True
+    kind = _KINDS.get(annotation)
+    return (kind[0], optional) if kind else (None, False)
+
+
+def _field_offsets(codec_fields):
+    # name -> (kind, optional, offset in the fixed part, unpack_from()
+    # for the field, index among the str/bytes fields).
+    offsets = {}
+    position = 0
+    var_index = 0
+    for name, kind, optional in codec_fields:
+        unpack = struct.Struct('<' + _KINDS_BY_NAME[kind])
+        is_var = kind in ('str', 'bytes')
+        offsets[name] = (kind, optional, position, unpack.unpack_from,
+                         var_index if is_var else None)
+        position += optional + unpack.size
+        var_index += is_var
+    return offsets
+
+
+def _field_reader(kind, optional, position, unpack_from, var_index):
+    # The getter of a RecordView property.
+    def read(view):
+        buffer = view._buffer
+        offset = view._offset + position
+        if optional:
+            if not buffer[offset]:
+                return None
+            offset += 1
+        values = unpack_from(buffer, offset)
+        if var_index is None:
+            return complex(*values) if kind == 'complex' else values[0]
+        start = view._tail_offsets()[var_index]
+        data = buffer[start:start + values[0]]
+        if len(data) != values[0]:
+            raise ValueError("Truncated liquid payload")
+        return str(data, 'utf-8') if kind == 'str' else data
+    return read
+
+
+def _compile(cls, codec_fields, fixed):
+    # Generate the encoder and decoder for a class.  The encoder appends
+    # one record to a bytearray: the fixed part packed in one call, then
+    # the contents of the str/bytes fields.  The decoder unpacks the
+    # fixed part in one call and returns (instance, end offset).
+    globals = {'_pack': fixed.pack, '_unpack_from': fixed.unpack_from,
+               '_size': fixed.size, '_cls': cls, '_new': object.__new__,
+               '_set': object.__setattr__, '_BYTES': (bytes, bytearray, memoryview)}
+    encode = []
+    packed = []
+    tails = []
+    decode = []
+    unpacked = []
+    built = []
+    for i, (name, kind, optional) in enumerate(codec_fields):
+        value = f'_{i}'
+        encode.append(f'{value} = obj.{name}')
+        if optional:
+            encode.append(f'_n{i} = {value} is not None')
+            packed.append(f'_n{i}')
+            unpacked.append(f'_n{i}')
+        if kind == 'bool':
+            encode.append(f'if {value} is not True and {value} is not False'
+                          + (f' and _n{i}' if optional else '') + ':')
+            encode.append(f' raise TypeError("field {name} must be a bool, "'
+                          f' "not " + type({value}).__name__)')
+        if kind == 'str':
+            if optional:
+                encode.append(f'{value} = str.encode({value}) if _n{i} else b""')
+            else:
+                encode.append(f'{value} = str.encode({value})')
+        elif kind == 'bytes':
+            if optional:
+                encode.append(f'{value} = {value} if _n{i} else b""')
+            encode.append(f'if not isinstance({value}, _BYTES):')
+            encode.append(f' raise TypeError("field {name} must be bytes, "'
+                          f' "not " + type({value}).__name__)')
+        elif optional:
+            zero = {'int': '0', 'float': '0.0', 'bool': 'False', 'complex': '0j'}[kind]
+            encode.append(f'{value} = {value} if _n{i} else {zero}')
+
+        if kind == 'complex':
+            packed += [f'{value}.real', f'{value}.imag']
+            unpacked += [f'{value}r', f'{value}i']
+            result = f'complex({value}r, {value}i)'
+        elif kind in ('str', 'bytes'):
+            packed.append(f'len({value})')
+            tails.append(value)
+            unpacked.append(f'_l{i}')
+            convert = 'str' if kind == 'str' else 'bytes'
+            decode.append(f'if offset + _l{i} > _end:')
+            decode.append(' raise ValueError("Truncated liquid payload")')
+            decode.append(f'{value} = {convert}(buf[offset:offset + _l{i}]'
+                          + (", 'utf-8'" if kind == 'str' else '') + ')')
+            decode.append(f'offset += _l{i}')
+            result = value
+        else:
+            packed.append(value)
+            unpacked.append(value)
+            result = value
+        if optional:
+            result = f'{result} if _n{i} else None'
+        built.append((name, result))
+
+    encode.append(f'out += _pack({", ".join(packed)})')
+    encode += [f'out += {value}' for value in tails]
+
+    decode_body = []
+    if unpacked:
+        decode_body.append(f'{", ".join(unpacked)}, = _unpack_from(buf, offset)')
+    decode_body.append('offset += _size')
+    decode_body += decode
+    decode_body.append('obj = _new(_cls)')
+    if any('__slots__' in c.__dict__ for c in cls.__mro__[:-1]):
+        decode_body += [f'_set(obj, {name!r}, {result})' for name, result in built]
+    else:
+        # Fill in the instance's __dict__ directly, as pickle does.
+        decode_body.append('_d = obj.__dict__')
+        decode_body += [f'_d[{name!r}] = {result}' for name, result in built]
+    decode_body.append('objs.append(obj)')
+
+    # Both loop over the records, so a batch costs one call.
+    encode_many = _create_fn('__liquid_encode__',
+                             ('objs', 'out', 'offsets', 'start'),
+                             ['for obj in objs:',
+                              ' if type(obj) is not _cls:',
+                              '  raise TypeError(f"Expected a {_cls.__qualname__}, "',
+                              '                  f"got {type(obj).__qualname__}")',
+                              ' offsets.append(len(out) - start)']
+                             + [f' {line}' for line in encode],
+                             globals=globals)
+    decode_many = _create_fn('__liquid_decode__',
+                             ('buf', 'offset', 'count'),
+                             ['objs = []',
+                              '_end = len(buf)',
+                              'for _ in range(count):']
+                             + [f' {line}' for line in decode_body]
+                             + ['return objs, offset'],
+                             globals=globals)
+    return encode_many, decode_many
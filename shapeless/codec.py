@@ -0,0 +1,494 @@
+import pickle
+import struct
+import sys
+import threading
+from array import array
+from typing import Optional
+
+from shapeless.liquid import _FIELDS, _converters
+
+# Every payload starts with this byte, which also carries the format
+# version.  Pickle payloads (protocol 2 and up) start with 0x80 instead.
+MAGIC = b'\xb1'
+_PICKLE_MAGIC = 0x80
+
+# Built-in tags.  Custom codecs are written under _CUSTOM with their name.
+_NONE = ord('N')
+_FALSE = ord('F')
+_TRUE = ord('T')
+_INT = ord('i')
+_BIG_INT = ord('I')
+_FLOAT = ord('f')
+_STR = ord('s')
+_BYTES = ord('b')
+_LIST = ord('l')
+_TUPLE = ord('t')
+_DICT = ord('d')
+_LIQUID = ord('L')
+_CUSTOM = ord('x')
+_PICKLE = ord('P')
+
+_DOUBLE = struct.Struct('<d')
+
+# Lists of at least _ARRAY_MIN ints (that fit in 64 bits) or floats are
+# written as packed little-endian arrays.
+# Int lists use the narrowest of int32 and int64 they fit.
+_INT32_ARRAY = ord('a')
+_INT64_ARRAY = ord('A')
+_FLOAT_ARRAY = ord('D')
+_ARRAY_TAGS = {int: (_INT32_ARRAY, _INT64_ARRAY), float: (_FLOAT_ARRAY,)}
+_ARRAY_CODES = {_INT32_ARRAY: 'i', _INT64_ARRAY: 'q', _FLOAT_ARRAY: 'd'}
+_ARRAY_MIN = 8
+
+
+class CodecRegistry:
+    """
+    A registry of codecs, used by Poly.serialize() and Poly.deserialize().
+
+    Values are written in a compact tagged format: one tag byte per value,
+    followed by a varint or fixed-width payload.  None, bool, int, float,
+    str, bytes, list, tuple and dict have built-in encodings, as do liquid
+    instances.  Other types can be registered with an encode function that
+    returns bytes and a decode function that takes them back.
+
+    Unlike pickle, decoding never runs code named by the payload: liquid
+    classes are only looked up in modules that are already imported, and
+    custom types only through the registered decoders.  Pickle is kept as
+    an opt-in fallback for types without a codec; with allow_pickle=False
+    (the default) those raise TypeError, and pickle payloads are refused.
+
+    ###### USAGE EXAMPLES ######
+
+    ```
+    from decimal import Decimal
+    from shapeless import CodecRegistry, default_codecs
+
+    default_codecs.register(Decimal, 'decimal',
+                            lambda d: str(d).encode(), lambda b: Decimal(b.decode()))
+
+    data = default_codecs.dumps({'price': Decimal('1.5'), 'tags': ['a', 'b']})
+    default_codecs.loads(data)  # {'price': Decimal('1.5'), 'tags': ['a', 'b']}
+    ```
+
+    :param allow_pickle: If True, values without a codec are pickled, and
+        pickle payloads are loaded.  Default is False.
+    """
+
+    def __init__(self, allow_pickle: bool = False):
+        self.allow_pickle = allow_pickle
+        self._encoders = {}
+        self._decoders = {}
+        self._lock = threading.RLock()
+
+    def register(self, cls, name: str, encode, decode):
+        """
+        Register a codec for a type.
+
+        :param cls: The type.  Subclasses use the codec too, unless they
+            have their own.
+        :param name: A name that identifies the codec in payloads.
+        :param encode: A function from a value to bytes.
+        :param decode: A function from those bytes back to a value.
+        """
+        if not isinstance(name, str) or not name:
+            raise ValueError('codec name must be a non-empty str')
+        with self._lock:
+            self._encoders[cls] = (name.encode(), encode)
+            self._decoders[name.encode()] = decode
+
+    def unregister(self, cls):
+        """
+        Remove the codec for a type.
+
+        :param cls: The type.
+        :raises KeyError: If no codec is registered for it.
+        """
+        with self._lock:
+            name, _ = self._encoders.pop(cls)
+            del self._decoders[name]
+
+    def dumps(self, value, *, allow_pickle: Optional[bool] = None):
+        """
+        Encode a value.
+
+        :param value: The value.
+        :param allow_pickle: Overrides the registry's allow_pickle.
+        :return: The payload.
+        :raises TypeError: If a value has no codec and pickle is not allowed.
+        """
+        if allow_pickle is None:
+            allow_pickle = self.allow_pickle
+        out = bytearray(MAGIC)
+        encode = _ENCODERS.get(type(value))
+        if encode is not None:
+            encode(value, out)
+        else:
+            self._encode(value, out, allow_pickle)
+        return bytes(out)
+
+    def loads(self, data, *, allow_pickle: Optional[bool] = None):
+        """
+        Decode a payload.
+
+        :param data: The payload, as any bytes-like object.
+        :param allow_pickle: Overrides the registry's allow_pickle.  Payloads
+            written by pickle.dumps() are only loaded if it is True.
+        :return: The value.
+        :raises ValueError: If the payload is malformed, or needs pickle and
+            pickle is not allowed.
+        """
+        if allow_pickle is None:
+            allow_pickle = self.allow_pickle
+        if type(data) is not bytes:
+            # Indexing and slicing bytes is faster than a memoryview.
+            data = bytes(memoryview(data).cast('B'))
+        if not data:
+            raise ValueError('Empty payload')
+        if data[0] == _PICKLE_MAGIC:
+            if not allow_pickle:
+                raise ValueError('Refusing to load a pickle payload; pass allow_pickle=True '
+                                 'if it comes from a trusted source')
+            return pickle.loads(data)
+        if data[0] != MAGIC[0]:
+            raise ValueError('Not a serialized Poly payload')
+        try:
+            value, end = self._decode(data, 1, allow_pickle)
+        except (IndexError, struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f'Malformed payload: {e}') from None
+        except RecursionError:
+            raise ValueError('Malformed payload: nested too deeply') from None
+        if end != len(data):
+            raise ValueError('Malformed payload: trailing data')
+        return value
+
+    def _encode(self, value, out, allow_pickle):
+        # The built-in scalars are handled by _ENCODERS; this covers
+        # containers and everything that needs the registry.
+        cls = type(value)
+        encode = _ENCODERS.get(cls)
+        if encode is not None:
+            encode(value, out)
+        elif cls is list or cls is tuple:
+            if cls is list and len(value) >= _ARRAY_MIN:
+                # Homogeneous int or float lists are packed as arrays.
+                kinds = set(map(type, value))
+                if len(kinds) == 1:
+                    for array_tag in _ARRAY_TAGS.get(kinds.pop(), ()):
+                        try:
+                            packed = array(_ARRAY_CODES[array_tag], value)
+                        except OverflowError:
+                            continue
+                        if sys.byteorder != 'little':
+                            packed.byteswap()
+                        out.append(array_tag)
+                        _put_varint(out, len(value))
+                        out += packed.tobytes()
+                        return
+            out.append(_LIST if cls is list else _TUPLE)
+            _put_varint(out, len(value))
+            encoders = _ENCODERS
+            for item in value:
+                encode = encoders.get(type(item))
+                if encode is not None:
+                    encode(item, out)
+                else:
+                    self._encode(item, out, allow_pickle)
+        elif cls is dict:
+            out.append(_DICT)
+            _put_varint(out, len(value))
+            encoders = _ENCODERS
+            for key, item in value.items():
+                encode = encoders.get(type(key))
+                if encode is not None:
+                    encode(key, out)
+                else:
+                    self._encode(key, out, allow_pickle)
+                encode = encoders.get(type(item))
+                if encode is not None:
+                    encode(item, out)
+                else:
+                    self._encode(item, out, allow_pickle)
+        else:
+            codec = self._codec(cls)
+            if codec is not None:
+                name, encode = codec
+                raw = encode(value)
+                out.append(_CUSTOM)
+                _put_varint(out, len(name))
+                out += name
+                _put_varint(out, len(raw))
+                out += raw
+            elif hasattr(cls, _FIELDS):
+                names, get = _converters(cls)[:2]
+                path = f'{cls.__module__}:{cls.__qualname__}'.encode()
+                out.append(_LIQUID)
+                _put_varint(out, len(path))
+                out += path
+                _put_varint(out, len(names))
+                encoders = _ENCODERS
+                for item in get(value):
+                    encode = encoders.get(type(item))
+                    if encode is not None:
+                        encode(item, out)
+                    else:
+                        self._encode(item, out, allow_pickle)
+            elif allow_pickle:
+                raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                out.append(_PICKLE)
+                _put_varint(out, len(raw))
+                out += raw
+            else:
+                raise TypeError(f'No codec for {cls.__qualname__}; register one, '
+                                f'or pass allow_pickle=True')
+
+    def _codec(self, cls):
+        codec = self._encoders.get(cls)
+        if codec is None and self._encoders:
+            for base in cls.__mro__[1:]:
+                codec = self._encoders.get(base)
+                if codec is not None:
+                    break
+        return codec
+
+    def _decode(self, data, pos, allow_pickle):
+        tag = data[pos]
+        decode = _DECODERS[tag]
+        if decode is not None:
+            return decode(data, pos + 1)
+        pos += 1
+        if tag == _LIST or tag == _TUPLE:
+            n, pos = _get_varint(data, pos)
+            items = []
+            append = items.append
+            decoders = _DECODERS
+            for _ in range(n):
+                decode = decoders[data[pos]]
+                if decode is not None:
+                    item, pos = decode(data, pos + 1)
+                else:
+                    item, pos = self._decode(data, pos, allow_pickle)
+                append(item)
+            return (items if tag == _LIST else tuple(items)), pos
+        if tag == _DICT:
+            n, pos = _get_varint(data, pos)
+            result = {}
+            decoders = _DECODERS
+            for _ in range(n):
+                decode = decoders[data[pos]]
+                if decode is not None:
+                    key, pos = decode(data, pos + 1)
+                else:
+                    key, pos = self._decode(data, pos, allow_pickle)
+                decode = decoders[data[pos]]
+                if decode is not None:
+                    result[key], pos = decode(data, pos + 1)
+                else:
+                    result[key], pos = self._decode(data, pos, allow_pickle)
+            return result, pos
+        if tag in _ARRAY_CODES:
+            packed = array(_ARRAY_CODES[tag])
+            n, pos = _get_varint(data, pos)
+            end = _end(data, pos, packed.itemsize * n)
+            packed.frombytes(data[pos:end])
+            if sys.byteorder != 'little':
+                packed.byteswap()
+            return packed.tolist(), end
+        if tag == _CUSTOM:
+            n, pos = _get_varint(data, pos)
+            end = _end(data, pos, n)
+            name = data[pos:end]
+            n, pos = _get_varint(data, end)
+            end = _end(data, pos, n)
+            decode = self._decoders.get(name)
+            if decode is None:
+                raise ValueError(f'No codec registered under {name.decode(errors="replace")!r}')
+            return decode(data[pos:end]), end
+        if tag == _LIQUID:
+            n, pos = _get_varint(data, pos)
+            end = _end(data, pos, n)
+            cls = _liquid_class(data[pos:end].decode())
+            n, pos = _get_varint(data, end)
+            names = _converters(cls)[0]
+            if n != len(names):
+                raise ValueError(f'{cls.__qualname__} has {len(names)} fields, '
+                                 f'the payload has {n}')
+            # Fill the instance in directly, as pickle does: __init__
+            # and __post_init__ are not run again.
+            obj = object.__new__(cls)
+            decoders = _DECODERS
+            for name in names:
+                decode = decoders[data[pos]]
+                if decode is not None:
+                    value, pos = decode(data, pos + 1)
+                else:
+                    value, pos = self._decode(data, pos, allow_pickle)
+                try:
+                    object.__setattr__(obj, name, value)
+                except TypeError as e:
+                    # A validate=True liquid refused the value.
+                    raise ValueError(f'Malformed payload: {e}') from None
+            return obj, pos
+        if tag == _PICKLE:
+            n, pos = _get_varint(data, pos)
+            end = _end(data, pos, n)
+            if not allow_pickle:
+                raise ValueError('Refusing to load a pickled value; pass allow_pickle=True '
+                                 'if the payload comes from a trusted source')
+            return pickle.loads(data[pos:end]), end
+        raise ValueError(f'Unknown tag {tag:#04x}')
+
+
+# The registry Poly.serialize() and Poly.deserialize() use.
+default_codecs = CodecRegistry()
+
+
+def _put_varint(out, n):
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(data, pos):
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    n = byte & 0x7f
+    shift = 7
+    while True:
+        pos += 1
+        byte = data[pos]
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos + 1
+        shift += 7
+        if shift > 70:
+            raise ValueError('Malformed payload: varint too long')
+
+
+def _end(data, pos, n):
+    end = pos + n
+    if end > len(data):
+        raise ValueError('Malformed payload: truncated')
+    return end
+
+
+def _liquid_class(path):
+    # Only classes in modules that are already imported: looking a class
+    # up must never import (and so run) anything.
+    module_name, _, qualname = path.partition(':')
+    obj = sys.modules.get(module_name)
+    for part in qualname.split('.'):
+        obj = getattr(obj, part, None)
+    if not isinstance(obj, type) or not hasattr(obj, _FIELDS):
+        raise ValueError(f'{path} is not a liquid class in an imported module')
+    return obj
+
+
+# Encoders and decoders for the built-in scalars.  Encoders append to
+# the output; decoders take the position after the tag and return
+# (value, end).  Containers and registered types go through the
+# registry instead.
+
+def _encode_none(value, out):
+    out.append(_NONE)
+
+
+def _encode_bool(value, out):
+    out.append(_TRUE if value else _FALSE)
+
+
+def _encode_int(value, out):
+    if 0 <= value < 64:
+        # Zigzag of a small non-negative int is a single varint byte.
+        out.append(_INT)
+        out.append(value << 1)
+    elif -(1 << 63) <= value < (1 << 63):
+        out.append(_INT)
+        # Zigzag, so small negative numbers stay short too.
+        _put_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+    else:
+        raw = value.to_bytes((value.bit_length() + 8) // 8, 'little', signed=True)
+        out.append(_BIG_INT)
+        _put_varint(out, len(raw))
+        out += raw
+
+
+def _encode_float(value, out):
+    out.append(_FLOAT)
+    out += _DOUBLE.pack(value)
+
+
+def _encode_str(value, out):
+    raw = value.encode('utf-8', 'surrogatepass')
+    out.append(_STR)
+    if len(raw) < 0x80:
+        out.append(len(raw))
+    else:
+        _put_varint(out, len(raw))
+    out += raw
+
+
+def _encode_bytes(value, out):
+    out.append(_BYTES)
+    _put_varint(out, len(value))
+    out += value
+
+
+_ENCODERS = {
+    type(None): _encode_none,
+    bool: _encode_bool,
+    int: _encode_int,
+    float: _encode_float,
+    str: _encode_str,
+    bytes: _encode_bytes,
+}
+
+
+def _decode_int(data, pos):
+    n = data[pos]
+    if n < 0x80:
+        pos += 1
+    else:
+        n, pos = _get_varint(data, pos)
+    return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+
+
+def _decode_big_int(data, pos):
+    n, pos = _get_varint(data, pos)
+    end = _end(data, pos, n)
+    return int.from_bytes(data[pos:end], 'little', signed=True), end
+
+
+def _decode_float(data, pos):
+    return _DOUBLE.unpack_from(data, pos)[0], pos + 8
+
+
+def _decode_str(data, pos):
+    n = data[pos]
+    if n < 0x80:
+        pos += 1
+    else:
+        n, pos = _get_varint(data, pos)
+    end = pos + n
+    if end > len(data):
+        raise ValueError('Malformed payload: truncated')
+    return data[pos:end].decode('utf-8', 'surrogatepass'), end
+
+
+def _decode_bytes(data, pos):
+    n, pos = _get_varint(data, pos)
+    end = _end(data, pos, n)
+    return data[pos:end], end
+
+
+# Indexed by tag; None means the registry decodes it.
+_DECODERS = [None] * 256
+_DECODERS[_NONE] = lambda data, pos: (None, pos)
+_DECODERS[_TRUE] = lambda data, pos: (True, pos)
+_DECODERS[_FALSE] = lambda data, pos: (False, pos)
+_DECODERS[_INT] = _decode_int
+_DECODERS[_BIG_INT] = _decode_big_int
+_DECODERS[_FLOAT] = _decode_float
+_DECODERS[_STR] = _decode_str
+_DECODERS[_BYTES] = _decode_bytes
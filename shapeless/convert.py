@@ -0,0 +1,250 @@
+import heapq
+import itertools
+import threading
+
+
+class ConversionPlan:
+    """
+    A compiled route from one type to another through registered converters.
+
+    Calling the plan runs each converter in turn on the value.
+
+    :param steps: The (source, target, converter) triples along the route.
+    :param cost: The total cost of the route.
+    """
+
+    __slots__ = ('steps', 'cost', '_run')
+
+    def __init__(self, steps, cost):
+        self.steps = tuple(steps)
+        self.cost = cost
+        self._run = _compile(tuple(func for _, _, func in self.steps))
+
+    def __call__(self, value):
+        return self._run(value)
+
+    def __repr__(self):
+        route = ' -> '.join(
+            [_name(self.steps[0][0])] + [_name(t) for _, t, _ in self.steps]
+        )
+        return f'ConversionPlan({route}, cost={self.cost})'
+
+
+class ConverterRegistry:
+    """
+    A registry of converters between types, used by Poly.shift().
+
+    Converters are edges in a graph of types.  Shifting a value looks for
+    the cheapest chain of converters from type(value) to the target and
+    compiles it into a ConversionPlan.  Plans are cached per
+    (type(value), target); pairs with no registered route are cached too,
+    so a hot loop never searches the graph twice.  Both caches are bounded
+    and evict their oldest entries first.  Registering or removing a
+    converter drops every cached plan.
+
+    A converter signals that a value cannot be converted by raising
+    ValueError, just like int("x") does.
+
+    ###### USAGE EXAMPLES ######
+
+    ```
+    from decimal import Decimal
+    from shapeless import Poly, converters
+
+    converters.register(bytes, str, lambda b: b.decode())
+    converters.register(str, Decimal, Decimal)
+
+    Poly(b"1.5").shift(Decimal)  # Decimal('1.5'), via bytes -> str -> Decimal
+    ```
+
+    :param maxsize: The maximum number of cached plans.
+    :param negative_maxsize: The maximum number of cached failed lookups.
+    """
+
+    def __init__(self, maxsize: int = 1024, negative_maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.negative_maxsize = negative_maxsize
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self._edges = {}
+        self._plans = {}
+        self._negative = {}
+        self._lock = threading.RLock()
+
+    def register(self, source, target, converter=None, *, cost: int = 1):
+        """
+        Register a converter from source to target.
+
+        Can be used directly or as a decorator:
+
+            @converters.register(bytes, str)
+            def decode(b):
+                return b.decode()
+
+        :param source: The type the converter accepts.  Subclasses match too.
+        :param target: The type the converter produces.
+        :param converter: The converter, a one-argument callable.
+        :param cost: The cost of this step when comparing routes. Default is 1.
+        :return: The converter.
+        """
+        if converter is None:
+            return lambda converter: self.register(source, target, converter, cost=cost)
+        if cost < 0:
+            raise ValueError('converter cost must not be negative')
+        with self._lock:
+            self._edges.setdefault(source, {})[target] = (converter, cost)
+            self.clear_cache()
+        return converter
+
+    def unregister(self, source, target):
+        """
+        Remove the converter from source to target.
+
+        :param source: The source type.
+        :param target: The target type.
+        :raises KeyError: If no such converter is registered.
+        """
+        with self._lock:
+            del self._edges[source][target]
+            if not self._edges[source]:
+                del self._edges[source]
+            self.clear_cache()
+
+    def plan(self, source, target):
+        """
+        Get the cached plan from source to target, searching on a miss.
+
+        :param source: The source type.
+        :param target: The target type.
+        :return: A ConversionPlan, or None if no registered route exists.
+        """
+        key = (source, target)
+        plan = self._plans.get(key)
+        if plan is not None:
+            self.hits += 1
+            return plan
+        if key in self._negative:
+            self.negative_hits += 1
+            return None
+        with self._lock:
+            self.misses += 1
+            plan = self._search(source, target)
+            if plan is None:
+                _bounded_put(self._negative, key, True, self.negative_maxsize)
+            else:
+                _bounded_put(self._plans, key, plan, self.maxsize)
+            return plan
+
+    def convert(self, value, target):
+        """
+        Convert a value to the target type.
+
+        Uses the cheapest registered route, or target(value) if there is none.
+
+        :param value: The value to convert.
+        :param target: The target type.
+        :return: The converted value.
+        :raises ValueError: If the value cannot be converted.
+        """
+        if not self._edges:
+            return target(value)
+        plan = self.plan(type(value), target)
+        if plan is None:
+            return target(value)
+        return plan(value)
+
+    def clear_cache(self):
+        """
+        Drop every cached plan and failed lookup.
+        """
+        with self._lock:
+            self._plans.clear()
+            self._negative.clear()
+
+    def cache_info(self):
+        """
+        Get the cache statistics.
+
+        :return: A dict with hits, misses, negative hits and cache sizes.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'negative_hits': self.negative_hits,
+            'size': len(self._plans),
+            'maxsize': self.maxsize,
+            'negative_size': len(self._negative),
+            'negative_maxsize': self.negative_maxsize,
+        }
+
+    def _search(self, source, target):
+        # Dijkstra over the registered edges.  A node's outgoing edges
+        # are those registered for any class in its MRO, so a converter
+        # for int also applies to bool.
+        tie = itertools.count()
+        queue = [(0, next(tie), source, ())]
+        best = {source: 0}
+        while queue:
+            cost, _, node, path = heapq.heappop(queue)
+            if path and _reaches(node, target):
+                return ConversionPlan(path, cost)
+            if cost > best.get(node, cost):
+                continue
+            for step_target, (func, step_cost) in self._outgoing(node):
+                step_total = cost + step_cost
+                if step_total < best.get(step_target, step_total + 1):
+                    best[step_target] = step_total
+                    heapq.heappush(queue, (step_total, next(tie), step_target,
+                                           path + ((node, step_target, func),)))
+        return None
+
+    def _outgoing(self, node):
+        seen = set()
+        for cls in getattr(node, '__mro__', (node,)):
+            for step_target, edge in self._edges.get(cls, {}).items():
+                if step_target not in seen:
+                    seen.add(step_target)
+                    yield step_target, edge
+
+
+# The registry Poly.shift() converts through.
+converters = ConverterRegistry()
+
+
+def _reaches(node, target):
+    if node is target:
+        return True
+    try:
+        return issubclass(node, target)
+    except TypeError:
+        return False
+
+
+def _bounded_put(cache, key, value, maxsize):
+    # Dicts keep insertion order, so the first key is the oldest.
+    while len(cache) >= maxsize > 0:
+        del cache[next(iter(cache))]
+    if maxsize > 0:
+        cache[key] = value
+
+
+def _compile(funcs):
+    if len(funcs) == 1:
+        return funcs[0]
+    if len(funcs) == 2:
+        first, second = funcs
+
+        def run(value):
+            return second(first(value))
+        return run
+
+    def run(value):
+        for func in funcs:
+            value = func(value)
+        return value
+    return run
+
+
+def _name(tp):
+    return getattr(tp, '__name__', repr(tp))
@@ -0,0 +1,428 @@
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+from shapeless.liquid import FrozenInstanceError, fields, is_liquid
+
+# Field annotation -> column dtype.  Fields with any other annotation
+# are stored in object columns.
+_NUMERIC_DTYPES = {
+    int: 'int64',
+    float: 'float64',
+    complex: 'complex128',
+    bool: 'bool',
+}
+
+# Native column dtype -> the Python types stored into it as they are.
+# Object columns take anything.
+_SCALAR_TYPES = {
+    np.dtype('int64'): (int,),
+    np.dtype('float64'): (float, int),
+    np.dtype('complex128'): (complex, float, int),
+    np.dtype('bool'): (bool,),
+    np.dtype(object): None,
+} if np is not None else {}
+
+# float64 (and complex128) hold every int up to this size exactly.
+_MAX_EXACT_INT = 2 ** 53
+
+# The smallest capacity a column grows to.
+MIN_CAPACITY = 16
+
+
+class LiquidFrame:
+    """
+    Many instances of one liquid class, stored column by column.
+
+    Every field of the class becomes a NumPy column: int, float, complex
+    and bool fields (and fields annotated with a NumPy scalar type) get a
+    native dtype, everything else an object column.  A native column
+    that is handed a value its dtype can't hold exactly (None, a str,
+    an int too big for int64, or for the mantissa of a float column)
+    turns into an object column instead of losing the value.
+
+    Columns grow geometrically, so appending one row at a time is
+    cheap.  Indexing the frame with a position gives a LiquidRow, a
+    lightweight view that reads and writes the columns; indexing it with
+    a field name gives that column.  Filtering with a boolean mask,
+    sorting and slicing return new frames.
+
+    LiquidFrame requires NumPy.
+
+    ###### USAGE EXAMPLES ######
+
+    ```
+    from shapeless import LiquidFrame, liquid
+
+    @liquid
+    class Trade:
+        symbol: str
+        price: float
+        size: int
+
+    trades = LiquidFrame(Trade, [Trade("A", 10.5, 100), Trade("B", 3.0, 5)])
+    trades.append(Trade("C", 7.25, 40))
+
+    big = trades[trades["size"] > 10].sort("price")
+    print(big[0].symbol)         # C
+    print(big.to_instances())    # [Trade(symbol='C', ...), Trade(symbol='A', ...)]
+    ```
+    """
+
+    __slots__ = ('cls', '_fields', '_columns', '_size', '_capacity')
+
+    def __init__(self, cls, rows=(), *, capacity: int = 0):
+        """
+        Initialize a new LiquidFrame object.
+
+        :param cls: The liquid class of the rows.
+        :param rows: Instances of cls to start with.
+        :param capacity: The number of rows to allocate room for up front.
+        """
+        if np is None:
+            raise ImportError("LiquidFrame requires numpy: pip install numpy")
+        if not isinstance(cls, type) or not is_liquid(cls):
+            raise TypeError(f"LiquidFrame needs a liquid class, not {cls!r}")
+        self.cls = cls
+        self._fields = fields(cls)
+        self._columns = {f.name: np.empty(capacity, dtype=_column_dtype(f.type.data))
+                         for f in self._fields}
+        self._size = 0
+        self._capacity = capacity
+        self.extend(rows)
+
+    @classmethod
+    def from_columns(cls, liquid_cls, columns):
+        """
+        Build a frame straight from columns.
+
+        :param liquid_cls: The liquid class of the rows.
+        :param columns: A mapping of every field name to a sequence or array
+            of its values.  All columns must have the same length.
+        :return: A new LiquidFrame.
+        """
+        names = [f.name for f in fields(liquid_cls)]
+        missing = set(names) - set(columns)
+        if missing:
+            raise TypeError(f"Missing columns: {', '.join(sorted(missing))}")
+        lengths = {len(columns[name]) for name in names}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length")
+        n = lengths.pop() if lengths else 0
+        frame = cls(liquid_cls, capacity=n)
+        for name in names:
+            frame._store(name, 0, columns[name])
+        frame._size = n
+        return frame
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for index in range(self._size):
+            yield LiquidRow(self, index)
+
+    def __repr__(self):
+        return f"LiquidFrame({self.cls.__qualname__}, {self._size} rows)"
+
+    def __getitem__(self, key):
+        """
+        Get a row, a column or a new frame.
+
+        :param key: An int for a LiquidRow, a field name for that column (a
+            view: writing to it writes to the frame), or a slice, boolean
+            mask or array of positions for a new frame with those rows.
+        """
+        if isinstance(key, str):
+            return self.column(key)
+        if isinstance(key, (int, np.integer)):
+            return LiquidRow(self, self._position(key))
+        if isinstance(key, slice):
+            return self.take(np.arange(self._size)[key])
+        key = np.asarray(key)
+        if key.dtype.kind == 'b':
+            return self.filter(key)
+        return self.take(key)
+
+    def column(self, name: str):
+        """
+        Get a column.
+
+        :param name: The field name.
+        :return: A view of the column's values.  Writing to it writes to the
+            frame.
+        """
+        try:
+            return self._columns[name][:self._size]
+        except KeyError:
+            raise KeyError(f"{self.cls.__qualname__} has no field {name!r}") from None
+
+    @property
+    def columns(self):
+        """
+        The columns, as a dict of field name to column view.
+        """
+        return {name: column[:self._size] for name, column in self._columns.items()}
+
+    def append(self, row):
+        """
+        Append one instance.
+
+        :param row: An instance of the frame's class, or a LiquidRow of one.
+        """
+        row_cls = row._frame.cls if type(row) is LiquidRow else type(row)
+        if row_cls is not self.cls:
+            raise TypeError(f"Expected a {self.cls.__qualname__} row, "
+                            f"got {type(row).__qualname__}")
+        self._reserve(1)
+        for f in self._fields:
+            self._store_one(f.name, self._size, getattr(row, f.name))
+        self._size += 1
+
+    def extend(self, rows):
+        """
+        Append many instances.
+
+        :param rows: An iterable of instances of the frame's class (or
+            LiquidRows of one).
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        for row in rows:
+            row_cls = row._frame.cls if type(row) is LiquidRow else type(row)
+            if row_cls is not self.cls:
+                raise TypeError(f"Expected a {self.cls.__qualname__} row, "
+                                f"got {type(row).__qualname__}")
+        self._reserve(len(rows))
+        for f in self._fields:
+            name = f.name
+            self._store(name, self._size, [getattr(row, name) for row in rows])
+        self._size += len(rows)
+
+    def filter(self, mask):
+        """
+        Get the rows where mask is True.
+
+        :param mask: A boolean array with one entry per row, for example
+            ``frame["price"] > 10``.
+        :return: A new LiquidFrame.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != (self._size,):
+            raise ValueError(f"Expected a mask of {self._size} values, got shape {mask.shape}")
+        return self.take(np.flatnonzero(mask))
+
+    def sort(self, by, *, reverse: bool = False):
+        """
+        Sort the rows by one or more fields.
+
+        The sort is stable: rows that compare equal keep their order, also
+        when reverse is True.
+
+        :param by: A field name, or a list of field names to sort by in turn.
+        :param reverse: If True, sort in descending order.
+        :return: A new LiquidFrame.
+        """
+        names = [by] if isinstance(by, str) else list(by)
+        order = np.arange(self._size)
+        # Sorting by the last key first and the first key last, each
+        # time stably, sorts by all keys at once.
+        for name in reversed(names):
+            values = self.column(name)[order]
+            if reverse:
+                # Rank the values, so that descending is an ascending sort
+                # of the negated ranks and ties stay in order.
+                _, ranks = np.unique(values, return_inverse=True)
+                values = -ranks.ravel()
+            order = order[np.argsort(values, kind='stable')]
+        return self.take(order)
+
+    def take(self, indices):
+        """
+        Get the rows at the given positions.
+
+        :param indices: An array of row positions.
+        :return: A new LiquidFrame.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        if len(indices) and (indices.max() >= self._size or indices.min() < -self._size):
+            raise IndexError("LiquidFrame index out of range")
+        frame = LiquidFrame(self.cls)
+        frame._columns = {name: column[:self._size][indices]
+                          for name, column in self._columns.items()}
+        frame._size = frame._capacity = len(indices)
+        return frame
+
+    def to_instances(self):
+        """
+        Convert every row to an instance of the frame's class.
+
+        The instances are filled in directly: __init__ and __post_init__
+        are not run again.
+
+        :return: A list of instances.
+        """
+        cls = self.cls
+        names = [f.name for f in self._fields]
+        columns = [self._columns[name][:self._size].tolist() for name in names]
+        new = object.__new__
+        setattr_ = object.__setattr__
+        instances = []
+        for values in zip(*columns) if columns else [()] * self._size:
+            instance = new(cls)
+            for name, value in zip(names, values):
+                setattr_(instance, name, value)
+            instances.append(instance)
+        return instances
+
+    @property
+    def nbytes(self):
+        """
+        The memory held by the columns' buffers (not by the objects in
+        object columns).
+        """
+        return sum(column.nbytes for column in self._columns.values())
+
+    def _position(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("LiquidFrame index out of range")
+        return int(index)
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, 2 * self._capacity, MIN_CAPACITY)
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+        self._capacity = capacity
+
+    def _store_one(self, name, index, value):
+        # _store() for a single value, without building an array for it.
+        column = self._columns[name]
+        accepted = _SCALAR_TYPES.get(column.dtype, ())
+        if (accepted is None or type(value) in accepted) and \
+                (type(value) is not int or column.dtype.kind == 'i'
+                 or -_MAX_EXACT_INT <= value <= _MAX_EXACT_INT):
+            try:
+                column[index] = value
+                return
+            except OverflowError:
+                pass
+        self._store(name, index, [value])
+
+    def _store(self, name, start, values):
+        # Write values into a column from position start on.  A native
+        # column that can't hold them exactly becomes an object column.
+        column = self._columns[name]
+        stop = start + len(values)
+        if column.dtype.kind != 'O':
+            try:
+                array = np.asarray(values)
+            except (ValueError, TypeError):
+                # Ragged nested sequences.
+                array = None
+            if array is not None and array.ndim == 1 and _fits(array, column.dtype):
+                column[start:stop] = array
+                return
+            column = self._columns[name] = column.astype(object)
+        if isinstance(values, np.ndarray) and values.dtype.kind == 'O':
+            column[start:stop] = values
+        else:
+            # fromiter() does not try to broadcast values that are lists.
+            column[start:stop] = np.fromiter(values, dtype=object, count=len(values))
+
+
+class LiquidRow:
+    """
+    A view of one row of a LiquidFrame.
+
+    Fields are read from and written to the frame's columns, so the view
+    stays in sync with the frame.  Rows of a frozen class are read-only.
+    Use to_instance() to get a real instance of the class.
+    """
+
+    __slots__ = ('_frame', '_index')
+
+    def __init__(self, frame: LiquidFrame, index: int):
+        object.__setattr__(self, '_frame', frame)
+        object.__setattr__(self, '_index', index)
+
+    def __getattr__(self, name):
+        try:
+            column = self._frame._columns[name]
+        except KeyError:
+            raise AttributeError(f"{self._frame.cls.__qualname__!r} object "
+                                 f"has no attribute {name!r}") from None
+        value = column[self._index]
+        return value if column.dtype.kind == 'O' else value.item()
+
+    def __setattr__(self, name, value):
+        frame = self._frame
+        if name not in frame._columns:
+            raise AttributeError(f"{frame.cls.__qualname__!r} object "
+                                 f"has no field {name!r}")
+        if frame.cls.__liquid_params__.frozen:
+            raise FrozenInstanceError(f"cannot assign to field {name!r}")
+        frame._store_one(name, self._index, value)
+
+    def __repr__(self):
+        values = ', '.join(f"{f.name}={getattr(self, f.name)!r}"
+                           for f in self._frame._fields if f.repr)
+        return f"{self._frame.cls.__qualname__}({values})"
+
+    def __eq__(self, other):
+        cls = self._frame.cls
+        if type(other) is LiquidRow:
+            if other._frame.cls is not cls:
+                return NotImplemented
+        elif type(other) is not cls:
+            return NotImplemented
+        return all(getattr(self, f.name) == getattr(other, f.name)
+                   for f in self._frame._fields if f.compare)
+
+    __hash__ = None
+
+    def to_instance(self):
+        """
+        Convert the row to an instance of the frame's class.
+
+        :return: The instance; __init__ and __post_init__ are not run again.
+        """
+        instance = object.__new__(self._frame.cls)
+        for f in self._frame._fields:
+            object.__setattr__(instance, f.name, getattr(self, f.name))
+        return instance
+
+
+def _column_dtype(annotation):
+    name = _NUMERIC_DTYPES.get(annotation)
+    if name is not None:
+        return np.dtype(name)
+    if isinstance(annotation, type) and issubclass(annotation, np.number) \
+            and annotation not in (np.number, np.integer, np.floating,
+                                   np.complexfloating, np.signedinteger,
+                                   np.unsignedinteger, np.inexact):
+        return np.dtype(annotation)
+    return np.dtype(object)
+
+
+def _fits(array, target):
+    # Can a column of dtype target hold the values of array exactly?
+    # Ints may go into float and complex columns, as they may be passed
+    # where a float is annotated, if the mantissa holds them all; bools
+    # only go into bool columns, so they come back as bools.
+    source = array.dtype
+    if source.kind == 'b':
+        return target.kind == 'b'
+    if source.kind in 'iu' and target.kind in 'fc':
+        # can_cast() calls int64 to float64 safe, but it rounds.
+        limit = 2 ** (np.finfo(target).nmant + 1)
+        return array.size == 0 or -limit <= array.min() and array.max() <= limit
+    return np.can_cast(source, target, casting='safe')
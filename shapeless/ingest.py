@@ -0,0 +1,474 @@
+import contextlib
+import csv
+import itertools
+import json
+import os
+
+from shapeless.convert import converters
+from shapeless.liquid import (
+    _FIELD,
+    _FIELD_INITVAR,
+    _FIELDS,
+    _HAS_DEFAULT_FACTORY,
+    MISSING,
+    _coerce_target,
+    _create_fn,
+    is_liquid,
+)
+
+ERROR_MODES = ('raise', 'skip', 'collect')
+
+# Rows are read, converted and built this many at a time.
+BATCH_SIZE = 10_000
+
+# Exceptions that mean a row is bad, rather than the reader or the class.
+_ROW_ERRORS = (ValueError, TypeError, KeyError, IndexError, ArithmeticError)
+
+# Read files in big chunks: most of the time goes into parsing lines, and
+# fewer, larger reads keep the file layer out of the profile.
+_READ_BUFFER = 1 << 20
+
+_DECODER = json.JSONDecoder()
+_LINE_ENDS = ('\n', '\r\n')
+
+_TRUE = frozenset(('true', 't', 'yes', 'y', 'on', '1'))
+_FALSE = frozenset(('false', 'f', 'no', 'n', 'off', '0', ''))
+
+# The usual spellings of the above, looked up inline by the generated
+# code before falling back to _parse_bool().
+_BOOL_TEXT = {
+    spelling: value
+    for words, value in ((_TRUE, True), (_FALSE, False))
+    for word in words
+    for spelling in (word, word.upper(), word.title())
+}
+
+
+class RowError(ValueError):
+    """
+    A row of an ingested file that could not be turned into an instance.
+
+    :ivar row: The line number (1-based) the row starts on.
+    :ivar raw: The row as read: a list of strings for CSV, the decoded
+        object (or the undecodable line) for JSON lines.
+
+    The exception the row raised is chained as ``__cause__``.
+    """
+
+    def __init__(self, row, message, raw=None):
+        super().__init__(f"row {row}: {message}")
+        self.row = row
+        self.raw = raw
+
+
+def _parse_bool(text):
+    # bool('false') is True, which is never what a file means.
+    folded = text.strip().lower()
+    if folded in _TRUE:
+        return True
+    if folded in _FALSE:
+        return False
+    raise ValueError(f"invalid literal for bool: {text!r}")
+
+
+# Target -> parser for text values, where target(text) is wrong.
+_TEXT_PARSERS = {bool: _parse_bool}
+
+
+def _text_converter(target, optional):
+    # A function from a CSV cell to the field's type, or None if the
+    # cell is stored as it is.  An empty cell is None for Optional fields.
+    if target is str:
+        parse = None
+    else:
+        parse = converters.plan(str, target) or _TEXT_PARSERS.get(target) or target
+    if not optional:
+        return parse
+    if parse is None:
+        return lambda text: text or None
+    return lambda text: parse(text) if text else None
+
+
+def _value_converter(target, optional):
+    # A function from a decoded JSON value to the field's type: values
+    # of the right type (and None, for Optional fields) are kept, and
+    # strings are parsed as in CSV cells where target(text) is wrong.
+    convert = converters.convert
+    parse = _TEXT_PARSERS.get(target)
+
+    def to_field(value):
+        if isinstance(value, target) or (optional and value is None):
+            return value
+        if parse is not None and isinstance(value, str):
+            return parse(value)
+        return convert(value, target)
+    return to_field
+
+
+def _bad_width(row, width):
+    raise ValueError(f"expected {width} columns, got {len(row)}")
+
+
+def _row_starts(rows, line):
+    # The line each row starts on, given the line before the first, for
+    # batches with rows that span several lines (quoted newlines) or
+    # blank lines, which csv.reader() gives as [] and are dropped.
+    kept = []
+    starts = []
+    for row in rows:
+        if row:
+            kept.append(row)
+            starts.append(line + 1)
+            line += 1 + sum(cell.count('\n') for cell in row)
+        else:
+            line += 1
+    return kept, starts
+
+
+def _init_params(cls):
+    # The fields that are __init__ parameters, in order.
+    return [f for f in getattr(cls, _FIELDS).values()
+            if f._field_type in (_FIELD, _FIELD_INITVAR) and f.init]
+
+
+def _field_target(cls, f):
+    # (target, optional) to convert the field's values to, or None.
+    # InitVar[...] does not keep its type, so InitVars are passed as read.
+    if f._field_type is _FIELD_INITVAR:
+        return None
+    return _coerce_target(cls, f)
+
+
+def _default(f):
+    # What to pass for a parameter the file has no value for: the
+    # generated __init__ calls default_factory when handed the sentinel.
+    if f.default is not MISSING:
+        return f.default
+    if f.default_factory is not MISSING:
+        return _HAS_DEFAULT_FACTORY
+    return MISSING
+
+
+class LiquidReader:
+    """
+    Stream the rows of a CSV or JSON lines file into liquid instances.
+
+    The columns (or JSON keys) are matched to the __init__ parameters of
+    the class once, by name, and a loop that converts every value and
+    collects the arguments is generated for that mapping.  Each value is
+    converted according to its field's annotation: int, float, bool,
+    Decimal, Optional[...] and any class with a route in
+    ``shapeless.converters``.  Other annotations get the value as it is.
+    Columns with no field are ignored; fields with no column get their
+    default.
+
+    The file is read batch_size rows at a time and every batch is built
+    with ``cls.from_records()``, so memory stays bounded by the batch
+    however big the file is.  Iterate over the reader for instances, or
+    over ``reader.batches()`` for lists of them.
+
+    Bad rows (values that don't convert, missing fields, the wrong
+    number of columns, instances the class refuses) are handled per the
+    errors argument: 'raise' raises a RowError after the rows before it
+    have been yielded, 'skip' drops them, and 'collect' drops them and
+    keeps their RowError in ``reader.errors``.  RowError.row is the line
+    the row starts on.
+
+    ###### USAGE EXAMPLES ######
+
+    ```
+    from shapeless import liquid, read_csv, read_jsonl
+
+    @liquid
+    class Trade:
+        symbol: str
+        price: float
+        size: int = 0
+
+    for trade in read_csv(Trade, "trades.csv"):
+        print(trade.price * trade.size)
+
+    reader = read_jsonl(Trade, "trades.jsonl", errors="collect")
+    for batch in reader.batches():
+        print(len(batch))
+    for error in reader.errors:
+        print(error.row, error)     # 12 row 12: could not convert string to float: 'n/a'
+    ```
+    """
+
+    def __init__(self, cls, source, format='csv', *, batch_size: int = BATCH_SIZE,
+                 errors: str = 'raise', encoding: str = 'utf-8', columns=None,
+                 **fmtparams):
+        """
+        Initialize a new LiquidReader object.
+
+        :param cls: The liquid class to build.
+        :param source: A path, or an iterable of lines such as an open file.
+        :param format: 'csv' or 'jsonl'.
+        :param batch_size: The number of rows read and built at a time.
+        :param errors: 'raise', 'skip' or 'collect'; see above.
+        :param encoding: The encoding of the file, if source is a path.
+        :param columns: CSV only: the column names, for a file with no
+            header row.  Default is to read them from the first row.
+        :param fmtparams: CSV only: passed to csv.reader(), e.g. delimiter.
+        :raises TypeError: If cls is not a liquid class.
+        :raises ValueError: If format or errors is not one of the above.
+        """
+        if not (is_liquid(cls) and isinstance(cls, type)):
+            raise TypeError(f"{cls!r} is not a liquid class")
+        if format not in ('csv', 'jsonl'):
+            raise ValueError(f"format must be 'csv' or 'jsonl', not {format!r}")
+        if errors not in ERROR_MODES:
+            raise ValueError(f"errors must be one of {ERROR_MODES}, not {errors!r}")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if format == 'jsonl' and (columns is not None or fmtparams):
+            raise TypeError("columns and CSV format parameters only apply to CSV")
+        self.cls = cls
+        self.source = source
+        self.format = format
+        self.batch_size = batch_size
+        self.on_error = errors
+        self.encoding = encoding
+        self.columns = columns
+        self.fmtparams = fmtparams
+        self.errors = []
+        self.skipped = 0
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from batch
+
+    def batches(self):
+        """
+        Read the file, yielding lists of up to batch_size instances.
+
+        :raises RowError: On the first bad row, if errors is 'raise'.
+        :raises ValueError: If a required field has no CSV column.
+        """
+        read = self._read_csv if self.format == 'csv' else self._read_jsonl
+        with self._open() as lines:
+            for chunk in read(lines):
+                batch, error = self._build(*chunk)
+                if batch:
+                    yield batch
+                if error is not None:
+                    raise error
+
+    def _build(self, build, rows, starts, clean):
+        # Build a batch, and return it with the error to raise after it
+        # is yielded (or None).  Each row is built once, so that
+        # __post_init__ never runs twice: if one fails, the instances
+        # before it are kept and the rows after it are salvaged.
+        built = []
+        if clean:
+            try:
+                records = build(rows)
+            except _ROW_ERRORS:
+                # A value failed to convert; nothing was built yet.
+                records = None
+            if records is not None:
+                try:
+                    # extend() keeps what the generator yielded before
+                    # it raised.
+                    built.extend(self.cls.from_records(records, iterator=True))
+                    return built, None
+                except _ROW_ERRORS as e:
+                    done = len(built)
+                    error = self._fail(starts[done], e, rows[done])
+                    if error is not None:
+                        return built, error
+                    rows, starts = rows[done + 1:], starts[done + 1:]
+        return self._salvage(build, rows, starts, built)
+
+    def _open(self):
+        if isinstance(self.source, (str, bytes, os.PathLike)):
+            return open(self.source, encoding=self.encoding, newline='',
+                        buffering=_READ_BUFFER)
+        # An open file or other iterable of the caller's: leave it open.
+        return contextlib.nullcontext(self.source)
+
+    def _read_csv(self, lines):
+        reader = csv.reader(lines, **self.fmtparams)
+        columns = self.columns
+        if columns is None:
+            columns = next(reader, None)
+            if columns is None:
+                return
+        build = self._csv_builder(columns)
+        size = self.batch_size
+        end = reader.line_num
+        while True:
+            rows = list(itertools.islice(reader, size))
+            if not rows:
+                return
+            begin, end = end, reader.line_num
+            if end - begin == len(rows):
+                # One line per row and no blank lines: the usual case.
+                starts = range(begin + 1, end + 1)
+            else:
+                rows, starts = _row_starts(rows, begin)
+            if rows:
+                yield build, rows, starts, True
+
+    def _read_jsonl(self, lines):
+        build = self._jsonl_builder()
+        # The decoder's scanner parses a line without the wrappers
+        # json.loads() puts around it.  Lines it doesn't take whole
+        # (blank, padded, bytes or broken) go to json.loads().
+        scan = _DECODER.scan_once
+        loads = json.loads
+        size = self.batch_size
+        rows = []
+        starts = []
+        clean = True
+        for number, line in enumerate(lines, 1):
+            try:
+                row, end = scan(line, 0)
+                whole = end == len(line) or line[end:] in _LINE_ENDS
+            except (StopIteration, ValueError, TypeError):
+                whole = False
+            if not whole:
+                try:
+                    row = loads(line)
+                except ValueError as e:
+                    if not line.strip():
+                        continue
+                    # Keep the line's place, so that its error is
+                    # reported in order with the others.
+                    row = _Undecodable(line, e)
+                    clean = False
+            rows.append(row)
+            starts.append(number)
+            if len(rows) == size:
+                yield build, rows, starts, clean
+                rows = []
+                starts = []
+                clean = True
+        if rows:
+            yield build, rows, starts, clean
+
+    def _csv_builder(self, columns):
+        # Generate a function from a list of CSV rows to a list of
+        # __init__ argument tuples.
+        index = {}
+        for i, name in enumerate(columns):
+            index.setdefault(name, i)
+        globals = {'_bad_width': _bad_width, '_width': len(columns)}
+        items = []
+        for n, f in enumerate(_init_params(self.cls)):
+            if f.name not in index:
+                default = _default(f)
+                if default is MISSING:
+                    raise ValueError(f"No column for the required field {f.name!r} "
+                                     f"of {self.cls.__name__}")
+                globals[f'_k{n}'] = default
+                items.append(f'_k{n}')
+                continue
+            value = f'row[{index[f.name]}]'
+            target = _field_target(self.cls, f)
+            convert = _text_converter(*target) if target is not None else None
+            if convert is _parse_bool:
+                globals[f'_b{n}'] = _BOOL_TEXT
+                globals[f'_c{n}'] = convert
+                value = f'(_b{n}[{value}] if {value} in _b{n} else _c{n}({value}))'
+            elif convert is not None:
+                globals[f'_c{n}'] = convert
+                value = f'_c{n}({value})'
+            items.append(value)
+        # _bad_width() raises, so the filter only lets through rows of
+        # the right width.
+        return _create_fn('__build__', ('rows',), [
+            f'return [({",".join(items)},) for row in rows '
+            f'if len(row)==_width or _bad_width(row,_width)]',
+        ], globals=globals)
+
+    def _jsonl_builder(self):
+        # Generate a function from a list of decoded JSON objects to a
+        # list of __init__ argument tuples.
+        globals = {}
+        items = []
+        for n, f in enumerate(_init_params(self.cls)):
+            value = f'row[{f.name!r}]'
+            target = _field_target(self.cls, f)
+            if target is not None:
+                # Values of exactly the field's type skip the call.
+                globals[f'_t{n}'] = target[0]
+                globals[f'_c{n}'] = _value_converter(*target)
+                value = f'({value} if type({value}) is _t{n} else _c{n}({value}))'
+            default = _default(f)
+            if default is not MISSING:
+                globals[f'_k{n}'] = default
+                value = f'({value} if {f.name!r} in row else _k{n})'
+            items.append(value)
+        return _create_fn('__build__', ('rows',), [
+            f'return [({",".join(items)},) for row in rows]',
+        ], globals=globals)
+
+    def _salvage(self, build, rows, starts, built):
+        # A batch failed, or holds undecodable lines: build its rows one
+        # at a time to find the bad ones, adding the instances to built.
+        # Returns built, and the error to raise (after yielding them) if
+        # errors is 'raise'.
+        from_records = self.cls.from_records
+        for row, start in zip(rows, starts):
+            if type(row) is _Undecodable:
+                error = self._fail(start, row.error, row.line)
+            else:
+                try:
+                    built.extend(from_records(build([row])))
+                    continue
+                except _ROW_ERRORS as e:
+                    error = self._fail(start, e, row)
+            if error is not None:
+                return built, error
+        return built, None
+
+    def _fail(self, row, error, raw):
+        # Record a bad row; return the RowError if it should be raised.
+        if isinstance(error, KeyError):
+            message = f"missing field {error.args[0]!r}"
+        else:
+            message = str(error) or type(error).__name__
+        row_error = RowError(row, message, raw)
+        row_error.__cause__ = error
+        if self.on_error == 'raise':
+            return row_error
+        self.skipped += 1
+        if self.on_error == 'collect':
+            self.errors.append(row_error)
+        return None
+
+
+class _Undecodable:
+    # A JSON line that failed to decode, in the batch in its place.
+    __slots__ = ('line', 'error')
+
+    def __init__(self, line, error):
+        self.line = line
+        self.error = error
+
+
+def read_csv(cls, source, **options):
+    """
+    Stream a CSV file into instances of a liquid class.
+
+    :param cls: The liquid class to build.
+    :param source: A path, or an iterable of lines such as an open file.
+    :param options: See LiquidReader.
+    :return: A LiquidReader.
+    """
+    return LiquidReader(cls, source, 'csv', **options)
+
+
+def read_jsonl(cls, source, **options):
+    """
+    Stream a JSON lines file (one object per line) into instances of a
+    liquid class.
+
+    :param cls: The liquid class to build.
+    :param source: A path, or an iterable of lines such as an open file.
+    :param options: See LiquidReader.
+    :return: A LiquidReader.
+    """
+    return LiquidReader(cls, source, 'jsonl', **options)
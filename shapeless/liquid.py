@@ -1,13 +1,22 @@
 #an experimental shapeless class wrapper that acts like a liquid
 #but transforms all the variables initialized into polymorphic variables
+import collections.abc
 import copy
+import functools
 import inspect
+import itertools
 import keyword
+import operator
 import re
 import sys
+import time
 import types
+import typing
+import weakref
 from typing import Any
+from shapeless.convert import converters
 from shapeless.main import Poly
+from shapeless.typecheck import _UNION_TYPES, compile_validator
 
 __all__ = ['liquid',
            'field',
@@ -20,6 +29,7 @@ __all__ = ['liquid',
            'asdict',
            'astuple',
            'make_liquid',
+           'make_liquids',
            'replace',
            'is_liquid',
            ]
@@ -189,6 +199,9 @@ _FIELDS = '__liquid_fields__'
 # @liquid.
 _PARAMS = '__liquid_params__'
 
+# The compiled asdict()/astuple() converters of a class, made on first use.
+_CONVERTERS = '__liquid_converters__'
+
 # The name of the function, that if it exists, is called at the end of
 # __init__.
 _POST_INIT_NAME = '__post_init__'
@@ -363,7 +376,8 @@ def _create_fn(
         *, 
         globals=None, 
         locals=None,
-        return_type=MISSING
+        return_type=MISSING,
+        is_async=False
     ):
     # Note that we mutate locals when exec() is called.  Caller
     # beware!  The only callers are internal to this module, so no
@@ -378,27 +392,42 @@ def _create_fn(
     body = '\n'.join(f' {b}' for b in body)
 
     # Compute the text of the entire function.
-    txt = f'def {name}({args}){return_annotation}:\n{body}'
+    txt = f'{"async " if is_async else ""}def {name}({args}){return_annotation}:\n{body}'
 
-    exec(txt, globals, locals)
+    exec(_compile_fn(txt), globals, locals)
     return locals[name]
 
 
-def _field_assign(frozen, name, value, self_name):
+# The text of a generated function only depends on the shape of the
+# class: field names, which fields have defaults or factories, and the
+# decorator flags.  The values themselves (defaults, factories, types,
+# the class) are looked up by name in globals and locals.  So identical
+# shapes can share one compiled code object, and exec() just runs the
+# def statement again to bind it to the new names.
+@functools.lru_cache(maxsize=4096)
+def _compile_fn(txt):
+    return compile(txt, '<liquid>', 'exec')
+
+
+def _field_assign(frozen, name, value, self_name, direct=False):
     # If we're a frozen class, then assign to our fields in __init__
     # via object.__setattr__.  Otherwise, just use a simple
-    # assignment.
+    # assignment.  With direct, the value has already been checked:
+    # store it in the instance __dict__, past the typed field
+    # descriptor.
     #
     # self_name is what "self" is called in this function: don't
     # hard-code "self", since that might be a field name.
+    if direct:
+        return f'{self_name}.__dict__[{name!r}]={value}'
     if frozen:
         return f'object.__setattr__({self_name},{name!r},{value})'
     return f'{self_name}.{name}={value}'
 
 
-def _field_init(f, frozen, globals, self_name):
+def _field_init(f, frozen, globals, self_name, direct=False, slots=False):
     # Return the text of the line in the body of __init__ that will
-    # initialize this field.
+    # initialize this field.  See _field_assign() for direct.
 
     default_name = f'_dflt_{f.name}'
     if f.default_factory is not MISSING:
@@ -435,6 +464,12 @@ def _field_init(f, frozen, globals, self_name):
             elif f.default is not MISSING:
                 globals[default_name] = f.default
                 value = f.name
+        elif (direct or slots) and f.default is not MISSING:
+            # The class attribute that would hold the default is the
+            # typed field descriptor or, with slots, the slot itself,
+            # so store the default explicitly.
+            globals[default_name] = f.default
+            value = default_name
         else:
             # This field does not need initialization.  Signify that
             # to the caller by returning None.
@@ -447,7 +482,49 @@ def _field_init(f, frozen, globals, self_name):
         return None
 
     # Now, actually generate the field assignment.
-    return _field_assign(frozen, f.name, value, self_name)
+    return _field_assign(frozen, f.name, value, self_name, direct)
+
+
+def _field_check(f, descriptor, globals, self_name):
+    # Return the text of the line in the body of __init__ that checks
+    # the value passed for this field.  Defaults are not checked.
+    globals[f'_chk_{f.name}'] = descriptor.check
+    globals[f'_fld_{f.name}'] = descriptor
+    test = f'not _chk_{f.name}({f.name})'
+    if descriptor.exact is not None:
+        globals[f'_typ_{f.name}'] = descriptor.exact
+        test = f'type({f.name}) is not _typ_{f.name} and {test}'
+    if f.default_factory is not MISSING:
+        test = f'{f.name} is not _HAS_DEFAULT_FACTORY and {test}'
+    elif f.default is not MISSING:
+        test = f'{f.name} is not _dflt_{f.name} and {test}'
+    return f'if {test}: _fld_{f.name}.invalid({self_name},{f.name})'
+
+
+def _field_coerce(f, target, optional, globals):
+    # Return the lines in the body of __init__ that shift the value
+    # passed for this field to target, if it isn't one already, the way
+    # Poly.shift() does.  Defaults are left alone, and so is None for an
+    # Optional field.
+    globals[f'_cto_{f.name}'] = target
+    globals['_convert'] = converters.convert
+    globals['_coerce_failed'] = _coerce_failed
+    test = f'type({f.name}) is not _cto_{f.name} and not isinstance({f.name},_cto_{f.name})'
+    if optional:
+        test = f'{f.name} is not None and {test}'
+    if f.default_factory is not MISSING:
+        test = f'{f.name} is not _HAS_DEFAULT_FACTORY and {test}'
+    elif f.default is not MISSING:
+        test = f'{f.name} is not _dflt_{f.name} and {test}'
+    return [f'if {test}:',
+            ' try:',
+            f'  {f.name}=_convert({f.name},_cto_{f.name})',
+            ' except (ValueError,TypeError):',
+            f'  _coerce_failed({f.name!r},{f.name},_cto_{f.name})']
+
+
+def _coerce_failed(name, value, target):
+    raise TypeError(f'Cannot shape shift {value} to {target} (field {name!r})') from None
 
 
 def _init_param(f):
@@ -469,30 +546,21 @@ def _init_param(f):
     return f'{f.name}:_type_{f.name}{default}'
 
 
-def _init_fn(fields, frozen, has_post_init, self_name):
-    # fields contains both real fields and InitVar pseudo-fields.
-
-    # Make sure we don't have fields without defaults following fields
-    # with defaults.  This actually would be caught when exec-ing the
-    # function source code, but catching it here gives a better error
-    # message, and future-proofs us in case we build up the function
-    # using ast.
-    seen_default = False
-    for f in fields:
-        # Only consider fields in the __init__ call.
-        if f.init:
-            if not (f.default is MISSING and f.default_factory is MISSING):
-                seen_default = True
-            elif seen_default:
-                raise TypeError(f'non-default argument {f.name!r} '
-                                'follows default argument')
-
+def _init_body(fields, frozen, has_post_init, self_name, typed, coerced, slots):
+    # Return the lines of the body of __init__, and the globals they
+    # need.  The parameters are in local variables named after the
+    # fields.
     globals = {'MISSING': MISSING,
                '_HAS_DEFAULT_FACTORY': _HAS_DEFAULT_FACTORY}
 
     body_lines = []
     for f in fields:
-        line = _field_init(f, frozen, globals, self_name)
+        if coerced and f.init and f.name in coerced:
+            body_lines.extend(_field_coerce(f, *coerced[f.name], globals))
+        if typed and f.init and f.name in typed:
+            body_lines.append(_field_check(f, typed[f.name], globals, self_name))
+        line = _field_init(f, frozen, globals, self_name,
+                           typed is not None and f.name in typed, slots)
         # line is None means that this field doesn't require
         # initialization (it's a pseudo-field).  Just skip it.
         if line:
@@ -507,6 +575,86 @@ def _init_fn(fields, frozen, has_post_init, self_name):
     # If no body lines, use 'pass'.
     if not body_lines:
         body_lines = ['pass']
+    return body_lines, globals
+
+
+def _from_records_fn(fields, frozen, has_post_init, typed, coerced, slots, as_list):
+    # Return a function (cls, records) that builds an instance per
+    # record with the body of the generated __init__, inlined in the
+    # loop: a generator, or with as_list a function returning a list.
+    # Records holding exactly the __init__ parameters, as a tuple, list
+    # or dict, are unpacked straight into local variables; anything else
+    # goes through cls(*record) or cls(**record), which fills in
+    # defaults and reports errors as usual.
+    self_name = '__liquid_self__'
+    names = [f.name for f in fields if f.init]
+    body_lines, globals = _init_body(fields, frozen, has_post_init, self_name,
+                                     typed, coerced, slots)
+    globals['_new'] = object.__new__
+    globals['_fallback'] = _from_record
+    emit = '__liquid_append__' if as_list else 'yield '
+    n = len(names)
+    lines = ['__liquid_out__=[]', '__liquid_append__=__liquid_out__.append'] if as_list else []
+    lines += ['for __liquid_rec__ in __liquid_records__:',
+              ' __liquid_type__=type(__liquid_rec__)',
+              f' if (__liquid_type__ is tuple or __liquid_type__ is list) '
+              f'and len(__liquid_rec__)=={n}:',
+              f'  [{",".join(names)}]=__liquid_rec__',
+              f' elif __liquid_type__ is dict and len(__liquid_rec__)=={n}:',
+              '  try:']
+    lines += [f'   {name}=__liquid_rec__[{name!r}]' for name in names] or ['   pass']
+    lines += ['  except KeyError:',
+              f'   {emit}(_fallback(__liquid_cls__,__liquid_rec__))',
+              '   continue',
+              ' else:',
+              f'  {emit}(_fallback(__liquid_cls__,__liquid_rec__))',
+              '  continue',
+              f' {self_name}=_new(__liquid_cls__)']
+    lines += [f' {line}' for line in body_lines]
+    lines.append(f' {emit}({self_name})')
+    if as_list:
+        lines.append('return __liquid_out__')
+    return _create_fn('__liquid_from_records__',
+                      ('__liquid_cls__', '__liquid_records__'),
+                      lines,
+                      globals=globals)
+
+
+def _from_record(cls, record):
+    if isinstance(record, collections.abc.Mapping):
+        return cls(**record)
+    if (not isinstance(record, collections.abc.Sequence)
+            or isinstance(record, (str, bytes, bytearray))):
+        raise TypeError(f'{cls.__name__}.from_records() records must be '
+                        f'sequences or mappings, not {type(record).__name__!r}')
+    return cls(*record)
+
+
+def _init_fn(fields, frozen, has_post_init, self_name, typed=None, coerced=None,
+             slots=False):
+    # fields contains both real fields and InitVar pseudo-fields.
+    # typed maps field names to their _TypedField descriptors, when
+    # __init__ checks the values itself and stores them directly.
+    # coerced maps field names to the (target, optional) their values
+    # are shifted to first.
+
+    # Make sure we don't have fields without defaults following fields
+    # with defaults.  This actually would be caught when exec-ing the
+    # function source code, but catching it here gives a better error
+    # message, and future-proofs us in case we build up the function
+    # using ast.
+    seen_default = False
+    for f in fields:
+        # Only consider fields in the __init__ call.
+        if f.init:
+            if not (f.default is MISSING and f.default_factory is MISSING):
+                seen_default = True
+            elif seen_default:
+                raise TypeError(f'non-default argument {f.name!r} '
+                                'follows default argument')
+
+    body_lines, globals = _init_body(fields, frozen, has_post_init, self_name,
+                                     typed, coerced, slots)
 
     locals = {f'_type_{f.name}': f.type for f in fields}
     return _create_fn('__init__',
@@ -517,58 +665,88 @@ def _init_fn(fields, frozen, has_post_init, self_name):
                       return_type=None)
 
 
+# The generated __repr__, comparison, __hash__ and frozen methods read
+# the fields through an attrgetter (or a frozenset of names) that is
+# passed in as a global, rather than naming them in the source.  Their
+# text then only depends on how many fields there are, so every class
+# shares the same few compiled code objects and only __init__ has to be
+# compiled per class.
+
+def _fields_getter(fields):
+    # Return a callable that gets the fields of an object: a tuple for
+    # zero or 2+ fields, the bare value for a single field.
+    if not fields:
+        return _no_fields
+    return operator.attrgetter(*[f.name for f in fields])
+
+
+def _no_fields(obj):
+    return ()
+
+
 def _repr_fn(fields):
+    globals = {'_get': _fields_getter(fields),
+               '_fmt': ', '.join(f'{f.name}=%r' for f in fields)}
+    if not fields:
+        values = '""'
+    elif len(fields) == 1:
+        values = '_fmt % (_get(self),)'
+    else:
+        values = '_fmt % _get(self)'
     return _create_fn('__repr__',
                       ('self',),
-                      ['return self.__class__.__qualname__ + f"(' +
-                       ', '.join([f"{f.name}={{self.{f.name}!r}}"
-                                  for f in fields]) +
-                       ')"'])
+                      [f'return self.__class__.__qualname__ + "(" + {values} + ")"'],
+                      globals=globals)
 
 
 def _frozen_get_del_attr(cls, fields):
     # XXX: globals is modified on the first call to _create_fn, then
     # the modified version is used in the second call.  Is this okay?
     globals = {'cls': cls,
-              'FrozenInstanceError': FrozenInstanceError}
-    if fields:
-        fields_str = '(' + ','.join(repr(f.name) for f in fields) + ',)'
-    else:
-        # Special case for the zero-length tuple.
-        fields_str = '()'
+               '_fields': frozenset(f.name for f in fields),
+               'FrozenInstanceError': FrozenInstanceError}
     return (_create_fn('__setattr__',
                       ('self', 'name', 'value'),
-                      (f'if type(self) is cls or name in {fields_str}:',
+                      ('if type(self) is cls or name in _fields:',
                         ' raise FrozenInstanceError(f"cannot assign to field {name!r}")',
                        f'super(cls, self).__setattr__(name, value)'),
                        globals=globals),
             _create_fn('__delattr__',
                       ('self', 'name'),
-                      (f'if type(self) is cls or name in {fields_str}:',
+                      ('if type(self) is cls or name in _fields:',
                         ' raise FrozenInstanceError(f"cannot delete field {name!r}")',
                        f'super(cls, self).__delattr__(name)'),
                        globals=globals),
             )
 
 
-def _cmp_fn(name, op, self_tuple, other_tuple):
-    # Create a comparison function.  If the fields in the object are
-    # named 'x' and 'y', then self_tuple is the string
-    # '(self.x,self.y)' and other_tuple is the string
-    # '(other.x,other.y)'.
-
+def _cmp_fn(name, op, fields):
+    # Create a comparison function.  Always compare tuples of the
+    # fields, as (self.x,)==(other.x,) would: tuple comparison checks
+    # identity first and reduces each element to a bool, which comparing
+    # a single bare value would not.
+    if len(fields) == 1:
+        body = f' return (_get(self),){op}(_get(other),)'
+    else:
+        body = f' return _get(self){op}_get(other)'
     return _create_fn(name,
                       ('self', 'other'),
                       [ 'if other.__class__ is self.__class__:',
-                       f' return {self_tuple}{op}{other_tuple}',
-                        'return NotImplemented'])
+                       body,
+                        'return NotImplemented'],
+                      globals={'_get': _fields_getter(fields)})
 
 
 def _hash_fn(fields):
-    self_tuple = _tuple_str('self', fields)
+    # Always hash a tuple of the fields, as hash((self.x,)) would.
+    if len(fields) == 1:
+        body = 'return hash((_get(self),))'
+    else:
+        body = 'return hash(_get(self))'
     return _create_fn('__hash__',
                       ('self',),
-                      [f'return hash({self_tuple})'])
+                      [body],
+                      globals={'_get': _fields_getter(fields)})
 
 
 def _is_classvar(a_type, typing):
@@ -647,6 +825,10 @@ def _get_field(cls, a_name, a_type):
     # If the default value isn't derived from Field, then it's only a
     # normal default value.  Convert it to a Field().
     default = getattr(cls, a_name, MISSING)
+    if isinstance(default, _TypedField):
+        # Inherited from a validate=True liquid, which keeps the
+        # default on the descriptor.
+        default = default.default
     if isinstance(default, Field):
         f = default
     else:
@@ -722,6 +904,282 @@ def _get_field(cls, a_name, a_type):
     return f
 
 
+class _LazyMethod:
+    # Stands in for a generated method until it is first looked up.
+    # make(cls) builds the real function for the class holding the
+    # placeholder, which then replaces the placeholder in that class's
+    # __dict__, so every later lookup finds the plain function.
+    __slots__ = ('name', 'make')
+
+    def __init__(self, name, make):
+        self.name = name
+        self.make = make
+
+    def __get__(self, instance, owner=None):
+        if owner is None:
+            owner = type(instance)
+        # The placeholder may have been inherited: find the class that
+        # actually holds it.
+        for cls in owner.__mro__:
+            if cls.__dict__.get(self.name) is self:
+                break
+        else:
+            cls = owner
+        fn = self.make(cls)
+        setattr(cls, self.name, fn)
+        return fn.__get__(instance, owner)
+
+
+class _TypedField:
+    # Checks the values assigned to a field of a validate=True liquid.
+    # It is a data descriptor, so assignments go through __set__; the
+    # value itself lives in the instance __dict__.  On the class it
+    # reads as the field's default, if it has one, and a field with no
+    # value yet (init=False, say) raises AttributeError as usual.
+    # check(value) is the compiled check for the annotation; exact is
+    # the annotation if it is a plain class, so that the common case of
+    # a value of exactly that class skips the call.
+    __slots__ = ('name', 'annotation', 'check', 'default', 'exact')
+
+    def __init__(self, name, annotation, check, default):
+        self.name = name
+        self.annotation = annotation
+        self.check = check
+        self.default = default
+        self.exact = annotation if type(annotation) is type else None
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self if self.default is MISSING else self.default
+        try:
+            return instance.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(f'{type(instance).__name__!r} object has no '
+                                 f'attribute {self.name!r}') from None
+
+    def __set__(self, instance, value):
+        if type(value) is not self.exact and not self.check(value):
+            self.invalid(instance, value)
+        instance.__dict__[self.name] = value
+
+    def __delete__(self, instance):
+        raise AttributeError(f'cannot delete field {self.name!r} of a '
+                             f'validated liquid')
+
+    def invalid(self, instance, value):
+        annotation = self.annotation
+        if isinstance(annotation, type) and not typing.get_args(annotation):
+            annotation = annotation.__qualname__
+        raise TypeError(f'{type(instance).__qualname__}.{self.name} must be '
+                        f'{annotation}, not {type(value).__qualname__}')
+
+
+class _TypedSlot(_TypedField):
+    # The same for a slots=True liquid: the value lives in the slot,
+    # which member (the slot's own descriptor) reads and writes.
+    __slots__ = ('member',)
+
+    def __init__(self, name, annotation, check, default, member):
+        super().__init__(name, annotation, check, default)
+        self.member = member
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self if self.default is MISSING else self.default
+        return self.member.__get__(instance, owner)
+
+    def __set__(self, instance, value):
+        if type(value) is not self.exact and not self.check(value):
+            self.invalid(instance, value)
+        self.member.__set__(instance, value)
+
+    def __delete__(self, instance):
+        self.member.__delete__(instance)
+
+
+def _typed_field(cls, f):
+    # Return the _TypedField for a field, compiling the check for its
+    # annotation.  An annotation that names something not defined yet
+    # (the class itself, say), as a string or a forward reference in a
+    # generic such as Optional['Node'], is resolved the first time a
+    # value is checked.
+    annotation = f.type.data
+    if _has_forward_ref(annotation):
+        try:
+            annotation = _resolve_annotation(cls, annotation)
+        except NameError:
+            return _TypedField(f.name, annotation,
+                               _deferred_check(cls, annotation), f.default)
+    return _TypedField(f.name, annotation, compile_validator(annotation), f.default)
+
+
+def _has_forward_ref(annotation):
+    # Is there a string annotation or a ForwardRef anywhere in it?
+    if isinstance(annotation, (str, typing.ForwardRef)):
+        return True
+    if isinstance(annotation, list):
+        # The parameter list of Callable[[...], ...].
+        return any(map(_has_forward_ref, annotation))
+    origin = typing.get_origin(annotation)
+    if origin is typing.Literal:
+        return False
+    args = typing.get_args(annotation)
+    if origin is getattr(typing, 'Annotated', None):
+        args = args[:1]
+    return any(map(_has_forward_ref, args))
+
+
+def _resolve_annotation(cls, annotation, localns=None):
+    module = sys.modules.get(cls.__module__)
+    globalns = getattr(module, '__dict__', {})
+    # make_liquid() annotates untyped fields as 'typing.Any'.
+    localns = {'typing': typing, **(localns or {})}
+    if isinstance(annotation, str):
+        return eval(annotation, globalns, localns)
+    # Forward references inside a generic: let typing evaluate them.
+    holder = types.SimpleNamespace(__annotations__={'hint': annotation})
+    return typing.get_type_hints(holder, globalns, localns)['hint']
+
+
+def _deferred_check(cls, annotation):
+    check = None
+
+    def deferred(value):
+        nonlocal check
+        if check is None:
+            try:
+                resolved = _resolve_annotation(cls, annotation)
+            except NameError:
+                resolved = _resolve_annotation(cls, annotation, {cls.__name__: cls})
+            check = compile_validator(resolved)
+        return check(value)
+    return deferred
+
+
+def _add_typed_slots(cls, field_list):
+    # Put a _TypedSlot in front of each field's slot.
+    for f in field_list:
+        for base in cls.__mro__:
+            member = base.__dict__.get(f.name)
+            if member is not None:
+                break
+        if isinstance(member, _TypedSlot):
+            member = member.member
+        typed = _typed_field(cls, f)
+        setattr(cls, f.name, _TypedSlot(f.name, typed.annotation, typed.check,
+                                        f.default, member))
+
+
+def _coerce_target(cls, f):
+    # Return (target, optional) for a coerce=True field: its annotation
+    # if that is a class, or the class in Optional[...].  Anything else
+    # (generics, Any, unresolvable strings) is not coerced: None.
+    annotation = f.type.data
+    if _has_forward_ref(annotation):
+        try:
+            annotation = _resolve_annotation(cls, annotation)
+        except NameError:
+            return None
+    optional = False
+    if typing.get_origin(annotation) in _UNION_TYPES:
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        if len(args) != 1:
+            return None
+        annotation, optional = args[0], True
+    if (not isinstance(annotation, type) or annotation in (object, typing.Any)
+            or typing.get_args(annotation)):
+        return None
+    return annotation, optional
+
+
+def _from_records(cls, records, *, iterator=False, processes=None, chunksize=10_000):
+    """Build an instance from every record of an iterable.
+
+    A record is a tuple or list of the __init__ arguments in order, or a
+    dict of them by name.  Records that hold every argument take a fast
+    path: the body of the generated __init__ runs inline, without
+    parsing arguments.  Other records (with defaults left out, or other
+    sequences and mappings) are passed to cls(*record) or cls(**record);
+    strings and other non-sequences raise TypeError.
+    default_factory, InitVar, __post_init__, validate and coerce behave
+    as they do in __init__.
+
+    If iterator is true, return a generator that builds instances as it
+    is consumed; otherwise return a list.  If processes is given, the
+    records are split into chunks of chunksize and built by a pool of
+    that many worker processes, which send the instances back in order.
+    That needs cls to be importable by the workers (defined at module
+    level), and only pays off when building an instance costs more than
+    pickling it.
+    """
+    if processes is not None:
+        instances = _from_records_pool(cls, records, processes, chunksize)
+        return instances if iterator else list(instances)
+    build = _records_builder(cls, not iterator)
+    if build is None:
+        instances = (_from_record(cls, record) for record in records)
+        return instances if iterator else list(instances)
+    return build(cls, records)
+
+
+class _FromRecords:
+    # The from_records() classmethod.  It keeps what the generated
+    # __init__ was made from (None if the class has no generated
+    # __init__), and generates the builders from that the first time
+    # they are used: builders[0] is the generator, builders[1] the
+    # list version.
+    __slots__ = ('recipe', 'builders')
+
+    def __init__(self, recipe):
+        self.recipe = recipe
+        self.builders = [None, None]
+
+    def __get__(self, instance, owner=None):
+        return types.MethodType(_from_records, type(instance) if owner is None else owner)
+
+
+def _records_builder(cls, as_list):
+    # The generated builder, if cls is built by the __init__ it was
+    # generated alongside.
+    if cls.__new__ is not object.__new__:
+        return None
+    for klass in cls.__mro__:
+        if '__init__' in klass.__dict__:
+            break
+    else:
+        return None
+    from_records = klass.__dict__.get('from_records')
+    if not isinstance(from_records, _FromRecords) or from_records.recipe is None:
+        return None
+    build = from_records.builders[as_list]
+    if build is None:
+        build = from_records.builders[as_list] = _from_records_fn(*from_records.recipe, as_list)
+    return build
+
+
+def _from_records_pool(cls, records, processes, chunksize):
+    from concurrent.futures import ProcessPoolExecutor
+
+    records = iter(records)
+    with ProcessPoolExecutor(processes) as pool:
+        # Keep a couple of chunks per worker in flight, so that neither
+        # the input nor the results pile up in memory.
+        pending = collections.deque()
+        while True:
+            chunk = list(itertools.islice(records, chunksize))
+            if chunk:
+                pending.append(pool.submit(_build_chunk, cls, chunk))
+            if pending and (not chunk or len(pending) >= 2 * processes):
+                yield from pending.popleft().result()
+            elif not chunk:
+                return
+
+
+def _build_chunk(cls, records):
+    # Runs in a worker process.
+    return _from_records(cls, records)
+
+
 def _set_new_attribute(cls, name, value):
     # Never overwrites an existing attribute.  Returns True if the
     # attribute already exists.
@@ -778,7 +1236,9 @@ _hash_action = {(False, False, False, False): None,
 # version of this table.
 
 
-def _process_class(cls, init, repr, eq, order, unsafe_hash, frozen):
+def _process_class(cls, init, repr, eq, order, unsafe_hash, frozen,
+                   slots=False, weakref_slot=False, lazy=False, validate=False,
+                   coerce=False):
     # Now that dicts retain insertion order, there's no reason to use
     # an ordered dict.  I am leveraging that ordering here, because
     # derived class fields overwrite base class fields, but the order
@@ -878,62 +1338,61 @@ def _process_class(cls, init, repr, eq, order, unsafe_hash, frozen):
     if order and not eq:
         raise ValueError('eq must be true if order is true')
 
-    if init:
-        # Does this class have a post-init function?
-        has_post_init = hasattr(cls, _POST_INIT_NAME)
-
-        # Include InitVars and regular fields (so, not ClassVars).
-        flds = [f for f in fields.values()
-                if f._field_type in (_FIELD, _FIELD_INITVAR)]
-        _set_new_attribute(cls, '__init__',
-                           _init_fn(flds,
-                                    frozen,
-                                    has_post_init,
-                                    # The name to use for the "self"
-                                    # param in __init__.  Use "self"
-                                    # if possible.
-                                    '__liquid_self__' if 'self' in fields
-                                            else 'self',
-                          ))
+    recipe = _init_recipe(cls, fields, frozen, slots, validate, coerce)
+    if init and not _set_new_attribute(cls, '__init__', _init_fn(*recipe)):
+        # from_records() runs the same body in a loop.
+        _set_new_attribute(cls, 'from_records', _FromRecords(_records_recipe(recipe)))
+    else:
+        _set_new_attribute(cls, 'from_records', _FromRecords(None))
 
     # Get the fields as a list, and include only real fields.  This is
     # used in all of the following methods.
     field_list = [f for f in fields.values() if f._field_type is _FIELD]
 
+    # In lazy mode, the methods below are installed as placeholders
+    # that generate the real method the first time it is looked up.
+    # make(cls) generates the method for class cls.
+    def method(name, make):
+        return _LazyMethod(name, make) if lazy else make(cls)
+
     if repr:
         flds = [f for f in field_list if f.repr]
-        _set_new_attribute(cls, '__repr__', _repr_fn(flds))
+        _set_new_attribute(cls, '__repr__',
+                           method('__repr__', lambda cls, flds=flds: _repr_fn(flds)))
 
     if eq:
         # Create _eq__ method.  There's no need for a __ne__ method,
         # since python will call __eq__ and negate it.
         flds = [f for f in field_list if f.compare]
-        self_tuple = _tuple_str('self', flds)
-        other_tuple = _tuple_str('other', flds)
         _set_new_attribute(cls, '__eq__',
-                           _cmp_fn('__eq__', '==',
-                                   self_tuple, other_tuple))
+                           method('__eq__',
+                                  lambda cls, flds=flds: _cmp_fn('__eq__', '==', flds)))
 
     if order:
         # Create and set the ordering methods.
         flds = [f for f in field_list if f.compare]
-        self_tuple = _tuple_str('self', flds)
-        other_tuple = _tuple_str('other', flds)
         for name, op in [('__lt__', '<'),
                          ('__le__', '<='),
                          ('__gt__', '>'),
                          ('__ge__', '>='),
                          ]:
-            if _set_new_attribute(cls, name,
-                                  _cmp_fn(name, op, self_tuple, other_tuple)):
+            def make(cls, name=name, op=op):
+                return _cmp_fn(name, op, flds)
+            if _set_new_attribute(cls, name, method(name, make)):
                 raise TypeError(f'Cannot overwrite attribute {name} '
                                 f'in class {cls.__name__}. Consider using '
                                 'functools.total_ordering')
 
     if frozen:
-        for fn in _frozen_get_del_attr(cls, field_list):
-            if _set_new_attribute(cls, fn.__name__, fn):
-                raise TypeError(f'Cannot overwrite attribute {fn.__name__} '
+        names = ('__setattr__', '__delattr__')
+        if lazy:
+            fns = [_LazyMethod(name, lambda cls, i=i: _frozen_get_del_attr(cls, field_list)[i])
+                   for i, name in enumerate(names)]
+        else:
+            fns = _frozen_get_del_attr(cls, field_list)
+        for name, fn in zip(names, fns):
+            if _set_new_attribute(cls, name, fn):
+                raise TypeError(f'Cannot overwrite attribute {name} '
                                 f'in class {cls.__name__}')
 
     # Decide if/how we're going to create a hash function.
@@ -951,9 +1410,147 @@ def _process_class(cls, init, repr, eq, order, unsafe_hash, frozen):
         cls.__doc__ = (cls.__name__ +
                        str(inspect.signature(cls)).replace(' -> None', ''))
 
+    if slots:
+        cls = _add_slots(cls, frozen, weakref_slot)
+        if validate:
+            _add_typed_slots(cls, field_list)
+    elif weakref_slot:
+        raise TypeError('weakref_slot is True but slots is False')
+
     return cls
 
 
+def _init_recipe(cls, fields, frozen, slots, validate, coerce):
+    # Return the arguments of _init_fn() for a class, from its fields
+    # (a dict of name -> Field) as they are typed now.
+    #
+    # With validate, every field gets a descriptor that checks what is
+    # assigned to it, and __init__ checks its arguments inline.  Slots
+    # classes get theirs once the slots exist, and their __init__ goes
+    # through the descriptors.
+    typed = None
+    if validate and not slots:
+        typed = {}
+        for f in fields.values():
+            if f._field_type is _FIELD:
+                typed[f.name] = _typed_field(cls, f)
+                setattr(cls, f.name, typed[f.name])
+
+    coerced = None
+    if coerce:
+        coerced = {}
+        for f in fields.values():
+            if f._field_type is _FIELD:
+                target = _coerce_target(cls, f)
+                if target is not None:
+                    coerced[f.name] = target
+
+    # Include InitVars and regular fields (so, not ClassVars).
+    flds = [f for f in fields.values()
+            if f._field_type in (_FIELD, _FIELD_INITVAR)]
+    return (flds,
+            frozen,
+            # Does this class have a post-init function?
+            hasattr(cls, _POST_INIT_NAME),
+            # The name to use for the "self" param in __init__.  Use
+            # "self" if possible.
+            '__liquid_self__' if 'self' in fields else 'self',
+            typed,
+            coerced,
+            slots)
+
+
+def _records_recipe(recipe):
+    # The arguments of _from_records_fn() (bar as_list) for an
+    # _init_recipe(): the same, without the name of "self".
+    flds, frozen, has_post_init, _, typed, coerced, slots = recipe
+    return flds, frozen, has_post_init, typed, coerced, slots
+
+
+def _get_slots(cls):
+    # The slot names a class itself declares.
+    slots = cls.__dict__.get('__slots__')
+    if slots is None:
+        return ()
+    if isinstance(slots, str):
+        return (slots,)
+    if hasattr(slots, '__next__'):
+        # An iterator has already been consumed by type().
+        raise TypeError(f"Slots of '{cls.__name__}' cannot be determined")
+    return tuple(slots)
+
+
+def _liquid_getstate(self):
+    return [getattr(self, f.name) for f in fields(self)]
+
+
+def _liquid_setstate(self, state):
+    for field, value in zip(fields(self), state):
+        # Bypass the frozen __setattr__.
+        object.__setattr__(self, field.name, value)
+
+
+def _update_class_cell(obj, old_cls, new_cls):
+    # Methods that use zero-argument super() close over the class they
+    # were defined in.  Point that cell at the rebuilt class.
+    if isinstance(obj, (classmethod, staticmethod)):
+        obj = obj.__func__
+    elif isinstance(obj, property):
+        for accessor in (obj.fget, obj.fset, obj.fdel):
+            _update_class_cell(accessor, old_cls, new_cls)
+        return
+    code = getattr(obj, '__code__', None)
+    if code is None or '__class__' not in code.co_freevars:
+        return
+    cell = obj.__closure__[code.co_freevars.index('__class__')]
+    if cell.cell_contents is old_cls:
+        cell.cell_contents = new_cls
+
+
+def _add_slots(cls, is_frozen, weakref_slot):
+    # A class can't get __slots__ after it has been created, so build a
+    # new class with the same namespace plus __slots__ for the fields.
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(f.name for f in fields(cls))
+
+    # Slots already provided by a base class must not be repeated.
+    inherited_slots = set()
+    for base in cls.__mro__[1:-1]:
+        inherited_slots.update(_get_slots(base))
+    wanted = field_names + (('__weakref__',) if weakref_slot else ())
+    cls_dict['__slots__'] = tuple(name for name in wanted
+                                  if name not in inherited_slots)
+
+    # Field defaults live in the generated __init__; as class attributes
+    # they would clash with the slot descriptors.
+    for field_name in field_names:
+        cls_dict.pop(field_name, None)
+    cls_dict.pop('__dict__', None)
+    cls_dict.pop('__weakref__', None)
+
+    qualname = getattr(cls, '__qualname__', None)
+    new_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    if qualname is not None:
+        new_cls.__qualname__ = qualname
+
+    for value in cls_dict.values():
+        _update_class_cell(value, cls, new_cls)
+
+    if is_frozen:
+        # The generated __setattr__/__delattr__ compare against the class
+        # they were generated for.
+        # (A lazy placeholder generates them for new_cls directly.)
+        if not isinstance(cls_dict['__setattr__'], _LazyMethod):
+            new_cls.__setattr__.__globals__['cls'] = new_cls
+        # Pickle restores slots with setattr(), which frozen forbids.
+        if '__getstate__' not in cls_dict:
+            new_cls.__getstate__ = _liquid_getstate
+        if '__setstate__' not in cls_dict:
+            new_cls.__setstate__ = _liquid_setstate
+
+    return new_cls
+
+
 # _cls should never be specified by keyword, so start it with an
 # underscore.  The presence of _cls is used to detect if this
 # decorator is being called with parameters or not.
@@ -965,7 +1562,12 @@ def liquid(
         eq=True, 
         order=False,
         unsafe_hash=False, 
-        frozen=False
+        frozen=False,
+        slots=False,
+        weakref_slot=False,
+        lazy=False,
+        validate=False,
+        coerce=False
     ):
     """Returns the same class as was passed in, with dunder methods
     added based on the fields defined in the class.
@@ -976,7 +1578,18 @@ def liquid(
     repr is true, a __repr__() method is added. If order is true, rich
     comparison dunder methods are added. If unsafe_hash is true, a
     __hash__() method function is added. If frozen is true, fields may
-    not be assigned to after instance creation.
+    not be assigned to after instance creation. If slots is true, a new
+    class with __slots__ for the fields is returned instead of cls, so
+    instances carry no __dict__; weakref_slot adds a __weakref__ slot.
+    If lazy is true, __repr__(), the comparison methods and the frozen
+    __setattr__()/__delattr__() are only generated the first time they
+    are used, which makes defining many classes cheaper. If validate is
+    true, values assigned to fields, in __init__() or later, are checked
+    against the field annotations (generics included) and a TypeError
+    is raised if they don't match; defaults are not checked. If coerce
+    is true, __init__() shifts arguments that are not already of their
+    field's type (a class, or Optional of one) to it, like Poly.shift(),
+    and raises TypeError if that fails.
 
 
     ###
@@ -1001,7 +1614,8 @@ def liquid(
     """
 
     def wrap(cls):
-        return _process_class(cls, init, repr, eq, order, unsafe_hash, frozen)
+        return _process_class(cls, init, repr, eq, order, unsafe_hash, frozen,
+                              slots, weakref_slot, lazy, validate, coerce)
 
     # See if we're being called as @liquid or @liquid().
     if _cls is None:
@@ -1066,19 +1680,7 @@ def asdict(obj, *, dict_factory=dict):
 
 
 def _asdict_inner(obj, dict_factory):
-    if _is_liquid_instance(obj):
-        result = []
-        for f in fields(obj):
-            value = _asdict_inner(getattr(obj, f.name), dict_factory)
-            result.append((f.name, value))
-        return dict_factory(result)
-    elif isinstance(obj, (list, tuple)):
-        return type(obj)(_asdict_inner(v, dict_factory) for v in obj)
-    elif isinstance(obj, dict):
-        return type(obj)((_asdict_inner(k, dict_factory), _asdict_inner(v, dict_factory))
-                          for k, v in obj.items())
-    else:
-        return copy.deepcopy(obj)
+    return _convert(obj, dict_factory, True)
 
 
 def astuple(obj, *, tuple_factory=tuple):
@@ -1106,19 +1708,119 @@ def astuple(obj, *, tuple_factory=tuple):
 
 
 def _astuple_inner(obj, tuple_factory):
-    if _is_liquid_instance(obj):
-        result = []
-        for f in fields(obj):
-            value = _astuple_inner(getattr(obj, f.name), tuple_factory)
-            result.append(value)
-        return tuple_factory(result)
-    elif isinstance(obj, (list, tuple)):
-        return type(obj)(_astuple_inner(v, tuple_factory) for v in obj)
-    elif isinstance(obj, dict):
-        return type(obj)((_astuple_inner(k, tuple_factory), _astuple_inner(v, tuple_factory))
-                          for k, v in obj.items())
-    else:
-        return copy.deepcopy(obj)
+    return _convert(obj, tuple_factory, False)
+
+
+# The types that copy.deepcopy() returns unchanged.  asdict() and
+# astuple() pass values of exactly these types through without calling
+# deepcopy() at all.
+_ATOMIC = frozenset({
+    type(None), bool, int, float, complex, str, bytes,
+    type, range, property, weakref.ref, types.CodeType,
+    types.FunctionType, types.BuiltinFunctionType,
+    type(Ellipsis), type(NotImplemented),
+})
+
+
+def _converters(cls):
+    # Return (names, get, to_dict, to_tuple) for a liquid class,
+    # generating them the first time.  get(obj) returns the field values
+    # as a tuple.  to_dict(obj, factory) and to_tuple(obj, factory) build
+    # the result directly when every field value is atomic, and return
+    # MISSING otherwise.
+    converters = cls.__dict__.get(_CONVERTERS)
+    if converters is None:
+        flds = fields(cls)
+        names = tuple(f.name for f in flds)
+        get = _fields_getter(flds)
+        if len(flds) == 1:
+            def get(obj, get=get):
+                return (get(obj),)
+        loads = [f'_v{i}=obj.{name}' for i, name in enumerate(names)]
+        atomic = ' and '.join(f'type(_v{i}) in _ATOMIC'
+                              for i in range(len(names))) or 'True'
+        globals = {'_ATOMIC': _ATOMIC, 'MISSING': MISSING}
+        to_dict = _create_fn('__liquid_asdict__',
+                             ('obj', 'factory'),
+                             loads + [f'if {atomic}:',
+                                      ' return factory([' +
+                                      ','.join(f'({name!r},_v{i})'
+                                               for i, name in enumerate(names)) +
+                                      '])',
+                                      'return MISSING'],
+                             globals=globals)
+        to_tuple = _create_fn('__liquid_astuple__',
+                              ('obj', 'factory'),
+                              loads + [f'if {atomic}:',
+                                       ' return factory([' +
+                                       ','.join(f'_v{i}' for i in range(len(names))) +
+                                       '])',
+                                       'return MISSING'],
+                              globals=globals)
+        converters = (names, get, to_dict, to_tuple)
+        setattr(cls, _CONVERTERS, converters)
+    return converters
+
+
+def _convert(obj, factory, as_dict):
+    # The body of asdict() and astuple().  Liquids and containers whose
+    # values are not all atomic get a frame on an explicit stack instead
+    # of a recursive call, so there is no limit on how deeply they nest.
+    # A frame is (build, values, converted, id): build(converted) makes
+    # the result once every value has been converted.
+    stack = []
+    active = set()
+    while True:
+        cls = type(obj)
+        value = MISSING
+        if cls in _ATOMIC:
+            value = obj
+        elif hasattr(cls, _FIELDS):
+            names, get, to_dict, to_tuple = _converters(cls)
+            value = (to_dict if as_dict else to_tuple)(obj, factory)
+            if value is MISSING:
+                if as_dict:
+                    def build(out, names=names):
+                        return factory(list(zip(names, out)))
+                else:
+                    build = factory
+                frame = (build, get(obj), [], id(obj))
+        elif isinstance(obj, (list, tuple)):
+            frame = (cls, obj, [], id(obj))
+        elif isinstance(obj, dict):
+            frame = (lambda out, cls=cls: cls(zip(out[::2], out[1::2])),
+                     [item for pair in obj.items() for item in pair],
+                     [], id(obj))
+        else:
+            value = copy.deepcopy(obj)
+
+        if value is MISSING:
+            # The recursive version would never finish on a cycle either.
+            if frame[3] in active:
+                raise RecursionError(f'cannot convert a reference cycle through '
+                                     f'{cls.__name__} object')
+            active.add(frame[3])
+            stack.append(frame)
+
+        # Hand the value to the frame above, finishing every frame whose
+        # values are now all converted, until a value needs converting.
+        while True:
+            if value is not MISSING:
+                if not stack:
+                    return value
+                stack[-1][2].append(value)
+            build, values, out, key = stack[-1]
+            while len(out) < len(values):
+                obj = values[len(out)]
+                if type(obj) not in _ATOMIC:
+                    break
+                out.append(obj)
+            else:
+                stack.pop()
+                active.discard(key)
+                value = build(out)
+                continue
+            break
 
 
 def make_liquid(
@@ -1132,7 +1834,12 @@ def make_liquid(
         eq=True, 
         order=False, 
         unsafe_hash=False,
-        frozen=False
+        frozen=False,
+        slots=False,
+        weakref_slot=False,
+        lazy=False,
+        validate=False,
+        coerce=False
     ):
     """Return a new dynamically created liquid.
 
@@ -1153,8 +1860,8 @@ def make_liquid(
 
     For the bases and namespace parameters, see the builtin type() function.
 
-    The parameters init, repr, eq, order, unsafe_hash, and frozen are passed to
-    liquid().
+    The parameters init, repr, eq, order, unsafe_hash, frozen, slots,
+    weakref_slot, lazy, validate and coerce are passed to liquid().
     """
 
     if namespace is None:
@@ -1200,10 +1907,235 @@ def make_liquid(
         eq=eq, 
         order=order,
         unsafe_hash=unsafe_hash, 
-        frozen=frozen
+        frozen=frozen,
+        slots=slots,
+        weakref_slot=weakref_slot,
+        lazy=lazy,
+        validate=validate,
+        coerce=coerce
     )
 
 
+# JSON schema "type" -> Python type, for make_liquids().
+_SCHEMA_TYPES = {
+    'string': str,
+    'integer': int,
+    'number': float,
+    'boolean': bool,
+    'null': type(None),
+    'array': list,
+    'object': dict,
+}
+
+
+def make_liquids(schema, *, module=None, timings=None, **options):
+    """Return a dict of new liquids built from a schema document.
+
+    'schema' is a JSON-schema-like mapping of model names to models,
+    either at the top level or under 'definitions', '$defs' or 'models'.
+    Each model lists its fields under 'properties'; fields named in
+    'required' come first in __init__, the others default to their
+    'default' (or None).  Fields may refer to other models with
+    '$ref', and a field that is itself an object with 'properties'
+    becomes a nested model of its own (named after its 'title', or the
+    model and field names).
+
+      Ns = make_liquids({'definitions': {
+          'Node': {'properties': {'value': {'type': 'integer'},
+                                  'next': {'$ref': '#/definitions/Node'}},
+                   'required': ['value']},
+      }})
+
+    is equivalent to:
+
+      @liquid
+      class Node:
+          value: int
+          next: Optional[Node] = None
+
+    Every class is created before any reference is resolved, so models
+    may refer to each other in any order, including in cycles; each
+    reference is then resolved exactly once.  __init__, and with
+    validate or coerce the checks and targets of the fields, are only
+    generated once the references are resolved, and the __init__ of
+    every class is compiled in a single batch.
+
+    The keyword options (init, repr, eq, order, ...) are passed to
+    make_liquid() for every model; a model's 'x-liquid' mapping
+    overrides them for that model.  If 'module' is given, it becomes
+    the __module__ of the classes.  If 'timings' is a dict, the seconds
+    spent parsing the schema, generating the classes, resolving
+    references and compiling __init__ are stored in it under 'parse',
+    'generate', 'resolve', 'compile' and 'total'.
+    """
+
+    clock = time.perf_counter
+    start = clock()
+
+    # Parse: turn every model into make_liquid() fields.  References
+    # are left as forward references for now.
+    if not isinstance(schema, dict):
+        raise TypeError(f'schema must be a dict, not {type(schema).__name__}')
+    for key in ('definitions', '$defs', 'models'):
+        if key in schema:
+            schema = schema[key]
+            break
+    # Copied, since nested models are added to it.
+    schema = dict(schema)
+    queue = list(schema.items())
+
+    def forward(name, model):
+        if model is not None and name not in schema:
+            # A nested model: parse it too.
+            schema[name] = model
+            queue.append((name, model))
+        return typing.ForwardRef(name)
+
+    parsed = {}
+    for name, model in queue:
+        parsed[name] = _schema_fields(name, model, forward)
+    parsed_at = clock()
+
+    # Generate: create every class, but for what depends on the field
+    # types, which are still forward references: __init__, and the
+    # checks and targets of validate and coerce.  The generated methods
+    # other than __init__ are shared between classes with the same
+    # number of fields, so most of them are compiled once for the whole
+    # schema.
+    classes = {}
+    settings = {}
+    for name, specs in parsed.items():
+        model = schema[name]
+        namespace = {}
+        if module is not None:
+            namespace['__module__'] = module
+        # Without a description, the docstring is the signature of
+        # __init__, which doesn't exist yet: fill it in afterwards.
+        namespace['__doc__'] = model.get('description') or name
+        settings[name] = {**options, **model.get('x-liquid', {})}
+        classes[name] = make_liquid(name,
+                                    [spec[:3] for spec in specs],
+                                    namespace=namespace,
+                                    **{**settings[name], 'init': False,
+                                       'validate': False, 'coerce': False})
+    generated_at = clock()
+
+    # Resolve: now that every class exists, replace the forward
+    # references in the fields and the class annotations.
+    def resolve(name, model):
+        try:
+            return classes[name]
+        except KeyError:
+            raise TypeError(f'Unknown model {name!r} in $ref') from None
+
+    for name, specs in parsed.items():
+        cls = classes[name]
+        fields_by_name = getattr(cls, _FIELDS)
+        for field_name, _, _, prop in specs:
+            if prop is None:
+                continue
+            tp = _schema_field_type(name, field_name, prop, resolve)
+            fields_by_name[field_name].type = Poly(tp)
+            cls.__annotations__[field_name] = tp
+    resolved_at = clock()
+
+    # Compile: generate the rest against the resolved types.
+    for name, cls in classes.items():
+        setting = settings[name]
+        slots = setting.get('slots', False)
+        validate = setting.get('validate', False)
+        recipe = _init_recipe(cls, getattr(cls, _FIELDS), setting.get('frozen', False),
+                              slots, validate, setting.get('coerce', False))
+        if validate and slots:
+            _add_typed_slots(cls, fields(cls))
+        if not setting.get('init', True):
+            continue
+        cls.__init__ = _init_fn(*recipe)
+        cls.from_records = _FromRecords(_records_recipe(recipe))
+        getattr(cls, _PARAMS).init = True
+        if not schema[name].get('description'):
+            cls.__doc__ = (cls.__name__ +
+                           str(inspect.signature(cls)).replace(' -> None', ''))
+    compiled_at = clock()
+
+    if timings is not None:
+        timings['parse'] = parsed_at - start
+        timings['generate'] = generated_at - parsed_at
+        timings['resolve'] = resolved_at - generated_at
+        timings['compile'] = compiled_at - resolved_at
+        timings['total'] = compiled_at - start
+    return classes
+
+
+def _schema_fields(model_name, model, ref):
+    # Return (name, type, field, prop) for each property of a model,
+    # required fields first.  prop is the property's schema if its type
+    # refers to another model (and so has to be resolved later), else
+    # None.
+    required = set(model.get('required', ()))
+    specs = []
+    optional = []
+    for name, prop in model.get('properties', {}).items():
+        refs = []
+
+        def note(ref_name, nested):
+            refs.append(ref_name)
+            return ref(ref_name, nested)
+
+        tp = _schema_field_type(model_name, name, prop, note)
+        resolve_later = prop if refs else None
+        if name in required:
+            specs.append((name, tp, field(), resolve_later))
+            continue
+        default = prop.get('default')
+        if default is None:
+            tp = typing.Optional[tp]
+            if resolve_later is not None:
+                resolve_later = {**prop, 'nullable': True}
+        if isinstance(default, (list, dict, set)):
+            spec = field(default_factory=functools.partial(copy.deepcopy, default))
+        else:
+            spec = field(default=default)
+        optional.append((name, tp, spec, resolve_later))
+    return specs + optional
+
+
+def _schema_field_type(model_name, field_name, prop, ref):
+    # A nested model is named after its title, or after the model and
+    # field it appears in: Order.shipping_address -> OrderShippingAddress.
+    hint = model_name + ''.join(part.capitalize() for part in field_name.split('_'))
+    return _schema_type(prop, hint, ref)
+
+
+def _schema_type(prop, hint, ref):
+    # Return the type annotation for a property schema.  ref(name, model)
+    # returns the type for the model called name; model is the nested
+    # model's schema, or None for a $ref.
+    if '$ref' in prop:
+        tp = ref(prop['$ref'].rsplit('/', 1)[-1], None)
+    elif 'properties' in prop:
+        tp = ref(prop.get('title', hint), prop)
+    elif 'enum' in prop:
+        tp = typing.Literal[tuple(prop['enum'])]
+    elif 'anyOf' in prop or 'oneOf' in prop:
+        choices = prop.get('anyOf') or prop['oneOf']
+        tp = typing.Union[tuple(_schema_type(p, hint, ref) for p in choices)]
+    else:
+        kind = prop.get('type')
+        if isinstance(kind, list):
+            tp = typing.Union[tuple(_schema_type({**prop, 'type': k}, hint, ref)
+                                    for k in kind)]
+        elif kind == 'array' and 'items' in prop:
+            tp = typing.List[_schema_type(prop['items'], hint + 'Item', ref)]
+        elif kind == 'object' and isinstance(prop.get('additionalProperties'), dict):
+            tp = typing.Dict[str, _schema_type(prop['additionalProperties'], hint, ref)]
+        else:
+            tp = _SCHEMA_TYPES.get(kind, Any)
+    if prop.get('nullable'):
+        tp = typing.Optional[tp]
+    return tp
+
+
 def replace(obj, **changes):
     """Return a new object replacing specified fields with new values.
 
@@ -1,10 +1,396 @@
+import collections
+import enum
+import functools
+import hashlib
+import inspect
 import logging
-import pickle
 import threading
-from typing import Any, Generic, TypeVar
+import time
+import types
+import typing
+import weakref
+from typing import Any, Generic, Optional, TypeVar
+
+from shapeless.convert import converters
+from shapeless.parallel import CHUNKSIZE, map_shift, map_validate
+from shapeless.typecheck import compile_validator, validate_many
 
 T = TypeVar('T')
 
+
+class TypeCache:
+    """
+    A process-wide cache of resolved types shared by every Poly.
+
+    Lookups are a single ``dict.get`` and never take the lock, so
+    ``Poly.determine()`` stays cheap no matter how many threads call it.
+    Writes are serialized through a lock and the table is bounded: once it
+    reaches ``maxsize`` entries it is cleared and refilled on demand.
+
+    The hit/miss counters are statistics, not invariants; under heavy
+    contention a few increments may be lost.
+
+    :param maxsize: The maximum number of types to keep resolved.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, data_type):
+        """
+        Resolve a type, filling the cache on a miss.
+
+        :param data_type: The type to resolve.
+        :return: The resolved type.
+        """
+        resolved = self._entries.get(data_type)
+        if resolved is not None:
+            self.hits += 1
+            return resolved
+        with self._lock:
+            self.misses += 1
+            resolved = self._entries.get(data_type)
+            if resolved is None:
+                if len(self._entries) >= self.maxsize:
+                    self._entries.clear()
+                resolved = self._entries[data_type] = data_type
+            return resolved
+
+    def invalidate(self, data_type=None):
+        """
+        Drop a type from the cache, or every type if none is given.
+
+        :param data_type: The type to drop. Default is None (drop all).
+        """
+        with self._lock:
+            if data_type is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(data_type, None)
+
+    def reset_stats(self):
+        """
+        Reset the hit and miss counters.
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Get the cache statistics.
+
+        :return: A dict with the hits, misses, current size and maxsize.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+        }
+
+    def __contains__(self, data_type):
+        return data_type in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# The cache used by Poly.determine() across the whole process.
+type_cache = TypeCache()
+
+
+class FluidCache:
+    """
+    The memo table of a fluid function decorated with ``cache=``.
+
+    Once there are ``maxsize`` entries, storing one evicts another, least
+    recently used first (approximately: an entry used since it was stored
+    gets a second chance and moves to the back of the queue).  With a
+    ttl, entries also expire that many seconds after they were stored.
+
+    Lookups never take the lock, so a cache hit costs a dict lookup;
+    stores and evictions are serialized through it.  Like TypeCache's,
+    the counters are statistics, and a few increments may be lost under
+    heavy contention.  Two threads missing on the same key at once both
+    compute it, and the last one stored wins.
+
+    :param maxsize: The most entries to keep. None means no bound.
+    :param ttl: The seconds an entry stays valid. None means forever.
+    :param clock: The time source for ttl, in seconds.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, *,
+                 clock=time.monotonic):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.uncacheable = 0
+        # key -> [value, expiry time or None, used since stored or spared].
+        # Generated cached wrappers read this dict directly.
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Look a key up.
+
+        :param key: The key.
+        :param default: What to return if the key is missing or expired.
+        :return: The value, or default.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and (entry[1] is None or entry[1] > self.clock()):
+            entry[2] = True
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """
+        Store a value, evicting an entry first if the cache is full.
+
+        :param key: The key.
+        :param value: The value.
+        """
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            entries = self._entries
+            old = entries.pop(key, None)
+            if old is not None and old[1] is not None and old[1] <= self.clock():
+                self.expirations += 1
+            if self.maxsize is not None:
+                while len(entries) >= self.maxsize:
+                    self._evict()
+            entries[key] = [value, expires, False]
+
+    def _evict(self):
+        # Drop the oldest entry, unless it has been used since it was
+        # stored (or last spared): then move it to the back and look at
+        # the next one.  Expired entries go first whatever their flag.
+        entries = self._entries
+        now = self.clock() if self.ttl is not None else None
+        while True:
+            key = next(iter(entries))
+            entry = entries.pop(key)
+            if entry[1] is not None and entry[1] <= now:
+                self.expirations += 1
+                return
+            if not entry[2]:
+                self.evictions += 1
+                return
+            entry[2] = False
+            entries[key] = entry
+
+    def clear(self):
+        """
+        Drop every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        """
+        Reset the counters.
+        """
+        self.hits = self.misses = self.evictions = self.expirations = self.uncacheable = 0
+
+    def stats(self):
+        """
+        Get the cache statistics.
+
+        :return: A dict with the hits, misses, evictions, expirations,
+            uncacheable calls, current size, maxsize and ttl.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'uncacheable': self.uncacheable,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class InternTable:
+    """
+    The table of shared Poly objects handed out by ``Poly.of()``.
+
+    Only values that can't change and are cheap to compare are interned:
+    None, bools, ints, enum members, and str and bytes of at most
+    ``max_length`` items.  Floats are not, since 0.0 and -0.0 compare
+    equal.  Poly.of() wraps anything else (lists, dicts, tuples, floats,
+    long strings) in a new Poly of its own, every time.
+
+    Like TypeCache, lookups are a lock-free ``dict.get`` (one table per
+    type, so 1, 1.0 and True never collide) and the counters are
+    statistics.  Once ``maxsize`` Polys are interned, interning another
+    drops the one interned first: eviction is FIFO, not LRU, since
+    moving a Poly to the back on every hit would take the lock that
+    lookups avoid.  A hot value is dropped like any other under churn,
+    but a dropped Poly that is still referenced somewhere is remembered
+    weakly and taken back on its next lookup, so while any reference to
+    it lives, Poly.of(value) keeps returning that object.
+
+    :param maxsize: The most Polys to keep interned.
+    :param max_length: The longest str or bytes to intern.
+    """
+
+    def __init__(self, maxsize: int = 4096, max_length: int = 64):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.max_length = max_length
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revived = 0
+        self.uninternable = 0
+        # type -> {value: shared Poly}.  Poly.of() reads this directly.
+        self._tables = {}
+        # (table, value) pairs, oldest interned first.
+        self._order = collections.deque()
+        # (type, value) -> dropped Poly, while someone still holds it.
+        self._dropped = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def internable(self, value):
+        """
+        Check whether a value would be interned.
+
+        :param value: The value.
+        :return: True if Poly.of(value) returns a shared Poly.
+        """
+        data_type = type(value)
+        if data_type is str or data_type is bytes:
+            return len(value) <= self.max_length
+        return data_type in _INTERNABLE_TYPES or issubclass(data_type, enum.Enum)
+
+    def intern(self, value):
+        """
+        Get the shared Poly of a value, interning it on a miss.
+
+        :param value: The value.
+        :return: The shared Poly, or a new Poly if the value can't be
+            interned.
+        """
+        data_type = type(value)
+        table = self._tables.get(data_type)
+        if table is not None:
+            poly = table.get(value)
+            if poly is not None:
+                self.hits += 1
+                return poly
+        if not self.internable(value):
+            self.uninternable += 1
+            return Poly(value)
+        with self._lock:
+            table = self._tables.setdefault(data_type, {})
+            poly = table.get(value)
+            if poly is not None:
+                return poly
+            self.misses += 1
+            poly = self._dropped.pop((data_type, value), None)
+            if poly is None:
+                poly = _InternedPoly(value)
+            else:
+                self.revived += 1
+            while len(self._order) >= self.maxsize:
+                oldest_table, oldest = self._order.popleft()
+                dropped = oldest_table.pop(oldest)
+                self._dropped[type(oldest), oldest] = dropped
+                self.evictions += 1
+            table[value] = poly
+            self._order.append((table, value))
+            return poly
+
+    def clear(self):
+        """
+        Drop every interned Poly.
+        """
+        with self._lock:
+            self._tables.clear()
+            self._order.clear()
+            self._dropped.clear()
+
+    def reset_stats(self):
+        """
+        Reset the counters.
+        """
+        self.hits = self.misses = self.evictions = self.revived = self.uninternable = 0
+
+    def stats(self):
+        """
+        Get the table statistics.
+
+        :return: A dict with the hits, misses, evictions, revived and
+            uninternable lookups, current size and maxsize.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'revived': self.revived,
+            'uninternable': self.uninternable,
+            'size': len(self._order),
+            'maxsize': self.maxsize,
+        }
+
+    def __contains__(self, value):
+        table = self._tables.get(type(value))
+        return table is not None and value in table
+
+    def __len__(self):
+        return len(self._order)
+
+
+_INTERNABLE_TYPES = frozenset((type(None), bool, int))
+
+# The table used by Poly.of() across the whole process.
+intern_table = InternTable()
+
+
+# Guards the lazy creation of per-Poly locks and alias mappings.
+_LAZY_LOCK = threading.Lock()
+
+
+def _retire_type(data_type):
+    # Classes built by Poly.extend() are one-offs.  Once a Poly swaps
+    # one out, drop it from the shared cache so dead extension classes
+    # don't pile up in the table.
+    if getattr(data_type, '__poly_extension__', False):
+        type_cache.invalidate(data_type)
+
+
+class _hybridmethod:
+    # A method that can also be called on the class: it gets the class
+    # instead of an instance as its first argument then.
+
+    def __init__(self, func):
+        self.__func__ = func
+        functools.update_wrapper(self, func)
+
+    def __get__(self, instance, owner=None):
+        return types.MethodType(self.__func__, owner if instance is None else instance)
+
+
 class Poly(Generic[T]):
     """
     The Poly class is a utility class that provides dynamic type handling.
@@ -24,6 +410,9 @@ class Poly(Generic[T]):
         validate(target: Type[T]) -> bool
             Validates whether the data is of the target type.
 
+        of(value) -> Poly
+            Returns a shared, read-only Poly of an immutable value.
+
         add_alias(alias: str, target: Type[T])
             Adds an alias for a type.
 
@@ -81,6 +470,17 @@ class Poly(Generic[T]):
 
     """
 
+    # Poly objects are created by the million in fluid, auto_cast and
+    # shapeless_array, so they carry no __dict__: the alias mapping and
+    # the lock are only allocated the first time they are used.
+    __slots__ = (
+        'data',
+        'verbose',
+        'name',
+        '_alias_mapping',
+        '_lock',
+        '__weakref__',
+    )
 
     def __init__(self, data: Any, verbose: bool = False):
         """
@@ -91,25 +491,79 @@ class Poly(Generic[T]):
         """
         self.data = data
         self.verbose = verbose
-        self.type_mapping = {}
-        self.alias_mapping = {}
-        self.lock = threading.Lock()
-        if self.verbose:
+        self._alias_mapping = None
+        self._lock = None
+        if verbose:
             logging.info(f"Created a new Poly object with data: {self.data}")
 
+    @classmethod
+    def of(cls, value):
+        """
+        Get a shared, read-only Poly of an immutable value.
+
+        Small ints, short strings, enum members and the like are interned
+        in ``intern_table``: every call with an equal value of the same
+        type returns the same Poly, without allocating one.  Its data
+        can't be replaced, so extend(), deserialize() and add_alias()
+        raise AttributeError on it; use Poly(value) for a Poly of your
+        own.  Values that aren't interned, such as lists, dicts or
+        floats, get a new Poly like Poly(value) would give.
+
+        :param value: The data.
+        :return: The shared Poly of the value, or a new Poly.
+        """
+        table = intern_table._tables.get(type(value))
+        if table is not None and cls is Poly:
+            poly = table.get(value)
+            if poly is not None:
+                intern_table.hits += 1
+                return poly
+        if cls is not Poly:
+            return cls(value)
+        return intern_table.intern(value)
+
+    @property
+    def alias_mapping(self):
+        """
+        The aliases added with add_alias(), created on first use.
+        """
+        if self._alias_mapping is None:
+            with _LAZY_LOCK:
+                if self._alias_mapping is None:
+                    self._alias_mapping = {}
+        return self._alias_mapping
+
+    @property
+    def lock(self):
+        """
+        A per-object lock, created on first use.
+        """
+        if self._lock is None:
+            with _LAZY_LOCK:
+                if self._lock is None:
+                    self._lock = threading.Lock()
+        return self._lock
+
+    @property
+    def type_mapping(self):
+        """
+        The process-wide type cache shared by every Poly.
+        """
+        return type_cache
+
     def determine(self):
         """
         Determine the type of the data.
 
+        Resolution goes through the process-wide ``type_cache``, so the
+        hot path is a single lock-free dict lookup.
+
         :return: The type of the data.
         """
-        with self.lock:
-            data_type = type(self.data)
-            if data_type not in self.type_mapping:
-                self.type_mapping[data_type] = data_type
-            if self.verbose:
-                logging.info(f"Determined type of data: {data_type}")
-            return self.type_mapping[data_type]
+        data_type = type_cache.resolve(type(self.data))
+        if self.verbose:
+            logging.info(f"Determined type of data: {data_type}")
+        return data_type
 
     def select(self, target):
         """
@@ -127,31 +581,95 @@ class Poly(Generic[T]):
         """
         Attempt to shift the data to the target type.
 
+        Conversions registered with ``converters`` are used when they
+        offer a route, otherwise the target is called on the data directly.
+
         :param target: The target type.
         :return: The data after shifting to the target type.
         :raises TypeError: If the data cannot be shifted to the target type.
         """
         try:
-            return target(self.data)
+            return converters.convert(self.data, target)
         except ValueError:
             if self.verbose:
                 logging.error(f"Failed to shape shift {self.data} to {target}")
             raise TypeError(f"Cannot shape shift {self.data} to {target}")
 
-    def validate(self, target):
+    def validate(self, target, *, sample=None):
         """
         Validate that the data is of the target type.
 
+        The target can be a class or any typing annotation, such as
+        ``List[int]``, ``Dict[str, float]``, ``Optional[...]`` or
+        ``Literal[...]``.  Annotations are compiled into a checker once
+        and cached.
+
         :param target: The target type.
+        :param sample: If given, containers longer than this only have a
+            random sample of this many items checked. Default is None.
         :return: True if the data is of the target type, False otherwise.
         :raises TypeError: If the data is not of the target type.
         """
-        if not isinstance(self.data, target):
+        if type(target) is type:
+            valid = isinstance(self.data, target)
+        else:
+            valid = compile_validator(target, sample)(self.data)
+        if not valid:
             if self.verbose:
                 logging.error(f"{self.data} is not of type {target}")
             raise TypeError(f"{self.data} is not of type {target}")
         return True
 
+    @staticmethod
+    def validate_many(values, target, *, sample=None):
+        """
+        Validate many values at once without raising.
+
+        :param values: An iterable of values.
+        :param target: The target type, a class or typing annotation.
+        :param sample: See validate().
+        :return: A list of (index, value) pairs for the values that failed.
+        """
+        return validate_many(values, target, sample)
+
+    @staticmethod
+    def map_shift(values, target, *, workers=None, chunksize=CHUNKSIZE, failures=None, fill=None):
+        """
+        Shift many values at once, in parallel worker processes.
+
+        Only the raw values and the target are sent to the workers; the
+        shifted values come back in input order.
+
+        :param values: An iterable of values.
+        :param target: The target type.  Must be picklable.
+        :param workers: The number of worker processes. Default is the
+            number of CPUs; 0 shifts the values in this process.
+        :param chunksize: The number of values sent to a worker at a time.
+        :param failures: If given, a list that gets an (index, value) pair
+            for every value that can't be shifted, instead of raising.
+        :param fill: What to yield in place of those values.
+        :return: A generator of the shifted values.
+        :raises TypeError: If a value cannot be shifted and failures is None.
+        """
+        return map_shift(values, target, workers=workers, chunksize=chunksize,
+                         failures=failures, fill=fill)
+
+    @staticmethod
+    def map_validate(values, target, *, workers=None, chunksize=CHUNKSIZE, sample=None):
+        """
+        Validate many values at once, in parallel worker processes.
+
+        :param values: An iterable of values.
+        :param target: The target type, a class or typing annotation.
+            Must be picklable.
+        :param workers: See map_shift().
+        :param chunksize: See map_shift().
+        :param sample: See validate().
+        :return: A list of (index, value) pairs for the values that failed.
+        """
+        return map_validate(values, target, workers=workers, chunksize=chunksize,
+                            sample=sample)
+
     def add_alias(self, alias, target):
         """
         Add an alias for a type.
@@ -175,26 +693,54 @@ class Poly(Generic[T]):
 
         :param extension: The new type.
         """
-        class ExtendedType(type(self.data), extension):
-            pass
+        previous_type = type(self.data)
+
+        class ExtendedType(previous_type, extension):
+            __poly_extension__ = True
         self.data = ExtendedType(self.data)
+        _retire_type(previous_type)
 
-    def serialize(self):
+    def serialize(self, *, allow_pickle: Optional[bool] = None):
         """
         Serialize the data.
 
+        Uses the compact, pickle-free format of ``default_codecs``: see
+        CodecRegistry for the types it handles and how to add more.
+
+        :param allow_pickle: If True, pickle values that have no codec instead
+            of raising. Default is the registry's setting (False).
         :return: The serialized data.
+        :raises TypeError: If the data has no codec and pickle is not allowed.
         """
-        return pickle.dumps(self.data)
+        from shapeless.codec import default_codecs
 
-    def deserialize(self, serialized_data):
+        return default_codecs.dumps(self.data, allow_pickle=allow_pickle)
+
+    @_hybridmethod
+    def deserialize(self, serialized_data, *, allow_pickle: Optional[bool] = None):
         """
         Deserialize the data.
 
+        Called on the class, returns a new Poly holding the data.  Called on
+        a Poly, replaces its data and returns it.
+
         :param serialized_data: The serialized data.
-        :return: The deserialized data.
+        :param allow_pickle: If True, also load payloads written by pickle.
+            Only use this for trusted data. Default is the registry's
+            setting (False).
+        :return: The deserialized data, or a new Poly when called on the class.
+        :raises ValueError: If the data is malformed, or needs pickle and
+            pickle is not allowed.
         """
-        self.data = pickle.loads(serialized_data)
+        from shapeless.codec import default_codecs
+
+        data = default_codecs.loads(serialized_data, allow_pickle=allow_pickle)
+        if isinstance(self, type):
+            return self(data)
+        previous_type = type(self.data)
+        self.data = data
+        if type(self.data) is not previous_type:
+            _retire_type(previous_type)
         return self.data
 
     def __instancecheck__(self, instance):
@@ -219,44 +765,717 @@ class Poly(Generic[T]):
     def __set_name__(self, owner, name):
         self.name = name
 
-    
-    
-def shapeless(cls):
+
+
+class _InternedPoly(Poly):
+    # The shared Polys of InternTable.  Anyone may hold one, so nothing
+    # about them can be changed (but the lazily created lock).
+
+    __slots__ = ()
+
+    def __init__(self, data):
+        object.__setattr__(self, 'data', data)
+        object.__setattr__(self, 'verbose', False)
+        object.__setattr__(self, '_alias_mapping', None)
+        object.__setattr__(self, '_lock', None)
+
+    def __setattr__(self, name, value):
+        if name == '_lock':
+            object.__setattr__(self, name, value)
+            return
+        raise AttributeError(
+            f"Poly.of({self.data!r}) is shared and read-only: "
+            f"use Poly({self.data!r}) for a Poly you can change")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Poly.of({self.data!r}) is shared and read-only")
+
+    @property
+    def alias_mapping(self):
+        return _NO_ALIASES
+
+    def add_alias(self, alias, target):
+        raise AttributeError(
+            f"Poly.of({self.data!r}) is shared and read-only: "
+            f"use Poly({self.data!r}) to add aliases")
+
+    def __reduce__(self):
+        return Poly.of, (self.data,)
+
+
+_NO_ALIASES = types.MappingProxyType({})
+
+
+def shapeless(cls=None, *, verbose: bool = False):
     """
     A decorator that makes all the variables in a class polymorphic.
+
+    All of the work happens once, when the class is decorated.  Each
+    function, staticmethod and classmethod defined in the class gets a
+    wrapper generated for its own signature that passes every argument
+    through Poly.  When that is a no-op (Poly(arg).data is arg unless
+    verbose logging is on), the method is left untouched, so decorated
+    methods cost exactly as much as undecorated ones.
+
+    :param cls: The class to decorate.
+    :param verbose: If True, log the creation of every argument's Poly.
+    :return: The decorated class.
     """
-    for attr_name, attr_value in cls.__dict__.items():
-        if callable(attr_value):
-            def wrapper(*args, attr_value=attr_value, **kwargs):
-                poly_args = [Poly(arg).data for arg in args]
-                poly_kwargs = {k: Poly(v).data for k, v in kwargs.items()}
-                return attr_value(*poly_args, **poly_kwargs)
+    def wrap(cls):
+        if not verbose:
+            return cls
+        poly = functools.partial(Poly, verbose=True)
+        for attr_name, attr_value in list(cls.__dict__.items()):
+            if isinstance(attr_value, (staticmethod, classmethod)):
+                func = attr_value.__func__
+                if isinstance(attr_value, classmethod):
+                    # Leave cls itself alone, like self for methods.
+                    wrapper = type(attr_value)(_method_wrapper(func, poly, skip_first=True))
+                else:
+                    wrapper = type(attr_value)(_method_wrapper(func, poly))
+            elif isinstance(attr_value, types.FunctionType):
+                wrapper = _method_wrapper(attr_value, poly, skip_first=True)
+            else:
+                # Nested classes, properties and other descriptors.
+                continue
             setattr(cls, attr_name, wrapper)
-    return cls
+        return cls
+
+    # See if we're being called as @shapeless or @shapeless().
+    if cls is None:
+        return wrap
+    return wrap(cls)
 
 
+def _method_wrapper(func, poly, skip_first=False):
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        return func
+    wrapper = _generate_wrapper(func, signature, poly=poly, unwrap=True,
+                                log_errors=False, skip_first=skip_first)
+    return functools.wraps(func)(wrapper)
+
 
-def fluid(func):
+def fluid(func=None, *, batch_size: Optional[int] = None,
+          batch_window: Optional[float] = None, max_concurrency: Optional[int] = None,
+          cache=None):
     """
     A decorator that makes a function able to handle any type of arguments.
 
+    The signature of func is inspected once, and a wrapper with the same
+    parameters is generated for it, so each call wraps the arguments in
+    Poly and passes them straight through without building intermediate
+    lists or dicts.  Arguments that are not passed are left to func's own
+    defaults, exactly as before.
+
+    The decorated function can also dispatch on the types of its
+    positional arguments.  Implementations are registered per tuple of
+    types, and func remains the fallback:
+
+        @fluid
+        def combine(a, b):
+            raise TypeError("can't combine")
+
+        @combine.register(int, int)
+        def _(a, b):
+            return a.data + b.data
+
+        @combine.register(str, object)
+        def _(a, b):
+            return a.data + str(b.data)
+
+    Positional parameters left to their defaults take part in dispatch
+    with the type of the default.  The implementation chosen for each
+    concrete tuple of types is cached, so after warm-up dispatch is a
+    single dict lookup.
+
+    An ``async def`` function gets an async wrapper, which awaits it and
+    logs what it raises, like the synchronous wrapper does.
+
+    Async functions can also be micro-batched: with batch_size or
+    batch_window, the decorated function takes a list and returns a
+    list of results in the same order, and callers await it with one
+    value each.  Calls made within batch_window seconds of the first
+    pending one, or until batch_size of them are pending, are coalesced
+    into a single call of the function:
+
+        @fluid(batch_size=64, batch_window=0.002)
+        async def lookup(keys):
+            rows = await db.fetch_many([key.data for key in keys])
+            return [rows.get(key.data) for key in keys]
+
+        price = await lookup("AAPL")
+
+    The function gets the values wrapped in Poly.  An exception it raises
+    is raised to every caller in the batch; an exception instance in the
+    returned list is raised to that caller only.  max_concurrency limits
+    how many calls (or batches) run at a time per event loop.  Batched
+    and limited functions have a ``metrics`` attribute, a FluidMetrics.
+
+    Pure functions can be memoized with cache: True for an LRU cache of
+    1024 results, an int for that many, or a FluidCache for a ttl too.
+    Results are keyed by the arguments and their determine()d types, so
+    f(1), f(1.0) and f(True) are cached apart; unhashable arguments are
+    keyed by their contents (lists, dicts and sets of hashable items
+    directly, anything else by a digest of its serialized form).  Calls
+    with Poly arguments, or arguments that can be neither hashed nor
+    serialized, are not cached.  A hit
+    returns the stored result without wrapping any argument in Poly.
+    The cache is the ``cache`` attribute of the decorated function, and
+    registering an implementation clears it:
+
+        @fluid(cache=FluidCache(maxsize=256, ttl=60))
+        def price(symbol):
+            return fetch_price(symbol.data)
+
+        price.cache.stats()   # {'hits': ..., 'misses': ..., 'evictions': ...}
+
     :param func: The function to decorate.
+    :param batch_size: Coalesce up to this many calls into one batch.
+    :param batch_window: Wait at most this many seconds for a batch to
+        fill.  Default is to coalesce only the calls made before the
+        event loop next runs.
+    :param max_concurrency: The most calls of an async function that run
+        at the same time.
+    :param cache: True, a maxsize or a FluidCache, to memoize the results.
     :return: The decorated function.
+    :raises TypeError: If batching or max_concurrency is asked of a
+        function that is not async.
+    """
+    options = (batch_size, batch_window, max_concurrency)
+    if func is None:
+        return lambda func: fluid(func, batch_size=batch_size, batch_window=batch_window,
+                                  max_concurrency=max_concurrency, cache=cache)
+    if cache is not None and cache is not False:
+        return _fluid_cached(fluid(func, batch_size=batch_size, batch_window=batch_window,
+                                   max_concurrency=max_concurrency),
+                             _fluid_cache(cache))
+    if options != (None, None, None):
+        return _fluid_async_options(func, *options)
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        # No introspectable signature (some builtins): wrap generically.
+        signature = _GENERIC_SIGNATURE
+    wrapper = _fluid_specialized_wrapper(func, signature)
+    functools.wraps(func)(wrapper)
+    wrapper.register = functools.partial(_fluid_register, wrapper)
+    return wrapper
+
+
+def _fluid_cache(cache):
+    if cache is True:
+        return FluidCache()
+    if isinstance(cache, FluidCache):
+        return cache
+    if isinstance(cache, int) and not isinstance(cache, bool):
+        return FluidCache(maxsize=cache)
+    raise TypeError(f"cache must be True, a maxsize or a FluidCache, not {cache!r}")
+
+
+def _fluid_cached(wrapper, cache):
+    # Memoize a fluid wrapper: look the raw arguments up before any of
+    # them is wrapped in Poly.
+    try:
+        signature = inspect.signature(wrapper)
+    except (TypeError, ValueError):
+        signature = _GENERIC_SIGNATURE
+    cached = _generate_cached_wrapper(wrapper, signature, cache,
+                                      is_async=inspect.iscoroutinefunction(wrapper))
+    functools.wraps(wrapper)(cached)
+    cached.cache = cache
+    if hasattr(wrapper, 'register'):
+        def registered():
+            # New implementations change the results.
+            cache.clear()
+            cached.dispatch = wrapper.dispatch
+            cached.registry = wrapper.registry
+        cached.register = functools.partial(_fluid_register, wrapper, on_register=registered)
+    return cached
+
+
+def _generate_cached_wrapper(wrapper, signature, cache, *, is_async):
+    # Generate a memoizing wrapper whose parameter list mirrors the
+    # function's, so the key is built without packing the arguments.
+    # For "def f(a, b=1, *args, c, **kw)" that is roughly:
+    #
+    #   def f(a, b=__fluid_missing__, *args, c, **kw):
+    #    __fluid_types__ = (type(a), type(b), *map(type, args), type(c),
+    #                       *map(type, kw.values()))
+    #    if __fluid_poly__ in __fluid_types__:
+    #     return __fluid_slow__((a, b, *args), {'c': c, **kw})
+    #    __fluid_key__ = (__fluid_types__, a, b, *args, c, *kw.items())
+    #    try:
+    #     __fluid_entry__ = __fluid_entries__.get(__fluid_key__)
+    #    except TypeError:
+    #     return __fluid_slow__((a, b, *args), {'c': c, **kw})
+    #    if __fluid_entry__ is not None and (not expired):
+    #     <count the hit and return __fluid_entry__[0]>
+    #    __fluid_result__ = __fluid_func__(a, b, *args, c=c, **kw)
+    #    __fluid_cache__.put(__fluid_key__, __fluid_result__)
+    #    return __fluid_result__
+    #
+    # Unpassed parameters stay __fluid_missing__, which the fluid
+    # wrapper then treats as not passed.  Calls with Poly or unhashable
+    # arguments take the slow path (see _fluid_cache_key).
+    from shapeless.liquid import _create_fn
+
+    globals = {'__fluid_func__': wrapper,
+               '__fluid_cache__': cache,
+               '__fluid_entries__': cache._entries,
+               '__fluid_clock__': cache.clock,
+               '__fluid_poly__': Poly,
+               '__fluid_missing__': _FLUID_MISSING,
+               '__fluid_slow__': functools.partial(
+                   _fluid_cached_call_async if is_async else _fluid_cached_call,
+                   cache, wrapper)}
+    params = []
+    types = []
+    values = []
+    positional = []
+    keywords = []
+    call_args = []
+    seen_positional_only = False
+    seen_var_positional = False
+    for param in signature.parameters.values():
+        name = param.name
+        declared = name
+        if param.default is not param.empty:
+            declared = f'{name}=__fluid_missing__'
+        if param.kind is param.POSITIONAL_ONLY:
+            seen_positional_only = True
+            params.append(declared)
+        elif seen_positional_only:
+            params.append('/')
+            seen_positional_only = False
+        if param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+            if param.kind is param.POSITIONAL_OR_KEYWORD:
+                params.append(declared)
+            types.append(f'type({name})')
+            values.append(name)
+            positional.append(name)
+            call_args.append(name)
+        elif param.kind is param.VAR_POSITIONAL:
+            seen_var_positional = True
+            params.append(f'*{name}')
+            types.append(f'*map(type, {name})')
+            values.append(f'*{name}')
+            positional.append(f'*{name}')
+            call_args.append(f'*{name}')
+        elif param.kind is param.KEYWORD_ONLY:
+            if not seen_var_positional:
+                params.append('*')
+                seen_var_positional = True
+            params.append(declared)
+            types.append(f'type({name})')
+            values.append(name)
+            keywords.append(f'{name!r}: {name}')
+            call_args.append(f'{name}={name}')
+        else:
+            params.append(f'**{name}')
+            types.append(f'*map(type, {name}.values())')
+            values.append(f'*{name}.items()')
+            keywords.append(f'**{name}')
+            call_args.append(f'**{name}')
+    if seen_positional_only:
+        params.append('/')
+
+    slow = f'return __fluid_slow__(({"".join(p + "," for p in positional)}), ' \
+           f'{{{",".join(keywords)}}})'
+    call = f'{"await " if is_async else ""}__fluid_func__({",".join(call_args)})'
+    body = [
+        f'__fluid_types__ = ({"".join(t + "," for t in types)})',
+        'if __fluid_poly__ in __fluid_types__:',
+        f' {slow}',
+        f'__fluid_key__ = (__fluid_types__,{"".join(v + "," for v in values)})',
+        'try:',
+        ' __fluid_entry__ = __fluid_entries__.get(__fluid_key__)',
+        'except TypeError:',
+        f' {slow}',
+        'if __fluid_entry__ is not None and (__fluid_entry__[1] is None '
+        'or __fluid_entry__[1] > __fluid_clock__()):',
+        ' __fluid_entry__[2] = True',
+        ' __fluid_cache__.hits += 1',
+        ' return __fluid_entry__[0]',
+        '__fluid_cache__.misses += 1',
+        f'__fluid_result__ = {call}',
+        '__fluid_cache__.put(__fluid_key__, __fluid_result__)',
+        'return __fluid_result__',
+    ]
+    return _create_fn('__fluid_cached__', params, body, globals=globals,
+                      is_async=is_async)
+
+
+# Marks the stand-in for an unhashable argument in a cache key.
+_CONTENTS_MARK = object()
+
+# Unhashable containers -> a hashable stand-in with the same contents,
+# items' types included, as at the top level.  The argument's own type
+# is in the key too, so a list and a tuple of the same items stay apart.
+_FROZEN = {
+    list: lambda value: (tuple(value), tuple(map(type, value))),
+    dict: lambda value: (tuple(value.items()), tuple(map(type, value)),
+                         tuple(map(type, value.values()))),
+    set: lambda value: frozenset(zip(map(type, value), value)),
+    bytearray: bytes,
+}
+
+
+def _fluid_cache_key(args, kwargs):
+    # The key for calls the generated wrapper can't key itself, with
+    # unhashable arguments keyed by their contents (see _contents).
+    # None if an argument is a Poly (mutable, and fluid passes it on
+    # wrapped once more, so it can't share a key with its data) or can
+    # be neither hashed nor serialized.
+    values = args
+    types = tuple(map(type, args))
+    if kwargs:
+        # Keyword-only arguments are keyed by value, **kwargs by item.
+        values += tuple(kwargs.items())
+        types += tuple(map(type, kwargs.values()))
+    if Poly in types:
+        return None
+    try:
+        return (types, *map(_contents, values))
+    except TypeError:
+        return None
+
+
+def _contents(value):
+    # Flat lists, dicts and sets stand for a frozen copy; other
+    # hashable values for themselves; anything else for a digest of its
+    # serialized form.
+    freeze = _FROZEN.get(type(value))
+    if freeze is None:
+        try:
+            hash(value)
+            return value
+        except TypeError:
+            pass
+    else:
+        frozen = (_CONTENTS_MARK, freeze(value))
+        try:
+            hash(frozen)
+            return frozen
+        except TypeError:
+            pass
+    from shapeless.codec import default_codecs
+
+    data = default_codecs.dumps(value)
+    return (_CONTENTS_MARK, hashlib.blake2b(data, digest_size=16).digest())
+
+
+def _fluid_cached_call(cache, func, args, kwargs):
+    key = _fluid_cache_key(args, kwargs)
+    if key is None:
+        cache.uncacheable += 1
+        return func(*args, **kwargs)
+    result = cache.get(key, _FLUID_MISSING)
+    if result is _FLUID_MISSING:
+        result = func(*args, **kwargs)
+        cache.put(key, result)
+    return result
+
+
+async def _fluid_cached_call_async(cache, func, args, kwargs):
+    key = _fluid_cache_key(args, kwargs)
+    if key is None:
+        cache.uncacheable += 1
+        return await func(*args, **kwargs)
+    result = cache.get(key, _FLUID_MISSING)
+    if result is _FLUID_MISSING:
+        result = await func(*args, **kwargs)
+        cache.put(key, result)
+    return result
+
+
+def _fluid_async_options(func, batch_size, batch_window, max_concurrency):
+    from shapeless.batching import batched
+
+    if not inspect.iscoroutinefunction(func):
+        raise TypeError(f"batch_size, batch_window and max_concurrency need an "
+                        f"async def function, not {func!r}")
+    for name, value in (('batch_size', batch_size), ('max_concurrency', max_concurrency)):
+        if value is not None and value < 1:
+            raise ValueError(f"{name} must be at least 1")
+    if batch_window is not None and batch_window < 0:
+        raise ValueError("batch_window must not be negative")
+    if batch_size is None and batch_window is None:
+        # Only a limit: the usual wrapper, awaited under a semaphore.
+        inner = fluid(func)
+        wrapper = batched(inner, max_concurrency=max_concurrency)
+        wrapper.register = inner.register
+        return wrapper
+    return batched(func, batch_size=batch_size, batch_window=batch_window,
+                   max_concurrency=max_concurrency)
+
+
+def _fluid_specialized_wrapper(func, signature):
+    return _generate_wrapper(func, signature, poly=Poly, unwrap=False,
+                             log_errors=True,
+                             is_async=inspect.iscoroutinefunction(func))
+
+
+_GENERIC_SIGNATURE = inspect.Signature([
+    inspect.Parameter('args', inspect.Parameter.VAR_POSITIONAL),
+    inspect.Parameter('kwargs', inspect.Parameter.VAR_KEYWORD),
+])
+
+
+def _fluid_register(wrapper, *arg_types, func=None, on_register=None):
+    # wrapper.register(*types): the first registration swaps the
+    # generated wrapper's target for a FluidDispatcher.
+    if len(arg_types) == 1 and callable(arg_types[0]) and not isinstance(arg_types[0], type):
+        # @f.register without types: read them from the annotations.
+        func, = arg_types
+        hints = typing.get_type_hints(func)
+        params = [p for p in inspect.signature(func).parameters.values()
+                  if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+        arg_types = tuple(_unwrap_poly_hint(hints.get(p.name, object)) for p in params)
+        return _fluid_register(wrapper, *arg_types, func=func, on_register=on_register)
+    if func is None:
+        return lambda func: _fluid_register(wrapper, *arg_types, func=func,
+                                            on_register=on_register)
+
+    dispatcher = wrapper.__globals__['__fluid_func__']
+    if not isinstance(dispatcher, FluidDispatcher):
+        dispatcher = FluidDispatcher(dispatcher)
+        try:
+            signature = inspect.signature(wrapper, follow_wrapped=True)
+        except (TypeError, ValueError):
+            signature = _GENERIC_SIGNATURE
+        if _dispatches_inline(signature):
+            # Recompile the wrapper in place with the lookup inlined.
+            inline = _generate_wrapper(dispatcher.default, signature, poly=Poly,
+                                       unwrap=False, log_errors=True,
+                                       dispatcher=dispatcher,
+                                       is_async=inspect.iscoroutinefunction(wrapper))
+            wrapper.__globals__.update(inline.__globals__)
+            wrapper.__code__ = inline.__code__
+        wrapper.__globals__['__fluid_func__'] = dispatcher
+        wrapper.dispatch = dispatcher.dispatch
+        wrapper.registry = dispatcher.registry
+    dispatcher.add(arg_types, func)
+    if on_register is not None:
+        on_register()
+    return func
+
+
+def _unwrap_poly_hint(hint):
+    # Annotating a fluid implementation with Poly means "anything".
+    if hint is Poly or typing.get_origin(hint) is Poly:
+        return object
+    return hint
+
+
+class FluidDispatcher:
+    """
+    The multiple-dispatch table behind a fluid function's register().
+
+    Implementations are keyed by the tuple of types of the positional
+    arguments' data.  Resolution walks the registrations MRO-aware on a
+    cache miss only: an implementation applies when every argument type
+    is a subclass of the registered type, and the most specific applicable
+    implementation wins.  Registrations clear the cache.
+
+    :param default: The function called when no implementation applies.
     """
-    def wrapper(*args, **kwargs):
-        # Convert all arguments to Poly
-        poly_args = [Poly(arg) for arg in args]
-        poly_kwargs = {k: Poly(v) for k, v in kwargs.items()}
 
+    def __init__(self, default):
+        self.default = default
+        self.__name__ = getattr(default, '__name__', repr(default))
+        self._registry = {}
+        self.registry = types.MappingProxyType(self._registry)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def add(self, arg_types, func):
+        """
+        Register func for the given argument types.
+
+        :param arg_types: The types of the positional arguments.
+        :param func: The implementation.
+        """
+        for tp in arg_types:
+            if not isinstance(tp, type):
+                raise TypeError(f"Invalid dispatch type {tp!r}: must be a class")
+        with self._lock:
+            self._registry[tuple(arg_types)] = func
+            self._cache.clear()
+
+    def dispatch(self, *arg_types):
+        """
+        Get the implementation that a call with these argument types uses.
+
+        :param arg_types: The types of the positional arguments.
+        :return: The implementation.
+        :raises TypeError: If two implementations apply and neither is more
+            specific than the other.
+        """
         try:
-            # Call the function with the converted arguments
-            return func(*poly_args, **poly_kwargs)
-        except Exception as e:
-            # Log any errors that occur during the function call
-            logging.error(f"Error in function applying the fluid wrapper {func.__name__}: {e}")
-            raise
+            return self._cache[arg_types]
+        except KeyError:
+            pass
+        with self._lock:
+            func = self._resolve(arg_types)
+            self._cache[arg_types] = func
+        return func
+
+    def __call__(self, *args, **kwargs):
+        # Positional parameters left to their defaults arrive unwrapped.
+        key = tuple([type(arg.data) if type(arg) is Poly else type(arg)
+                     for arg in args])
+        try:
+            func = self._cache[key]
+        except KeyError:
+            func = self.dispatch(*key)
+        return func(*args, **kwargs)
+
+    def _resolve(self, arg_types):
+        candidates = [key for key in self._registry
+                      if len(key) == len(arg_types)
+                      and all(issubclass(t, k) for t, k in zip(arg_types, key))]
+        if not candidates:
+            return self.default
+        # Keep the candidates that no other candidate is more specific than.
+        best = [key for key in candidates
+                if not any(other != key and _more_specific(other, key)
+                           for other in candidates)]
+        if len(best) > 1:
+            names = ', '.join('(' + ', '.join(t.__name__ for t in key) + ')'
+                              for key in best)
+            raise TypeError(f"Ambiguous dispatch for {self.__name__} with "
+                            f"argument types {arg_types}: {names}")
+        return self._registry[best[0]]
+
+
+def _more_specific(a, b):
+    return all(issubclass(x, y) for x, y in zip(a, b))
+
+
+def _generate_wrapper(func, signature, *, poly, unwrap, log_errors,
+                      skip_first=False, dispatcher=None, is_async=False):
+    # Generate the source of a wrapper whose parameter list mirrors
+    # func's.  For "def f(a, b=1, *args, c, **kw)" that is roughly:
+    #
+    #   def f(a, b=__fluid_missing__, *args, c, **kw):
+    #    try:
+    #     return __fluid_func__(__fluid_poly__(a),
+    #                           __fluid_dflt_b__ if b is __fluid_missing__
+    #                               else __fluid_poly__(b),
+    #                           *map(__fluid_poly__, args),
+    #                           c=__fluid_poly__(c),
+    #                           **{k: __fluid_poly__(v) for k, v in kw.items()})
+    #    except Exception as __fluid_error__:
+    #     __fluid_log__(__fluid_func__, __fluid_error__)
+    #     raise
+    #
+    # unwrap=True passes __fluid_poly__(a).data instead (for @shapeless),
+    # and skip_first leaves the first parameter (self or cls) alone.  With
+    # a dispatcher, the call goes to the implementation registered for
+    # the positional arguments' types instead (see fluid.register).
+    # is_async makes it an "async def" that awaits the call, so errors
+    # raised inside a coroutine function are caught and logged too.
+    from shapeless.liquid import _create_fn
+
+    globals = {'__fluid_func__': func,
+               '__fluid_poly__': poly,
+               '__fluid_missing__': _FLUID_MISSING,
+               '__fluid_log__': _fluid_log_error}
+    data = '.data' if unwrap else ''
+    if unwrap:
+        globals['__fluid_unwrap__'] = lambda value: poly(value).data
+    mapper = '__fluid_unwrap__' if unwrap else '__fluid_poly__'
+    params = []
+    call_args = []
+    seen_positional_only = False
+    seen_var_positional = False
+    for index, param in enumerate(signature.parameters.values()):
+        name = param.name
+        if skip_first and index == 0 and param.kind in (param.POSITIONAL_ONLY,
+                                                        param.POSITIONAL_OR_KEYWORD):
+            value = name
+        else:
+            value = f'__fluid_poly__({name}){data}'
+        if param.default is not param.empty:
+            globals[f'__fluid_dflt_{name}__'] = param.default
+            value = (f'__fluid_dflt_{name}__ if {name} is __fluid_missing__ '
+                     f'else {value}')
+            declared = f'{name}=__fluid_missing__'
+        else:
+            declared = name
+
+        if param.kind is param.POSITIONAL_ONLY:
+            seen_positional_only = True
+            params.append(declared)
+            call_args.append(value)
+            continue
+        if seen_positional_only:
+            params.append('/')
+            seen_positional_only = False
+        if param.kind is param.POSITIONAL_OR_KEYWORD:
+            params.append(declared)
+            call_args.append(value)
+        elif param.kind is param.VAR_POSITIONAL:
+            seen_var_positional = True
+            params.append(f'*{name}')
+            call_args.append(f'*map({mapper}, {name})')
+        elif param.kind is param.KEYWORD_ONLY:
+            if not seen_var_positional:
+                params.append('*')
+                seen_var_positional = True
+            params.append(declared)
+            call_args.append(f'{name}={value}')
+        else:
+            params.append(f'**{name}')
+            call_args.append(f'**{{k: __fluid_poly__(v){data} for k, v in {name}.items()}}')
+    if seen_positional_only:
+        params.append('/')
+
+    call = f'return {"await " if is_async else ""}__fluid_func__({",".join(call_args)})'
+    body = [call]
+    if dispatcher is not None:
+        # Look the implementation up by the raw arguments' types before
+        # wrapping them; on a cache miss, let the dispatcher resolve it.
+        globals['__fluid_cache__'] = dispatcher._cache
+        globals['__fluid_dispatch__'] = dispatcher.dispatch
+        key = ''.join(f'type({p.name}),' for p in signature.parameters.values()
+                      if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+        body = [f'__fluid_impl__ = __fluid_cache__.get(({key}))',
+                'if __fluid_impl__ is None:',
+                f' __fluid_impl__ = __fluid_dispatch__({key})',
+                call.replace('__fluid_func__(', '__fluid_impl__(', 1)]
+    if log_errors:
+        body = ['try:',
+                *[f' {line}' for line in body],
+                'except Exception as __fluid_error__:',
+                ' __fluid_log__(__fluid_func__, __fluid_error__)',
+                ' raise']
+    return _create_fn('__fluid_wrapper__', params, body, globals=globals,
+                      is_async=is_async)
+
+
+def _dispatches_inline(signature):
+    # Can a generated wrapper build the dispatch key from its own
+    # parameters?  Only if every positional parameter is always bound,
+    # i.e. there are no positional defaults and no *args.
+    return all(p.kind in (p.KEYWORD_ONLY, p.VAR_KEYWORD)
+               or (p.kind is not p.VAR_POSITIONAL and p.default is p.empty)
+               for p in signature.parameters.values())
+
+
+# Marks a parameter of a generated fluid wrapper that was not passed.
+class _FluidMissing:
+    def __repr__(self):
+        return '<missing>'
+_FLUID_MISSING = _FluidMissing()
+
+
+def _fluid_log_error(func, e):
+    # Log any errors that occur during the function call
+    logging.error(f"Error in function applying the fluid wrapper {func.__name__}: {e}")
 
-    return wrapper
 
 def dynamic_import(module_name):
     """
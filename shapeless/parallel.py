@@ -0,0 +1,142 @@
+import collections
+import itertools
+import os
+
+from shapeless.convert import converters
+from shapeless.typecheck import compile_validator
+
+# Values sent to a worker at a time.
+CHUNKSIZE = 10_000
+
+# Exceptions that mean a value can't be shifted, rather than a bug.
+_SHIFT_ERRORS = (ValueError, TypeError)
+
+
+def map_shift(values, target, *, workers=None, chunksize=CHUNKSIZE, failures=None, fill=None):
+    """
+    Shift every value of an iterable to the target type, in worker processes.
+
+    The values are split into chunks that are shifted by a pool of worker
+    processes, as Poly(value).shift(target) would.  Only the raw values
+    and the target are sent to the workers, and the results come back in
+    input order, a couple of chunks per worker in flight at a time, so
+    the input can be a generator far bigger than memory.
+
+    Workers use the ``converters`` registry as their own import of
+    shapeless left it: converters registered at import time of a module
+    the workers import (or inherited through fork) are used, others
+    aren't.
+
+    :param values: An iterable of values.
+    :param target: The target type.  Must be picklable, e.g. a class
+        defined at module level.
+    :param workers: The number of worker processes. Default is the number
+        of CPUs; 0 shifts the values in this process.
+    :param chunksize: The number of values sent to a worker at a time.
+    :param failures: If given, a list that gets an (index, value) pair for
+        every value that can't be shifted, which is yielded as fill.
+        Default is to raise.
+    :param fill: What to yield for values that fail, if failures is given.
+    :return: A generator of the shifted values.
+    :raises TypeError: If a value cannot be shifted and failures is None.
+    """
+    offset = 0
+    for chunk, (shifted, failed) in _map_chunks(_shift_chunk, target, values,
+                                                workers, chunksize):
+        if failed:
+            if failures is None:
+                value = chunk[failed[0]]
+                if failed[0]:
+                    yield from shifted[:failed[0]]
+                raise TypeError(f"Cannot shape shift {value} to {target}")
+            for i in failed:
+                failures.append((offset + i, chunk[i]))
+                shifted[i] = fill
+        offset += len(chunk)
+        yield from shifted
+
+
+def map_validate(values, target, *, workers=None, chunksize=CHUNKSIZE, sample=None):
+    """
+    Validate every value of an iterable against the target, in worker processes.
+
+    Like validate_many(), but the values are checked by a pool of worker
+    processes, chunk by chunk.  Only the positions of the failures come
+    back from the workers.
+
+    :param values: An iterable of values.
+    :param target: The target type, a class or typing annotation.  Must be
+        picklable.
+    :param workers: See map_shift().
+    :param chunksize: See map_shift().
+    :param sample: See compile_validator().
+    :return: A list of (index, value) pairs for the values that failed.
+    """
+    failures = []
+    offset = 0
+    for chunk, failed in _map_chunks(_validate_chunk, (target, sample), values,
+                                     workers, chunksize):
+        failures.extend((offset + i, chunk[i]) for i in failed)
+        offset += len(chunk)
+    return failures
+
+
+def _map_chunks(func, arg, values, workers, chunksize):
+    # Yield (chunk, func(chunk, arg)) for successive chunks of values,
+    # in order.
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    values = iter(values)
+    chunks = iter(lambda: list(itertools.islice(values, chunksize)), [])
+    if workers == 0:
+        for chunk in chunks:
+            yield chunk, func(chunk, arg)
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(workers) as pool:
+        # Keep a couple of chunks per worker in flight, so that neither
+        # the input nor the results pile up in memory.
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(func, chunk, arg)))
+            if len(pending) >= 2 * workers:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+
+def _shift_chunk(values, target):
+    # Runs in a worker process.  Returns the shifted values (None where
+    # a value failed) and the positions of the failures.
+    if not converters._edges:
+        # No registered routes: Poly.shift() calls the target, so try
+        # the whole chunk at C speed first.
+        try:
+            return list(map(target, values)), []
+        except _SHIFT_ERRORS:
+            pass
+    convert = converters.convert
+    shifted = []
+    failed = []
+    for i, value in enumerate(values):
+        try:
+            shifted.append(convert(value, target))
+        except _SHIFT_ERRORS:
+            shifted.append(None)
+            failed.append(i)
+    return shifted, failed
+
+
+def _validate_chunk(values, arg):
+    # Runs in a worker process.  Returns the positions of the failures.
+    target, sample = arg
+    if type(target) is type:
+        return [i for i, value in enumerate(values) if not isinstance(value, target)]
+    check = compile_validator(target, sample)
+    return [i for i, value in enumerate(values) if not check(value)]
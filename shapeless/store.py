@@ -0,0 +1,424 @@
+import io
+import mmap
+import os
+import pickle
+import struct
+from array import array
+
+from shapeless.codec import default_codecs
+from shapeless.main import Poly
+
+# The data file starts with a magic number and a format version, followed
+# by records back to back.  Each record is a frame header, the length of
+# its body and what kind of body it is, then the body.
+_MAGIC = b'PLYS'
+_VERSION = 1
+_HEADER = struct.Struct('<4sB3x')
+_FRAME = struct.Struct('<IB')
+_MAX_BODY = (1 << 32) - 1
+
+# Record kinds.
+_CODEC = 0
+_BYTES = 1
+_BYTEARRAY = 2
+_PICKLE = 3
+
+# The index file holds the offset of every record in the data file.
+_OFFSET = struct.Struct('<Q')
+
+# A pickle record body is the number of out-of-band buffers, their
+# lengths, the buffers themselves, then the pickle stream.  Each buffer
+# starts at a file offset that is a multiple of _ALIGN, so that arrays
+# loaded from it are aligned.
+_BUFFER_COUNT = struct.Struct('<I')
+_ALIGN = 64
+
+# bytes and bytearray values at least this big are written straight from
+# their own buffer instead of going through the codec.
+BUFFER_THRESHOLD = 1 << 16
+
+
+class PolyStore:
+    """
+    An append-only file of serialized values, with random access.
+
+    Every value is written as a length-prefixed record in the data file,
+    and its offset is appended to an index file next to it (``path +
+    '.idx'``).  store[i] looks the offset up and decodes the record
+    straight from a memory map of the file, so opening a store and
+    reading a record does not read anything else.  Iterating reads the
+    records in order through a small buffer, so memory use is bounded by
+    the largest record rather than by the file.
+
+    Values are encoded with a CodecRegistry (``default_codecs`` unless
+    another is given), the same format as Poly.serialize().  Two kinds of
+    value skip the codec so that large payloads are not copied:
+
+    - bytes and bytearray values of BUFFER_THRESHOLD bytes or more are
+      written from their own buffer.  buffer(i) returns them as a
+      memoryview into the file.
+    - With allow_pickle=True, values that have no codec are pickled with
+      protocol 5, and their buffers (NumPy arrays, PickleBuffer, ...) are
+      written out of band.  Reading them back maps the buffers from the
+      file instead of copying them, so the arrays are read-only.  Pickle
+      records are only loaded by a store opened with allow_pickle=True.
+
+    If the process dies while appending, the store recovers on the next
+    open: records missing from the index are indexed again, and a
+    partially written last record is dropped.
+
+    ###### USAGE EXAMPLES ######
+
+    ```
+    from shapeless import Poly, PolyStore
+
+    with PolyStore('values.plys', 'w') as store:
+        store.append(Poly({'a': 1}))
+        store.extend(range(1000))
+
+    with PolyStore('values.plys', 'r') as store:
+        len(store)   # 1001
+        store[0]     # {'a': 1}
+        store[-1]    # 999
+        sum(value for value in store if isinstance(value, int))
+    ```
+
+    :param path: The data file.
+    :param mode: 'r' to read, 'a' to read and append (the files are
+        created if missing), or 'w' to start from an empty store.
+        Default is 'a'.
+    :param codecs: The CodecRegistry to encode with. Default is
+        ``default_codecs``.
+    :param allow_pickle: If True, values without a codec are pickled, and
+        pickle records are loaded. Default is False.
+    :raises ValueError: If the file is not a PolyStore.
+    """
+
+    def __init__(self, path, mode: str = 'a', *, codecs=None, allow_pickle: bool = False):
+        if mode not in ('r', 'a', 'w'):
+            raise ValueError(f"mode must be 'r', 'a' or 'w', not {mode!r}")
+        self.path = os.fspath(path)
+        self.index_path = self.path + '.idx'
+        self.mode = mode
+        self.codecs = default_codecs if codecs is None else codecs
+        self.allow_pickle = allow_pickle
+        self._writer = self._index_writer = None
+        self._map = self._index_map = None
+        self._file = self._index_file = None
+        # Records in the index map, and the offsets of records past it
+        # that a read-only store found by scanning the data file.
+        self._indexed = 0
+        self._unindexed = array('Q')
+        self._count = 0
+        self._end = _HEADER.size
+
+        if mode == 'w' or (mode == 'a' and not os.path.exists(self.path)):
+            with open(self.path, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, _VERSION))
+            with open(self.index_path, 'wb'):
+                pass
+        # The files stay open until close(); if anything goes wrong
+        # before the store is ready, close the ones opened so far.
+        try:
+            self._file = open(self.path, 'rb')
+            try:
+                magic, version = _HEADER.unpack(self._file.read(_HEADER.size))
+            except struct.error:
+                magic = version = None
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f'{self.path} is not a PolyStore')
+            self._recover()
+        except BaseException:
+            self.close()
+            raise
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i: int):
+        """
+        Read a record.
+
+        :param i: The record number.  Negative numbers count from the end.
+        :return: The value.
+        :raises IndexError: If there is no such record.
+        :raises ValueError: If the record is a pickle and pickle is not allowed.
+        """
+        kind, start, end = self._record(i)
+        return self._load(kind, self._map, start, end, start)
+
+    def __iter__(self):
+        """
+        Read every record in order.
+
+        The records are read from the file a buffer at a time, not mapped:
+        memory use is bounded by the largest record.  Records appended
+        while iterating are not included.
+        """
+        self.flush()
+        count = self._count
+        with open(self.path, 'rb') as f:
+            f.seek(_HEADER.size)
+            offset = _HEADER.size
+            for _ in range(count):
+                size, kind = _FRAME.unpack(f.read(_FRAME.size))
+                body = f.read(size)
+                yield self._load(kind, body, 0, size, offset + _FRAME.size)
+                offset += _FRAME.size + size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f'PolyStore({self.path!r}, {self.mode!r}, records={self._count})'
+
+    def append(self, value) -> int:
+        """
+        Append a value.
+
+        :param value: The value, or a Poly whose data is stored.
+        :return: The record number.
+        :raises TypeError: If the value has no codec and pickle is not allowed.
+        :raises ValueError: If the record is larger than 4 GiB.
+        """
+        if self._writer is None:
+            raise io.UnsupportedOperation('PolyStore was opened read-only')
+        if isinstance(value, Poly):
+            value = value.data
+        offset = self._end
+        cls = type(value)
+        if (cls is bytes or cls is bytearray) and len(value) >= BUFFER_THRESHOLD:
+            kind = _BYTES if cls is bytes else _BYTEARRAY
+            parts = (value,)
+        else:
+            try:
+                parts = (self.codecs.dumps(value, allow_pickle=False),)
+                kind = _CODEC
+            except TypeError:
+                if not self.allow_pickle:
+                    raise
+                parts = _pickle_parts(value, offset + _FRAME.size)
+                kind = _PICKLE
+        size = sum(memoryview(part).nbytes for part in parts)
+        if size > _MAX_BODY:
+            raise ValueError(f'Record of {size} bytes is larger than the 4 GiB limit')
+        write = self._writer.write
+        write(_FRAME.pack(size, kind))
+        for part in parts:
+            write(part)
+        self._index_writer.write(_OFFSET.pack(offset))
+        self._end = offset + _FRAME.size + size
+        self._count += 1
+        return self._count - 1
+
+    def extend(self, values):
+        """
+        Append every value of an iterable.
+
+        :param values: The values.
+        """
+        append = self.append
+        for value in values:
+            append(value)
+
+    def buffer(self, i: int) -> memoryview:
+        """
+        Return a bytes or bytearray record without copying it.
+
+        :param i: The record number.
+        :return: A read-only memoryview into the file.
+        :raises IndexError: If there is no such record.
+        :raises TypeError: If the record was not written from a buffer
+            (see BUFFER_THRESHOLD).
+        """
+        kind, start, end = self._record(i)
+        if kind != _BYTES and kind != _BYTEARRAY:
+            raise TypeError(f'Record {i} is not a buffer record')
+        return memoryview(self._map)[start:end]
+
+    def flush(self, sync: bool = False):
+        """
+        Write buffered records to the files.
+
+        :param sync: If True, also fsync both files, so that the records
+            survive a crash of the machine.
+        """
+        if self._writer is None:
+            return
+        # The data goes first: an index entry must never point past the
+        # end of the data file.
+        self._writer.flush()
+        if sync:
+            os.fsync(self._writer.fileno())
+        self._index_writer.flush()
+        if sync:
+            os.fsync(self._index_writer.fileno())
+
+    def close(self):
+        """
+        Flush and close the store.
+        """
+        self.flush()
+        for f in (self._writer, self._index_writer, self._file, self._index_file):
+            if f is not None:
+                f.close()
+        self._writer = self._index_writer = self._file = self._index_file = None
+        _unmap(self._map)
+        _unmap(self._index_map)
+        self._map = self._index_map = None
+
+    def _record(self, i):
+        # Return (kind, start, end) of record i's body in the data map.
+        count = self._count
+        if i < 0:
+            i += count
+        if not 0 <= i < count:
+            raise IndexError('PolyStore index out of range')
+        if i >= self._indexed + len(self._unindexed):
+            self._remap()
+        if i < self._indexed:
+            offset = _OFFSET.unpack_from(self._index_map, i * _OFFSET.size)[0]
+        else:
+            offset = self._unindexed[i - self._indexed]
+        size, kind = _FRAME.unpack_from(self._map, offset)
+        start = offset + _FRAME.size
+        return kind, start, start + size
+
+    def _load(self, kind, data, start, end, base):
+        # Decode the body data[start:end], which sits at file offset base.
+        if kind == _CODEC:
+            return self.codecs.loads(data[start:end])
+        if kind == _BYTES:
+            return data[start:end]
+        if kind == _BYTEARRAY:
+            return bytearray(data[start:end])
+        if kind != _PICKLE:
+            raise ValueError(f'Unknown record kind {kind}')
+        if not self.allow_pickle:
+            raise ValueError('Refusing to load a pickle record; open the store with '
+                             'allow_pickle=True if it comes from a trusted source')
+        view = memoryview(data)
+        count = _BUFFER_COUNT.unpack_from(data, start)[0]
+        pos = start + _BUFFER_COUNT.size
+        lengths = struct.unpack_from(f'<{count}Q', data, pos)
+        pos += 8 * count
+        buffers = []
+        for length in lengths:
+            pos += -(base + pos - start) % _ALIGN
+            buffers.append(view[pos:pos + length])
+            pos += length
+        return pickle.loads(view[pos:end], buffers=buffers)
+
+    def _recover(self):
+        # Work out the records from the index and the data file, repairing
+        # whatever a crash in the middle of an append left behind.
+        data_size = os.path.getsize(self.path)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        indexed = 0
+        if os.path.exists(self.index_path):
+            self._index_file = open(self.index_path, 'rb')
+            indexed = os.path.getsize(self.index_path) // _OFFSET.size
+            if indexed:
+                self._index_map = mmap.mmap(self._index_file.fileno(), 0,
+                                            access=mmap.ACCESS_READ)
+        # Drop index entries for records that did not make it to the data
+        # file.  Then scan for records that made it to the data file but
+        # not to the index.
+        end = _HEADER.size
+        while indexed:
+            offset = _OFFSET.unpack_from(self._index_map, (indexed - 1) * _OFFSET.size)[0]
+            end = _frame_end(self._map, offset, data_size)
+            if end is not None:
+                break
+            indexed -= 1
+            end = _HEADER.size
+        unindexed = array('Q')
+        while True:
+            next_end = _frame_end(self._map, end, data_size)
+            if next_end is None:
+                break
+            unindexed.append(end)
+            end = next_end
+
+        self._indexed = indexed
+        self._count = indexed + len(unindexed)
+        self._end = end
+        if self.mode == 'r':
+            self._unindexed = unindexed
+            return
+        # Writers bring both files back in line, then append to them.
+        _unmap(self._index_map)
+        self._index_map = None
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+        if end < data_size:
+            _unmap(self._map)
+            os.truncate(self.path, end)
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(self.index_path, 'ab') as f:
+            f.truncate(indexed * _OFFSET.size)
+            f.write(b''.join(map(_OFFSET.pack, unindexed)))
+        self._indexed = 0
+        self._writer = open(self.path, 'ab')
+        self._index_writer = open(self.index_path, 'ab')
+        self._remap()
+
+    def _remap(self):
+        # Map what has been appended since the maps were made.
+        self.flush()
+        _unmap(self._map)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._index_file is None:
+            self._index_file = open(self.index_path, 'rb')
+        _unmap(self._index_map)
+        self._index_map = None
+        self._indexed = os.path.getsize(self.index_path) // _OFFSET.size
+        if self._indexed:
+            self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _frame_end(data, offset, size):
+    # The end of the record at offset, or None if it is cut off.
+    if offset + _FRAME.size > size:
+        return None
+    end = offset + _FRAME.size + _FRAME.unpack_from(data, offset)[0]
+    return end if end <= size else None
+
+
+def _pickle_parts(value, base):
+    # The parts of a pickle record body starting at file offset base.
+    buffers = []
+
+    def out_of_band(buffer):
+        try:
+            buffers.append(buffer.raw())
+        except BufferError:
+            # Not contiguous: leave it in the pickle stream.
+            return True
+        return False
+
+    stream = pickle.dumps(value, protocol=5, buffer_callback=out_of_band)
+    parts = [_BUFFER_COUNT.pack(len(buffers)),
+             struct.pack(f'<{len(buffers)}Q', *[b.nbytes for b in buffers])]
+    pos = base + _BUFFER_COUNT.size + 8 * len(buffers)
+    for raw in buffers:
+        padding = -pos % _ALIGN
+        parts.append(bytes(padding))
+        parts.append(raw)
+        pos += padding + raw.nbytes
+    parts.append(stream)
+    return parts
+
+
+def _unmap(m):
+    # Close a map, unless values loaded from it still use its memory: it
+    # is then closed once they are gone.
+    if m is not None:
+        try:
+            m.close()
+        except BufferError:
+            pass
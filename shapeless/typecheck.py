@@ -0,0 +1,252 @@
+import collections
+import collections.abc
+import itertools
+import random
+import sys
+import types
+import typing
+
+# Containers whose items are all checked against their single type argument.
+_ITEM_CONTAINERS = {
+    list,
+    set,
+    frozenset,
+    collections.deque,
+    collections.abc.Collection,
+    collections.abc.Sequence,
+    collections.abc.MutableSequence,
+    collections.abc.Set,
+    collections.abc.MutableSet,
+}
+
+# Containers checked as key/value mappings.
+_MAPPING_CONTAINERS = {
+    dict,
+    collections.defaultdict,
+    collections.OrderedDict,
+    collections.Counter,
+    collections.abc.Mapping,
+    collections.abc.MutableMapping,
+}
+
+_UNION_TYPES = (typing.Union,)
+if sys.version_info >= (3, 10):
+    _UNION_TYPES += (types.UnionType,)
+
+# typing.Annotated and typing.Final only exist on newer Pythons.
+_UNWRAPPED = tuple(
+    form for form in (getattr(typing, 'Annotated', None),
+                      getattr(typing, 'Final', None),
+                      typing.ClassVar)
+    if form is not None
+)
+
+# Compiled checkers, keyed by (annotation, sample).  Like the type cache,
+# the table is cleared and refilled on demand once it is full, so
+# annotations built per call don't pile up.
+_validators = {}
+_MAX_VALIDATORS = 4096
+
+
+def compile_validator(annotation, sample=None):
+    """
+    Compile a typing annotation into a checker function.
+
+    The checker takes a value and returns True if it matches the annotation.
+    Checkers are built once per annotation and cached.
+
+    :param annotation: A class or typing annotation, e.g. ``Dict[str, List[int]]``,
+        or a tuple of them, as isinstance() takes.
+    :param sample: If given, containers longer than this only have a random
+        sample of this many items checked. Default is None (check every item).
+    :return: The checker.
+    :raises TypeError: If the annotation cannot be checked at runtime.
+    """
+    key = (annotation, sample)
+    try:
+        check = _validators.get(key)
+    except TypeError:
+        # Unhashable annotation, e.g. Literal[[1]]: compile without caching.
+        return _compile(annotation, sample)
+    if check is None:
+        check = _compile(annotation, sample)
+        if len(_validators) >= _MAX_VALIDATORS:
+            _validators.clear()
+        _validators[key] = check
+    return check
+
+
+def validate_many(values, annotation, sample=None):
+    """
+    Validate every value in an iterable without raising.
+
+    :param values: The values to validate.
+    :param annotation: A class or typing annotation.
+    :param sample: See compile_validator().
+    :return: A list of (index, value) pairs for the values that failed.
+    """
+    check = compile_validator(annotation, sample)
+    return [(i, v) for i, v in enumerate(values) if not check(v)]
+
+
+def _accept(value):
+    return True
+
+
+def _compile(annotation, sample):
+    if annotation is typing.Any or annotation is object:
+        return _accept
+    if annotation is None or annotation is type(None):
+        return lambda value: value is None
+    if type(annotation) is tuple:
+        # A tuple of classes, as isinstance() takes: any of them.
+        return _union(annotation, sample)
+    if isinstance(annotation, (str, typing.ForwardRef)):
+        raise TypeError(f"Cannot validate against the string annotation {annotation!r}")
+    if isinstance(annotation, typing.TypeVar):
+        if annotation.__bound__ is not None:
+            return _compile(annotation.__bound__, sample)
+        if annotation.__constraints__:
+            return _union(annotation.__constraints__, sample)
+        return _accept
+    supertype = getattr(annotation, '__supertype__', None)
+    if supertype is not None:
+        # typing.NewType
+        return _compile(supertype, sample)
+
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is None:
+        if isinstance(annotation, type):
+            return lambda value: isinstance(value, annotation)
+        raise TypeError(f"Cannot validate against {annotation!r}")
+    if origin in _UNWRAPPED:
+        return _compile(args[0], sample)
+    if origin in _UNION_TYPES:
+        return _union(args, sample)
+    if origin is typing.Literal:
+        return _literal(args)
+    if origin is type:
+        return _subclass(args[0] if args else typing.Any)
+    if origin is collections.abc.Callable:
+        return callable
+    if origin is tuple:
+        return _tuple(args, sample)
+    if origin in _ITEM_CONTAINERS and len(args) == 1:
+        return _items(origin, _compile(args[0], sample), sample, args[0])
+    if origin in _MAPPING_CONTAINERS and len(args) == 2:
+        return _mapping(origin, _compile(args[0], sample),
+                        _compile(args[1], sample), sample)
+    # Any other parametrized generic (Iterator[int], MyGeneric[T], ...):
+    # the items can't be checked without consuming them, so check the
+    # container type only.
+    return lambda value: isinstance(value, origin)
+
+
+def _union(args, sample):
+    if all(isinstance(a, type) for a in args):
+        classes = tuple(args)
+        return lambda value: isinstance(value, classes)
+    if type(None) in args:
+        rest = _union(tuple(a for a in args if a is not type(None)), sample)
+        return lambda value: value is None or rest(value)
+    checks = tuple(_compile(a, sample) for a in args)
+    return lambda value: any(check(value) for check in checks)
+
+
+def _literal(args):
+    # Compare by type too, so that Literal[1] does not accept True.
+    allowed = tuple((type(a), a) for a in args)
+
+    def check(value):
+        for allowed_type, allowed_value in allowed:
+            if type(value) is allowed_type and value == allowed_value:
+                return True
+        return False
+    return check
+
+
+def _subclass(arg):
+    if arg is typing.Any:
+        return lambda value: isinstance(value, type)
+    classes = typing.get_args(arg) if typing.get_origin(arg) in _UNION_TYPES else (arg,)
+    return lambda value: isinstance(value, type) and issubclass(value, classes)
+
+
+def _sampled(value, sample):
+    # The items to check: all of them, or a random sample of big containers.
+    if sample is None or len(value) <= sample:
+        return value
+    positions = random.sample(range(len(value)), sample)
+    if isinstance(value, collections.abc.Sequence):
+        return [value[i] for i in positions]
+    # Sets and mapping keys can't be indexed: walk them once, taking the
+    # items at the sampled positions.
+    return _at_positions(value, sorted(positions))
+
+
+def _at_positions(iterable, positions):
+    items = iter(iterable)
+    last = -1
+    for position in positions:
+        yield next(itertools.islice(items, position - last - 1, None))
+        last = position
+
+
+def _items(origin, check, sample, item_type=None):
+    if check is _accept:
+        return lambda value: isinstance(value, origin)
+    if sample is None and type(item_type) is type:
+        # List[int] and the like: isinstance() inline, no call per item.
+        def validate(value):
+            if not isinstance(value, origin):
+                return False
+            for item in value:
+                if not isinstance(item, item_type):
+                    return False
+            return True
+        return validate
+
+    def validate(value):
+        if not isinstance(value, origin):
+            return False
+        for item in _sampled(value, sample):
+            if not check(item):
+                return False
+        return True
+    return validate
+
+
+def _mapping(origin, check_key, check_value, sample):
+    if check_key is _accept and check_value is _accept:
+        return lambda value: isinstance(value, origin)
+
+    def validate(value):
+        if not isinstance(value, origin):
+            return False
+        for key in _sampled(value.keys(), sample):
+            if not (check_key(key) and check_value(value[key])):
+                return False
+        return True
+    return validate
+
+
+def _tuple(args, sample):
+    if not args:
+        # Bare Tuple, or Tuple[()] on older Pythons.
+        return lambda value: isinstance(value, tuple)
+    if args == ((),):
+        return lambda value: isinstance(value, tuple) and not value
+    if len(args) == 2 and args[1] is Ellipsis:
+        return _items(tuple, _compile(args[0], sample), sample, args[0])
+    checks = tuple(_compile(a, sample) for a in args)
+
+    def validate(value):
+        if not isinstance(value, tuple) or len(value) != len(checks):
+            return False
+        for check, item in zip(checks, value):
+            if not check(item):
+                return False
+        return True
+    return validate
@@ -0,0 +1,117 @@
+import pickle
+from typing import Any, List, Optional
+
+import pytest
+
+from shapeless.binary import LiquidCodec
+from shapeless.liquid import liquid
+
+
+@liquid
+class Record:
+    name: str
+    price: float
+    size: int
+    ok: bool = True
+    note: Optional[str] = None
+    raw: bytes = b''
+    z: complex = 0j
+    count: Optional[int] = None
+
+
+@liquid(slots=True, frozen=True)
+class Point:
+    x: int
+    y: int
+
+
+RECORD = Record('é', 10.5, -3, False, 'hi', b'\x00\x01', 1 + 2j, 7)
+
+
+class TestLiquidCodec:
+
+    def test_round_trip(self):
+        codec = LiquidCodec(Record)
+        data = codec.encode(RECORD)
+        assert codec.decode(data) == RECORD
+        assert codec.decode(bytearray(data)) == RECORD
+        assert codec.decode(codec.encode(Record('', 0.0, 0))) == Record('', 0.0, 0)
+        assert len(data) < len(pickle.dumps(RECORD))
+        point = LiquidCodec(Point)
+        assert point.decode(point.encode(Point(1, 2))) == Point(1, 2)
+
+    def test_batch(self):
+        codec = LiquidCodec(Record)
+        records = [Record(str(i), i / 2, i, note=None if i % 2 else 'x') for i in range(100)]
+        data = codec.encode_many(records)
+        assert codec.decode_many(data) == records
+        assert codec.decode_many(codec.encode_many([])) == []
+        views = codec.view_many(memoryview(data))
+        assert len(views) == 100
+        assert views[41].name == '41' and views[41].note is None and views[42].note == 'x'
+        assert views[-1].to_instance() == records[-1]
+        assert [v.size for v in views] == list(range(100))
+
+    def test_view(self):
+        codec = LiquidCodec(Record)
+        view = codec.view(codec.encode(RECORD))
+        assert view.name == 'é' and view.price == 10.5 and view.count == 7
+        assert isinstance(view.raw, memoryview) and bytes(view.raw) == b'\x00\x01'
+        assert view.z == 1 + 2j and view.ok is False
+        assert view.to_instance() == RECORD
+        with pytest.raises(AttributeError):
+            view.missing
+
+    def test_schema_mismatch(self):
+        @liquid
+        class Record:
+            name: str
+            price: float
+
+        data = LiquidCodec(globals()['Record']).encode(RECORD)
+        with pytest.raises(ValueError, match='fingerprint'):
+            LiquidCodec(Record).decode(data)
+
+    def test_malformed(self):
+        codec = LiquidCodec(Record)
+        data = codec.encode(RECORD)
+        with pytest.raises(ValueError):
+            codec.decode(data[:20])
+        with pytest.raises(ValueError):
+            codec.decode(b'xx' + data[2:])
+        with pytest.raises(ValueError):
+            codec.decode_many(data)
+
+    def test_truncated_and_trailing(self):
+        codec = LiquidCodec(Record)
+        data = codec.encode(RECORD)
+        batch = codec.encode_many([RECORD, RECORD])
+        for cut in (1, 3):
+            with pytest.raises(ValueError, match='Truncated'):
+                codec.decode(data[:-cut])
+            with pytest.raises(ValueError, match='Truncated'):
+                codec.decode_many(batch[:-cut])
+            with pytest.raises(ValueError, match='Truncated'):
+                codec.view(data[:-cut]).raw
+        with pytest.raises(ValueError, match='2 trailing bytes'):
+            codec.decode(data + b'xx')
+        with pytest.raises(ValueError, match='trailing'):
+            codec.decode_many(batch + b'x')
+
+    def test_encode_errors(self):
+        codec = LiquidCodec(Record)
+        for bad in (Record(1, 1.0, 1), Record('a', 1.0, 2 ** 64),
+                    Record('a', 1.0, 1, ok=1), Record('a', 1.0, 1, raw='x')):
+            with pytest.raises(TypeError):
+                codec.encode(bad)
+        with pytest.raises(TypeError):
+            codec.encode(Point(1, 2))
+
+    def test_unsupported_annotations(self):
+        for annotation in (Any, List[int], Optional[Any]):
+            @liquid
+            class Bad:
+                x: annotation
+
+            with pytest.raises(TypeError):
+                LiquidCodec(Bad)
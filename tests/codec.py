@@ -0,0 +1,152 @@
+import pickle
+from decimal import Decimal
+
+import pytest
+
+from shapeless import CodecRegistry, Poly, default_codecs
+from shapeless.liquid import liquid
+
+
+@liquid
+class Node:
+    value: int
+    children: list
+
+
+@liquid(slots=True, frozen=True)
+class Pair:
+    left: str
+    right: float
+
+
+@liquid(validate=True)
+class Checked:
+    value: int
+
+
+VALUES = [
+    None, True, False, 0, -1, 63, 64, 127, 128, -2 ** 63, 2 ** 63 - 1, 2 ** 63, -2 ** 200,
+    1.5, float('inf'), '', 'héllo\ud800', 'x' * 300, b'', b'\x00\xff',
+    [], (), {}, [1, [2, (3,)]], {'a': {1: None}, (1, 2): b'x'},
+    list(range(20)), [2 ** 40] * 10, [2 ** 70] * 10, [0.5] * 10, [1, 2.0] * 5,
+    Node(1, [Node(2, [])]), Pair('a', 2.0),
+]
+
+
+class TestCodecRegistry:
+
+    @pytest.mark.parametrize('value', VALUES, ids=repr)
+    def test_round_trip(self, value):
+        data = default_codecs.dumps(value)
+        result = default_codecs.loads(data)
+        assert result == value
+        assert type(result) is type(value)
+        assert default_codecs.loads(bytearray(data)) == value
+        assert default_codecs.loads(memoryview(data)) == value
+
+    def test_smaller_than_pickle(self):
+        for value in (None, 42, 'hello', {'key': 1}, Node(1, [])):
+            assert len(default_codecs.dumps(value)) < len(pickle.dumps(value))
+
+    def test_liquid_init_not_rerun(self):
+        calls = []
+
+        node = Node(1, [])
+        data = default_codecs.dumps(node)
+        Node.__post_init__ = lambda self: calls.append(self)
+        try:
+            assert default_codecs.loads(data) == node
+        finally:
+            del Node.__post_init__
+        assert calls == []
+
+    def test_register(self):
+        codecs = CodecRegistry()
+        with pytest.raises(TypeError):
+            codecs.dumps(Decimal('1.5'))
+        codecs.register(Decimal, 'decimal',
+                        lambda d: str(d).encode(), lambda b: Decimal(b.decode()))
+        value = {'price': Decimal('1.5')}
+        assert codecs.loads(codecs.dumps(value)) == value
+
+        class Money(Decimal):
+            pass
+        assert codecs.loads(codecs.dumps(Money('2'))) == Decimal('2')
+
+        data = codecs.dumps(Decimal('3'))
+        codecs.unregister(Decimal)
+        with pytest.raises(ValueError, match='decimal'):
+            codecs.loads(data)
+        with pytest.raises(KeyError):
+            codecs.unregister(Decimal)
+        with pytest.raises(ValueError):
+            codecs.register(Decimal, '', str, str)
+
+    def test_pickle_is_opt_in(self):
+        codecs = CodecRegistry()
+        with pytest.raises(TypeError, match='allow_pickle'):
+            codecs.dumps(Decimal(1))
+        data = codecs.dumps([Decimal(1)], allow_pickle=True)
+        with pytest.raises(ValueError, match='allow_pickle'):
+            codecs.loads(data)
+        assert codecs.loads(data, allow_pickle=True) == [Decimal(1)]
+
+        legacy = pickle.dumps([1, 2])
+        with pytest.raises(ValueError, match='allow_pickle'):
+            codecs.loads(legacy)
+        assert codecs.loads(legacy, allow_pickle=True) == [1, 2]
+        assert CodecRegistry(allow_pickle=True).loads(legacy) == [1, 2]
+
+    @pytest.mark.parametrize('path', [
+        b'tests.codec:Nope',
+        b'tests.codec:Node.value',
+        # Modules are never imported to find a class.
+        b'not_imported_module:Node',
+    ])
+    def test_unknown_liquid_class(self, path):
+        data = b'\xb1L' + bytes([len(path)]) + path + b'\x00'
+        with pytest.raises(ValueError, match='not a liquid class'):
+            default_codecs.loads(data)
+
+    @pytest.mark.parametrize('data', [
+        b'', b'\xb1', b'\xb1s\x05ab', b'\xb1Lx', b'\xb1N\x00', b'\xb1Q',
+        b'\xb1a\x04\x00', b'\xb1i\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff', b'\x00N',
+    ])
+    def test_malformed(self, data):
+        with pytest.raises(ValueError):
+            default_codecs.loads(data)
+
+
+    def test_invalid_liquid_field(self):
+        checked = Checked(1)
+        checked.__dict__['value'] = 'x'
+        data = default_codecs.dumps(checked)
+        with pytest.raises(ValueError, match="Checked.value must be int"):
+            default_codecs.loads(data)
+
+    def test_nested_too_deeply(self):
+        data = b'\xb1' + b'l\x01' * 100_000 + b'l\x00'
+        with pytest.raises(ValueError, match='nested too deeply'):
+            default_codecs.loads(data)
+
+
+class TestPolySerialize:
+
+    def test_class_deserialize(self):
+        p = Poly.deserialize(Poly({'a': [1, 2]}).serialize())
+        assert isinstance(p, Poly)
+        assert p.data == {'a': [1, 2]}
+
+    def test_instance_deserialize(self):
+        p = Poly('x')
+        assert p.deserialize(Poly(5).serialize()) == 5
+        assert p.data == 5
+        assert p.determine() is int
+
+    def test_allow_pickle(self):
+        with pytest.raises(TypeError):
+            Poly(Decimal(1)).serialize()
+        data = Poly(Decimal(1)).serialize(allow_pickle=True)
+        with pytest.raises(ValueError):
+            Poly.deserialize(data)
+        assert Poly.deserialize(data, allow_pickle=True).data == Decimal(1)
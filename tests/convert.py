@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+import pytest
+
+from shapeless.convert import ConverterRegistry
+from shapeless.main import Poly, converters
+
+
+class TestConverterRegistry:
+
+    def test_multi_step_route(self):
+        registry = ConverterRegistry()
+        registry.register(bytes, str, lambda b: b.decode())
+        registry.register(str, Decimal, Decimal)
+        assert registry.convert(b"1.5", Decimal) == Decimal("1.5")
+        plan = registry.plan(bytes, Decimal)
+        assert [t for _, t, _ in plan.steps] == [str, Decimal]
+
+    def test_cheapest_route(self):
+        registry = ConverterRegistry()
+        registry.register(bytes, str, lambda b: b.decode())
+        registry.register(str, float, float)
+        registry.register(bytes, float, lambda b: -1.0, cost=5)
+        assert registry.convert(b"2", float) == 2.0
+        assert registry.plan(bytes, float).cost == 2
+
+    def test_plan_cache(self):
+        registry = ConverterRegistry()
+        registry.register(bytes, str, lambda b: b.decode())
+        registry.convert(b"a", str)
+        registry.convert(b"b", str)
+        registry.convert(1, str)
+        registry.convert(2, str)
+        info = registry.cache_info()
+        assert info['misses'] == 2
+        assert info['hits'] == 1
+        assert info['negative_hits'] == 1
+        assert info['size'] == 1
+        assert info['negative_size'] == 1
+
+        registry.register(int, str, lambda i: f"#{i}")
+        assert registry.cache_info()['size'] == 0
+        assert registry.convert(3, str) == "#3"
+
+    def test_bounded(self):
+        registry = ConverterRegistry(maxsize=2, negative_maxsize=2)
+        registry.register(object, str, repr)
+        for tp in (int, float, complex, bytes):
+            registry.plan(tp, str)
+            registry.plan(tp, list)
+        info = registry.cache_info()
+        assert info['size'] == 2
+        assert info['negative_size'] == 2
+
+    def test_poly_shift(self):
+        converters.register(bytes, str, lambda b: b.decode())
+        converters.register(str, Decimal, Decimal)
+        try:
+            assert Poly(b"2.5").shift(Decimal) == Decimal("2.5")
+            with pytest.raises(TypeError):
+                Poly(b"\xff").shift(Decimal)
+        finally:
+            converters.unregister(bytes, str)
+            converters.unregister(str, Decimal)
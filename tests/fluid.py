@@ -1,6 +1,10 @@
+import asyncio
+import inspect
+import threading
+
 import pytest
 
-from shapeless.main import fluid
+from shapeless.main import FluidCache, Poly, fluid
 
 
 @pytest.mark.parametrize("a,b,expected", [
@@ -14,3 +18,303 @@ def test_fluid(a, b, expected):
         return x + y
     
     assert add(a, b) == expected
+
+
+def test_fluid_wraps():
+    @fluid
+    def add(x, y):
+        """Add two values."""
+        return x.data + y.data
+
+    assert add.__name__ == "add"
+    assert add.__doc__ == "Add two values."
+    assert add.__wrapped__.__doc__ == "Add two values."
+    assert add(1, 2) == 3
+
+
+def test_fluid_signature_kinds():
+    @fluid
+    def f(a, /, b, c=None, *args, d, e="e", **kwargs):
+        return a, b, c, args, d, e, kwargs
+
+    a, b, c, args, d, e, kwargs = f(1, 2, d=4)
+    assert (a.data, b.data, d.data) == (1, 2, 4)
+    # Defaults that were not passed are not wrapped.
+    assert c is None
+    assert e == "e"
+
+    a, b, c, args, d, e, kwargs = f(1, 2, 3, 5, 6, d=4, e=7, g=8)
+    assert c.data == 3
+    assert [arg.data for arg in args] == [5, 6]
+    assert e.data == 7
+    assert kwargs["g"].data == 8
+
+
+def test_fluid_reraises():
+    @fluid
+    def fail(x):
+        raise ValueError(x.data)
+
+    with pytest.raises(ValueError):
+        fail(1)
+
+
+def test_fluid_register():
+    @fluid
+    def combine(a, b):
+        return "default"
+
+    @combine.register(int, int)
+    def _(a, b):
+        return a.data + b.data
+
+    @combine.register
+    def _(a: str, b: object):
+        return a.data + str(b.data)
+
+    assert combine(1, 2) == 3
+    # bool is an int: resolved through the MRO.
+    assert combine(True, 2) == 3
+    assert combine("a", 1) == "a1"
+    assert combine(1.0, 2) == "default"
+    assert combine.dispatch(bool, int) is combine.registry[(int, int)]
+
+
+def test_fluid_register_invalidates_cache():
+    @fluid
+    def kind(a):
+        return "default"
+
+    assert kind(1) == "default"
+
+    @kind.register(int)
+    def _(a):
+        return "int"
+
+    assert kind(1) == "int"
+
+    @kind.register(object)
+    def _(a):
+        return "object"
+
+    assert kind(1) == "int"
+    assert kind("a") == "object"
+
+
+def test_fluid_register_ambiguous():
+    @fluid
+    def pair(a, b):
+        return "default"
+
+    pair.register(int, object)(lambda a, b: "left")
+    pair.register(object, int)(lambda a, b: "right")
+
+    with pytest.raises(TypeError, match="Ambiguous"):
+        pair(1, 1)
+
+
+def test_fluid_async(caplog):
+    @fluid
+    async def add(x, y=1):
+        if x.data < 0:
+            raise ValueError("negative")
+        return x.data + y
+
+    assert inspect.iscoroutinefunction(add)
+    assert asyncio.run(add(2)) == 3
+    with pytest.raises(ValueError):
+        asyncio.run(add(-1))
+    assert "negative" in caplog.text
+
+
+def test_fluid_async_register():
+    @fluid
+    async def describe(a, b):
+        return "default"
+
+    @describe.register(int, int)
+    async def _(a, b):
+        return a.data + b.data
+
+    assert asyncio.run(describe(1, 2)) == 3
+    assert asyncio.run(describe("a", 2)) == "default"
+
+
+def test_fluid_batching():
+    sizes = []
+
+    @fluid(batch_size=4, batch_window=0.05)
+    async def double(values):
+        sizes.append(len(values))
+        return [ValueError("three") if v.data == 3 else v.data * 2 for v in values]
+
+    async def main():
+        return await asyncio.gather(*(double(i) for i in range(10)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert results[:3] == [0, 2, 4] and results[4:] == [8, 10, 12, 14, 16, 18]
+    assert isinstance(results[3], ValueError)
+    assert sizes == [4, 4, 2]
+    metrics = double.metrics.snapshot()
+    assert metrics['calls'] == 10 and metrics['errors'] == 1
+    assert metrics['batches'] == 3 and metrics['max_batch_size'] == 4
+    assert metrics['max_latency'] >= metrics['mean_latency'] > 0
+
+
+def test_fluid_batching_failure():
+    @fluid(batch_window=0)
+    async def broken(values):
+        return values[:-1]
+
+    async def main():
+        return await asyncio.gather(broken(1), broken(2), return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(main()))
+    assert broken.metrics.batches == 1
+
+
+def test_fluid_max_concurrency():
+    running = []
+
+    @fluid(max_concurrency=2)
+    async def slow(x):
+        running.append(x.data)
+        await asyncio.sleep(0.01)
+        assert len(running) <= 2
+        running.remove(x.data)
+        return x.data
+
+    async def main():
+        return await asyncio.gather(*(slow(i) for i in range(6)))
+
+    assert asyncio.run(main()) == list(range(6))
+    assert slow.metrics.max_in_flight == 2
+    # A new event loop gets its own semaphore.
+    assert asyncio.run(main()) == list(range(6))
+
+
+def test_fluid_async_options_need_async():
+    with pytest.raises(TypeError):
+        fluid(lambda x: x, batch_size=2)
+
+    async def f(x):
+        return x
+
+    with pytest.raises(ValueError):
+        fluid(f, max_concurrency=0)
+
+
+def test_fluid_cache_keys_by_type():
+    calls = []
+
+    @fluid(cache=True)
+    def kind(x, scale=1):
+        calls.append(x.data)
+        return type(x.data).__name__
+
+    assert [kind(1), kind(1), kind(True), kind(1.0)] == ['int', 'int', 'bool', 'float']
+    assert calls == [1, True, 1.0]
+    assert kind(1, scale=2) == 'int' and len(calls) == 4
+    # fluid hands a Poly argument on wrapped again: not cached.
+    assert kind(Poly(1)) == kind(Poly(1)) == 'Poly'
+    stats = kind.cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 4, 4)
+    assert stats['uncacheable'] == 2
+
+
+def test_fluid_cache_unhashable():
+    calls = []
+
+    @fluid(cache=True)
+    def total(values):
+        calls.append(1)
+        return sum(values.data)
+
+    assert total([1, 2]) == total([1, 2]) == 3
+    assert total([1, 2.0]) == 3.0
+    assert total((1, 2)) == 3
+    assert total({1, 2}) == total({2, 1}) == 3
+    assert len(calls) == 4
+    assert total.cache.stats()['uncacheable'] == 0
+
+    @fluid(cache=True)
+    def size(values):
+        calls.append(1)
+        return len(values.data)
+
+    # Nested: keyed by a digest of the serialized contents.
+    assert size([[1], {'a': [2]}]) == size([[1], {'a': [2]}]) == 2
+    assert size([[1], {'a': [3]}]) == 2
+    assert len(calls) == 6
+    # Sets of lists can be neither hashed nor serialized: not cached.
+    assert size([{1}, []]) == size([{1}, []]) == 2
+    assert len(calls) == 8
+    assert size.cache.stats()['uncacheable'] == 2
+
+
+def test_fluid_cache_lru_and_ttl():
+    @fluid(cache=2)
+    def ident(x):
+        return x.data
+
+    for value in (1, 2, 1, 3):
+        ident(value)
+    assert ident.cache.evictions == 1
+    ident(1)
+    assert ident.cache.hits == 2  # 2 was evicted, not 1
+
+    now = [0.0]
+    cache = FluidCache(ttl=5, clock=lambda: now[0])
+
+    @fluid(cache=cache)
+    def stamp(x):
+        return now[0]
+
+    assert stamp('a') == 0.0
+    now[0] = 4.0
+    assert stamp('a') == 0.0
+    now[0] = 6.0
+    assert stamp('a') == 6.0
+    assert cache.expirations == 1
+
+
+def test_fluid_cache_register_clears():
+    @fluid(cache=True)
+    def kind(a):
+        return 'default'
+
+    assert kind(1) == 'default'
+
+    @kind.register(int)
+    def _(a):
+        return 'int'
+
+    assert kind(1) == 'int'
+    assert kind.dispatch(int) is _
+
+
+def test_fluid_cache_async_and_threads():
+    @fluid(cache=True)
+    async def double(x):
+        return x.data * 2
+
+    assert asyncio.run(double(2)) == asyncio.run(double(2)) == 4
+    assert double.cache.hits == 1
+
+    @fluid(cache=64)
+    def square(x):
+        return x.data * x.data
+
+    def work():
+        for i in range(2000):
+            assert square(i % 100) == (i % 100) ** 2
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(square.cache) == 64
+    with pytest.raises(TypeError):
+        fluid(cache='yes')(lambda x: x)
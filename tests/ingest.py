@@ -0,0 +1,170 @@
+import io
+import json
+from decimal import Decimal
+from typing import List, Optional
+
+import pytest
+
+from shapeless import LiquidReader, RowError, liquid, read_csv, read_jsonl
+from shapeless.liquid import InitVar, field
+
+
+@liquid
+class Trade:
+    symbol: str
+    price: float
+    size: int = 0
+    live: bool = False
+    fee: Optional[Decimal] = None
+    tags: List[str] = field(default_factory=list)
+
+
+@liquid(validate=True)
+class Positive:
+    value: int
+    label: InitVar[str] = ''
+
+    def __post_init__(self, label):
+        if self.value < 0:
+            raise ValueError("value must not be negative")
+        self.value *= len(label)
+
+
+@liquid
+class Counted:
+    value: int
+    built = 0
+
+    def __post_init__(self):
+        if self.value < 0:
+            raise ValueError("value must not be negative")
+        type(self).built += 1
+
+
+CSV = """price,symbol,size,live,fee,venue
+1.5,A,3,yes,,XNAS
+2,B,x,no,0.25,XNAS
+oops
+3,C,4,TRUE,1.5,XLON
+"""
+
+JSONL = '''{"symbol": "A", "price": 1}
+
+{"symbol": "B"}
+not json
+{"symbol": "C", "price": "2.5", "size": "4", "tags": ["x"]}
+'''
+
+
+class TestReadCsv:
+
+    def test_convert(self):
+        trades = list(read_csv(Trade, io.StringIO(CSV), errors='skip'))
+        assert trades == [
+            Trade('A', 1.5, 3, True, None),
+            Trade('C', 3.0, 4, True, Decimal('1.5')),
+        ]
+        assert trades[0].tags == [] and trades[0].tags is not trades[1].tags
+
+    def test_raise(self):
+        reader = read_csv(Trade, io.StringIO(CSV))
+        seen = []
+        with pytest.raises(RowError) as info:
+            for trade in reader:
+                seen.append(trade)
+        # The good row before the bad one still comes out.
+        assert [t.symbol for t in seen] == ['A']
+        assert info.value.row == 3
+        assert info.value.raw == ['2', 'B', 'x', 'no', '0.25', 'XNAS']
+        assert isinstance(info.value.__cause__, ValueError)
+
+    def test_collect(self):
+        reader = read_csv(Trade, io.StringIO(CSV), errors='collect', batch_size=2)
+        assert [len(b) for b in reader.batches()] == [1, 1]
+        assert [e.row for e in reader.errors] == [3, 4]
+        assert 'expected 6 columns, got 1' in str(reader.errors[1])
+        assert reader.skipped == 2
+
+    def test_file(self, tmp_path):
+        path = tmp_path / 'trades.csv'
+        path.write_text(CSV)
+        assert len(list(read_csv(Trade, path, errors='skip'))) == 2
+        assert len(list(read_csv(Trade, str(path), errors='skip'))) == 2
+
+    def test_columns_and_format(self):
+        lines = ['A;1.5\n', 'B;2\n']
+        trades = list(read_csv(Trade, lines, columns=['symbol', 'price'], delimiter=';'))
+        assert trades == [Trade('A', 1.5), Trade('B', 2.0)]
+
+    def test_missing_column(self):
+        with pytest.raises(ValueError, match="required field 'price'"):
+            list(read_csv(Trade, io.StringIO('symbol\nA\n')))
+
+    def test_multiline_row_numbers(self):
+        src = 'symbol,price\n"A\nB",1\nC,x\n'
+        reader = read_csv(Trade, io.StringIO(src), errors='collect')
+        assert [t.symbol for t in reader] == ['A\nB']
+        assert reader.errors[0].row == 4
+
+    def test_class_errors(self):
+        src = 'value,label\n1,ab\n-1,a\nx,a\n4,a\n'
+        reader = read_csv(Positive, io.StringIO(src), errors='collect')
+        assert [p.value for p in reader] == [2, 4]
+        assert [e.row for e in reader.errors] == [3, 4]
+        assert 'must not be negative' in str(reader.errors[0])
+
+    def test_rows_built_once(self):
+        Counted.built = 0
+        reader = read_csv(Counted, io.StringIO('value\n1\n2\n-1\n3\n-2\n4\n'),
+                          errors='collect')
+        assert [c.value for c in reader] == [1, 2, 3, 4]
+        assert [e.row for e in reader.errors] == [4, 6]
+        assert Counted.built == 4
+
+
+class TestReadJsonl:
+
+    def test_convert_and_collect(self):
+        reader = read_jsonl(Trade, io.StringIO(JSONL), errors='collect')
+        assert list(reader) == [Trade('A', 1.0), Trade('C', 2.5, 4, tags=['x'])]
+        assert [e.row for e in reader.errors] == [3, 4]
+        assert "missing field 'price'" in str(reader.errors[0])
+        assert reader.errors[1].raw == 'not json\n'
+
+    def test_batches(self):
+        lines = [json.dumps({'symbol': str(i), 'price': i}) for i in range(7)]
+        batches = list(read_jsonl(Trade, lines, batch_size=3).batches())
+        assert [len(b) for b in batches] == [3, 3, 1]
+        assert batches[2][0] == Trade('6', 6.0)
+
+    def test_bool_strings(self):
+        lines = ['{"symbol": "A", "price": 1, "live": "false"}',
+                 '{"symbol": "B", "price": 1, "live": "Yes"}',
+                 '{"symbol": "C", "price": 1, "live": 0}',
+                 '{"symbol": "D", "price": 1, "live": "maybe"}']
+        reader = read_jsonl(Trade, lines, errors='collect')
+        assert [t.live for t in reader] == [False, True, False]
+        assert [e.row for e in reader.errors] == [4]
+
+    def test_line_forms(self):
+        lines = ['  {"symbol": "A", "price": 1}  \r\n', b'{"symbol": "B", "price": 2}\n',
+                 '{"symbol": "C", "price": 3}', '{"symbol": "D", "price": 4} 5\n']
+        reader = read_jsonl(Trade, lines, errors='collect')
+        assert [t.symbol for t in reader] == ['A', 'B', 'C']
+        assert [e.row for e in reader.errors] == [4]
+
+    def test_raise_after_good_rows(self):
+        reader = read_jsonl(Trade, io.StringIO(JSONL))
+        seen = []
+        with pytest.raises(RowError) as info:
+            seen.extend(reader)
+        assert seen == [Trade('A', 1.0)]
+        assert info.value.row == 3
+
+    def test_arguments(self):
+        with pytest.raises(TypeError):
+            LiquidReader(int, [])
+        with pytest.raises(ValueError):
+            read_jsonl(Trade, [], errors='ignore')
+        with pytest.raises(TypeError):
+            read_jsonl(Trade, [], delimiter=';')
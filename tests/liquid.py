@@ -0,0 +1,631 @@
+import pickle
+import typing
+import tracemalloc
+import weakref
+
+import pytest
+
+from shapeless.liquid import (FrozenInstanceError, InitVar, asdict, astuple, field, fields,
+                              liquid, make_liquid, make_liquids, replace)
+from shapeless.main import Poly
+
+
+@liquid(slots=True, frozen=True)
+class Offset:
+    x: int
+    delta: InitVar[int] = 0
+
+    def __post_init__(self, delta):
+        object.__setattr__(self, 'x', self.x + delta)
+
+
+@liquid(slots=True)
+class Base:
+    x: int
+
+    def describe(self):
+        return 'base'
+
+
+@liquid(slots=True)
+class Child(Base):
+    y: int = 2
+
+    def describe(self):
+        return super().describe() + '+child'
+
+
+def _footprint(cls, n=10_000):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        objs = [cls(1, 2.0, "s") for _ in range(n)]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    assert len(objs) == n
+    return sum(stat.size_diff for stat in after.compare_to(before, 'filename')) / n
+
+
+class TestSlots:
+
+    def test_slots(self):
+        @liquid(slots=True)
+        class Point:
+            x: int
+            y: int = 0
+            tags: list = field(default_factory=list)
+
+        p = Point(1)
+        assert Point.__slots__ == ('x', 'y', 'tags')
+        assert not hasattr(p, '__dict__')
+        assert p == Point(1, 0, [])
+        with pytest.raises(AttributeError):
+            p.z = 1
+
+    def test_memory_savings(self):
+        fields = [('a', int), ('b', float), ('c', str)]
+        plain = make_liquid('Plain', fields)
+        slotted = make_liquid('Slotted', fields, slots=True)
+        assert _footprint(slotted) < _footprint(plain) * 0.75
+
+    def test_frozen_initvar_post_init(self):
+        o = Offset(1, 2)
+        assert o.x == 3
+        with pytest.raises(FrozenInstanceError):
+            o.x = 4
+        assert pickle.loads(pickle.dumps(o)) == o
+        assert hash(o) == hash(Offset(3))
+
+    def test_inheritance(self):
+        c = Child(1)
+        assert Child.__slots__ == ('y',)
+        assert (c.x, c.y) == (1, 2)
+        assert c.describe() == 'base+child'
+        assert pickle.loads(pickle.dumps(c)) == c
+
+    def test_init_false_default(self):
+        @liquid(slots=True)
+        class Counter:
+            x: int
+            y: int = field(default=3, init=False)
+            z: list = field(default_factory=list, init=False)
+
+        assert (Counter(1).y, Counter(1).z) == (3, [])
+        assert [c.y for c in Counter.from_records([(1,), (2,)])] == [3, 3]
+
+    def test_weakref_slot(self):
+        @liquid(slots=True)
+        class NoRef:
+            x: int
+
+        @liquid(slots=True, weakref_slot=True)
+        class Ref:
+            x: int
+
+        with pytest.raises(TypeError):
+            weakref.ref(NoRef(1))
+        r = Ref(1)
+        assert weakref.ref(r)() is r
+
+        with pytest.raises(TypeError):
+            liquid(weakref_slot=True)(type('C', (), {}))
+
+
+class TestCodeCache:
+
+    def test_same_shape_shares_code(self):
+        A = make_liquid('A', [('x', int), ('y', int, field(default=1))])
+        B = make_liquid('B', [('x', str), ('y', str, field(default='b'))])
+        assert A.__init__.__code__ is B.__init__.__code__
+        assert A.__repr__.__code__ is B.__repr__.__code__
+        assert A(0) == A(0, 1)
+        assert B(0).y == 'b'
+        assert repr(B('a')) == "B(x='a', y='b')"
+
+    def test_different_shape_compiles(self):
+        A = make_liquid('A', [('x', int)])
+        B = make_liquid('B', [('z', int)])
+        assert A.__init__.__code__ is not B.__init__.__code__
+
+    def test_methods_shared_across_field_names(self):
+        A = make_liquid('A', [('x', int), ('y', int)], order=True, frozen=True)
+        B = make_liquid('B', [('p', str), ('q', str)], order=True, frozen=True)
+        for name in ('__repr__', '__eq__', '__lt__', '__hash__', '__setattr__'):
+            assert getattr(A, name).__code__ is getattr(B, name).__code__
+        assert repr(A(1, 2)) == 'A(x=1, y=2)'
+        assert A(1, 2) < A(1, 3) and not B('b', 'a') < B('a', 'b')
+        assert hash(A(1, 2)) == hash((1, 2)) and hash(B('a', 'b')) == hash(('a', 'b'))
+        assert A(1, 2).__eq__(B(1, 2)) is NotImplemented
+        with pytest.raises(FrozenInstanceError):
+            B('a', 'b').p = 'c'
+
+    def test_single_and_no_fields(self):
+        One = make_liquid('One', [('x', int)], order=True, frozen=True)
+        Empty = make_liquid('Empty', [], order=True, frozen=True)
+        assert repr(One(1)) == 'One(x=1)' and repr(Empty()) == 'Empty()'
+        assert hash(One(1)) == hash((1,)) and hash(Empty()) == hash(())
+        assert One(1) < One(2) and Empty() == Empty() and not Empty() < Empty()
+
+    def test_single_field_compares_tuples(self):
+        One = make_liquid('One', [('x', float)], order=True)
+        nan = float('nan')
+        # As (nan,) == (nan,): identical values are equal.
+        assert One(nan) == One(nan) and One(nan) <= One(nan)
+        assert One(float('nan')) != One(float('nan'))
+
+        class Vector:
+            # A value whose == returns something that isn't a bool.
+            def __eq__(self, other):
+                return [True]
+
+        value = Vector()
+        assert (One(value) == One(Vector())) is True
+        assert (One(value) != One(Vector())) is False
+
+
+SCHEMA = {
+    'definitions': {
+        'Order': {
+            'properties': {
+                'id': {'type': 'integer'},
+                'tags': {'type': 'array', 'items': {'type': 'string'}, 'default': []},
+                'customer': {'$ref': '#/definitions/Customer'},
+                'shipping_address': {'properties': {'city': {'type': 'string'}},
+                                     'required': ['city']},
+                'status': {'enum': ['new', 'done']},
+            },
+            'required': ['id', 'customer'],
+            'x-liquid': {'frozen': True},
+        },
+        'Customer': {
+            'description': 'A customer.',
+            'properties': {
+                'name': {'type': ['string', 'null']},
+                'orders': {'type': 'array', 'items': {'$ref': '#/definitions/Order'}},
+            },
+        },
+    },
+}
+
+
+class TestMakeLiquids:
+
+    def test_models(self):
+        timings = {}
+        models = make_liquids(SCHEMA, module='models', timings=timings, order=True)
+        assert list(models) == ['Order', 'Customer', 'OrderShippingAddress']
+        assert set(timings) == {'parse', 'generate', 'resolve', 'compile', 'total'}
+        Order, Customer = models['Order'], models['Customer']
+        assert Order.__module__ == 'models' and Customer.__doc__ == 'A customer.'
+
+        customer = Customer('bob')
+        order = Order(1, customer)
+        assert order.tags == [] and order.tags is not Order(2, customer).tags
+        assert order.shipping_address is None and Customer('a') < Customer('b')
+        with pytest.raises(FrozenInstanceError):
+            order.id = 2
+
+    def test_references_resolved(self):
+        models = make_liquids(SCHEMA)
+        Order, Customer = models['Order'], models['Customer']
+        Address = models['OrderShippingAddress']
+        hints = typing.get_type_hints(Order)
+        assert hints['customer'] is Customer
+        assert hints['shipping_address'] == typing.Optional[Address]
+        assert hints['status'] == typing.Optional[typing.Literal['new', 'done']]
+        assert typing.get_type_hints(Customer)['orders'] == typing.Optional[typing.List[Order]]
+        assert [f.type.data for f in fields(Customer)] == [
+            typing.Optional[str], typing.Optional[typing.List[Order]]]
+        assert Order.__init__.__annotations__['customer'].data is Customer
+
+    def test_validate_and_coerce_references(self):
+        models = make_liquids(SCHEMA, validate=True)
+        Order, Customer = models['Order'], models['Customer']
+        customer = Customer('bob')
+        assert Customer('bob', [Order(1, customer)]).orders[0].id == 1
+        with pytest.raises(TypeError, match='Order.customer'):
+            Order(1, 'bob')
+        with pytest.raises(TypeError, match='Customer.orders'):
+            Customer('bob', [customer])
+        assert Order.__doc__.startswith('Order(id: ') and 'customer: ' in Order.__doc__
+
+        models = make_liquids(SCHEMA, coerce=True)
+        Order, Customer = models['Order'], models['Customer']
+        # The $ref field is coerced to the referenced class.
+        assert Order('1', 'bob') == Order(1, Customer('bob'))
+        assert Order.from_records([('2', 'ann')])[0].customer == Customer('ann')
+
+        slotted = make_liquids(SCHEMA, slots=True, validate=True)
+        with pytest.raises(TypeError, match='Order.customer'):
+            slotted['Order'](1, 'bob')
+
+    def test_unknown_reference(self):
+        with pytest.raises(TypeError, match="'Missing'"):
+            make_liquids({'A': {'properties': {'b': {'$ref': '#/Missing'}}}})
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+class TestLazy:
+
+    def test_methods(self, lazy):
+        @liquid(order=True, frozen=True, lazy=lazy)
+        class Point:
+            x: int
+            y: int = 0
+
+        assert repr(Point(1)).endswith('Point(x=1, y=0)')
+        assert Point(1) == Point(1, 0) and Point(1) != Point(2)
+        assert Point(1) < Point(1, 1) <= Point(2) and Point(2) > Point(1) >= Point(1)
+        assert Point(1).__eq__(1) is NotImplemented
+        with pytest.raises(FrozenInstanceError):
+            Point(1).x = 2
+        with pytest.raises(FrozenInstanceError):
+            del Point(1).x
+        for name in ('__repr__', '__eq__', '__lt__', '__setattr__', '__delattr__'):
+            assert type(Point.__dict__[name]) is type(Point.__init__)
+
+    def test_inherited_placeholder(self, lazy):
+        @liquid(lazy=lazy)
+        class Base:
+            x: int
+
+        class Child(Base):
+            pass
+
+        assert Child(1) == Child(1)
+        assert repr(Child(1)).endswith('Child(x=1)')
+        assert '__repr__' not in Child.__dict__
+        assert type(Base.__dict__['__repr__']) is type(Base.__init__)
+
+    def test_user_methods_kept(self, lazy):
+        @liquid(lazy=lazy)
+        class C:
+            x: int
+
+            def __repr__(self):
+                return 'mine'
+
+        assert repr(C(1)) == 'mine'
+
+    def test_conflicts_raise(self, lazy):
+        with pytest.raises(TypeError, match='total_ordering'):
+            @liquid(order=True, lazy=lazy)
+            class Ordered:
+                x: int
+
+                def __lt__(self, other):
+                    return True
+
+        with pytest.raises(TypeError, match='__setattr__'):
+            @liquid(frozen=True, lazy=lazy)
+            class Frozen:
+                x: int
+
+                def __setattr__(self, name, value):
+                    pass
+
+    def test_slots_frozen(self, lazy):
+        Point = make_liquid('Point', [('x', int)], frozen=True, slots=True, lazy=lazy)
+        p = Point(1)
+        with pytest.raises(FrozenInstanceError):
+            p.x = 2
+        assert p == Point(1) and repr(p) == 'Point(x=1)'
+
+
+@liquid
+class Item:
+    name: str
+    tags: typing.Any = None
+
+
+@liquid(frozen=True)
+class Box:
+    content: typing.Any
+
+
+class TestAsdict:
+
+    def test_nested(self):
+        box = Box([Item('a', {'k': (1, Item('b'))}), Box(Item('c', [2.5]))])
+        assert asdict(box) == {'content': [
+            {'name': 'a', 'tags': {'k': (1, {'name': 'b', 'tags': None})}},
+            {'content': {'name': 'c', 'tags': [2.5]}},
+        ]}
+        assert astuple(box) == ([('a', {'k': (1, ('b', None))}), (('c', [2.5]),)],)
+        assert asdict(Item('a'), dict_factory=list) == [('name', 'a'), ('tags', None)]
+        assert astuple(Item('a'), tuple_factory=list) == ['a', None]
+
+    def test_leaves(self):
+        tags = {1, 2}
+        item = Item('a', tags)
+        assert asdict(item)['tags'] == tags and asdict(item)['tags'] is not tags
+        assert astuple(item)[1] is not tags
+        obj = object()
+        assert asdict(Item('a', [obj]))['tags'][0] is not obj
+
+    def test_converters_cached(self):
+        asdict(Item('a'))
+        converters = Item.__dict__['__liquid_converters__']
+        asdict(Item('b'))
+        assert Item.__dict__['__liquid_converters__'] is converters
+
+    def test_deep(self):
+        box = Box(None)
+        for _ in range(10_000):
+            box = Box([box])
+        result = asdict(box)
+        for _ in range(10_000):
+            result = result['content'][0]
+        assert result == {'content': None}
+
+    def test_cycle(self):
+        loop = []
+        loop.append(loop)
+        with pytest.raises(RecursionError):
+            asdict(Box(loop))
+
+
+@liquid(validate=True)
+class Order:
+    id: int
+    items: typing.List[str] = field(default_factory=list)
+    note: typing.Optional[str] = None
+    parent: 'typing.Optional[Order]' = None
+
+
+@liquid(validate=True, slots=True, frozen=True)
+class Quote:
+    price: float
+    legs: typing.Dict[str, int] = field(default_factory=dict)
+
+
+class TestValidate:
+
+    def test_init(self):
+        assert Order(1, ['a'], 'n', Order(2)).parent == Order(2)
+        for args in [('1',), (1, ['a', 2]), (1, [], 3), (1, [], None, 'x')]:
+            with pytest.raises(TypeError, match=r'Order\.\w+ must be'):
+                Order(*args)
+        assert Quote(1.0, {'a': 1}).legs == {'a': 1}
+        with pytest.raises(TypeError, match='Quote.legs'):
+            Quote(1.0, {'a': 'b'})
+
+    def test_assignment(self):
+        order = Order(1)
+        order.id = 2
+        order.items = ['x']
+        assert (order.id, order.items) == (2, ['x'])
+        with pytest.raises(TypeError, match='Order.id must be int, not str'):
+            order.id = '3'
+        assert order.id == 2
+        # Other attributes are left alone.
+        order.extra = 'anything'
+        with pytest.raises(AttributeError):
+            del order.note
+
+    def test_class_attributes_and_unset_fields(self):
+        @liquid(validate=True)
+        class W:
+            a: int = field(init=False)
+            b: int = 5
+            c: list = field(default_factory=list)
+
+        assert W.b == 5
+        assert W().b == 5 and W(b=6).b == 6
+        with pytest.raises(AttributeError, match="'W' object has no attribute 'a'"):
+            W().a
+        w = W()
+        w.a = 1
+        assert w.a == 1
+
+        @liquid(validate=True, slots=True)
+        class S:
+            b: int = 5
+
+        assert S.b == 5 and S().b == 5
+
+    def test_slots(self):
+        @liquid(validate=True, slots=True)
+        class Point:
+            x: int
+            y: int = 0
+
+        point = Point(1)
+        point.y = 2
+        assert (point.x, point.y) == (1, 2)
+        with pytest.raises(TypeError):
+            point.y = 2.5
+        assert not hasattr(point, '__dict__')
+        quote = Quote(2.0)
+        with pytest.raises(FrozenInstanceError):
+            quote.price = 3.0
+        assert pickle.loads(pickle.dumps(quote)) == quote
+
+    def test_forward_refs_in_generics(self):
+        @liquid(validate=True)
+        class Node:
+            value: int
+            next: typing.Optional['Node'] = None
+            children: typing.List['Node'] = field(default_factory=list)
+            kind: typing.Literal['leaf', 'branch'] = 'leaf'
+
+        node = Node(1, Node(2), [Node(3)], 'branch')
+        assert node.children[0].value == 3
+        with pytest.raises(TypeError, match='Node.next'):
+            Node(1, 2)
+        with pytest.raises(TypeError, match='Node.children'):
+            Node(1, None, [3])
+        with pytest.raises(TypeError, match='Node.kind'):
+            Node(1, kind='root')
+
+        @liquid(validate=True, coerce=True, slots=True)
+        class Tagged:
+            count: typing.Optional['int'] = None
+
+        assert Tagged('3').count == 3 and Tagged().count is None
+
+    def test_defaults_not_checked(self):
+        @liquid(validate=True)
+        class Loose:
+            x: int = None
+            y: int = field(default=0, init=False)
+
+        assert Loose().x is None and Loose().y == 0
+        with pytest.raises(TypeError):
+            Loose('a')
+
+    def test_inheritance(self):
+        @liquid
+        class Plain:
+            a: int = 1
+
+        @liquid(validate=True)
+        class Checked(Plain):
+            b: str = ''
+
+        assert Checked(2, 'x') == Checked(2, 'x')
+        with pytest.raises(TypeError, match='Checked.a'):
+            Checked('2')
+
+        @liquid
+        class Unchecked(Order):
+            extra: int = 0
+
+        with pytest.raises(TypeError, match='Unchecked.id'):
+            Unchecked('1')
+        assert Unchecked(1).note is None
+
+    def test_make_liquid(self):
+        Row = make_liquid('Row', ['any', ('n', int)], validate=True)
+        assert Row(object, 1).n == 1
+        with pytest.raises(TypeError):
+            Row(None, '1')
+
+    def test_replace(self):
+        order = Order(1, ['a'])
+        assert replace(order, id=2) == Order(2, ['a'])
+        with pytest.raises(TypeError):
+            replace(order, id='2')
+
+
+@liquid(coerce=True)
+class Reading:
+    sensor: int
+    value: float
+    unit: str = 'C'
+    note: typing.Optional[int] = None
+    raw: typing.List[str] = field(default_factory=list)
+
+
+class TestCoerce:
+
+    def test_shift(self):
+        reading = Reading('7', '21.5', 3, '4', ['x'])
+        assert reading == Reading(7, 21.5, '3', 4, ['x'])
+        assert type(reading.sensor) is int and type(reading.value) is float
+
+    def test_right_type_untouched(self):
+        flag = True
+        reading = Reading(flag, 1.0)
+        # bool is already an int: not shifted.
+        assert reading.sensor is flag
+        assert Reading(1, 2.0).note is None
+
+    def test_failure(self):
+        with pytest.raises(TypeError, match=r"Cannot shape shift x to <class 'int'> \(field 'sensor'\)"):
+            Reading('x', 1.0)
+        with pytest.raises(TypeError, match="field 'value'"):
+            Reading(1, None)
+        with pytest.raises(TypeError):
+            Poly('x').shift(int)
+
+    def test_with_validate(self):
+        @liquid(coerce=True, validate=True, slots=True)
+        class Point:
+            x: int
+            y: 'typing.Optional[float]' = None
+
+        point = Point('1', '2')
+        assert (point.x, point.y) == (1, 2.0)
+        # Assignment is checked, not coerced.
+        with pytest.raises(TypeError):
+            point.x = '3'
+
+    def test_make_liquid(self):
+        Row = make_liquid('Row', ['any', ('n', int)], coerce=True)
+        assert Row('1', '2') == Row('1', 2)
+
+
+@liquid
+class Line:
+    sku: str
+    qty: int = 1
+    tags: list = field(default_factory=list)
+    scale: InitVar[int] = 1
+    total: int = field(default=0, init=False)
+
+    def __post_init__(self, scale):
+        self.total = self.qty * scale
+
+
+class TestFromRecords:
+
+    RECORDS = [('a', 2, ['x'], 3), {'sku': 'b', 'qty': 1, 'tags': [], 'scale': 2},
+               ('c',), {'sku': 'd', 'scale': 5}, ['e', 3, [], 1]]
+
+    def expected(self):
+        return [Line(*r) if not isinstance(r, dict) else Line(**r) for r in self.RECORDS]
+
+    def test_list(self):
+        lines = Line.from_records(self.RECORDS)
+        assert lines == self.expected()
+        assert [line.total for line in lines] == [6, 2, 1, 5, 3]
+        # Each default_factory call gives a new list.
+        a, b = Line.from_records([('a',), ('b',)])
+        assert a.tags is not b.tags
+
+    def test_iterator(self):
+        lines = Line.from_records(iter(self.RECORDS), iterator=True)
+        assert not isinstance(lines, list)
+        assert list(lines) == self.expected()
+
+    def test_errors(self):
+        with pytest.raises(TypeError, match='unexpected keyword'):
+            Line.from_records([{'sku': 'a', 'qty': 1, 'tags': [], 'nope': 1}])
+        with pytest.raises(TypeError):
+            Line.from_records([('a', 1, [], 1, 2)])
+        # A string is not unpacked into one argument per character.
+        with pytest.raises(TypeError, match="not 'str'"):
+            Line.from_records(['ab'])
+        with pytest.raises(TypeError, match="not 'int'"):
+            Line.from_records([1], iterator=True).__next__()
+
+    def test_options(self):
+        @liquid(frozen=True, slots=True, validate=True, coerce=True)
+        class Point:
+            x: int
+            y: float = 0.0
+
+        assert Point.from_records([('1', '2'), {'x': 3, 'y': 4}, ('5',)]) == \
+            [Point(1, 2.0), Point(3, 4.0), Point(5)]
+        with pytest.raises(TypeError, match="field 'x'"):
+            Point.from_records([('x', 1)])
+
+    def test_subclass_init(self):
+        class Custom(Line):
+            def __init__(self, sku):
+                super().__init__(sku.upper())
+
+        assert Custom.from_records([('a',)]) == [Custom('a')]
+        assert Custom.from_records([('a',)])[0].sku == 'A'
+
+        class Inherited(Line):
+            pass
+
+        assert type(Inherited.from_records([('a',)])[0]) is Inherited
+
+    def test_processes(self):
+        records = [(f'sku{i}', i) for i in range(50)]
+        assert Line.from_records(records, processes=2, chunksize=7) == \
+            [Line(*r) for r in records]
@@ -0,0 +1,125 @@
+from typing import Any
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from shapeless.frame import LiquidFrame, LiquidRow
+from shapeless.liquid import FrozenInstanceError, liquid
+
+
+@liquid
+class Trade:
+    symbol: str
+    price: float
+    size: int
+    ok: bool = True
+    meta: Any = None
+
+
+@liquid(frozen=True)
+class Point:
+    x: int
+    y: int
+
+
+def trades():
+    return LiquidFrame(Trade, [Trade("A", 10.5, 100), Trade("B", 3.0, 5),
+                               Trade("C", 7.25, 40, False, [1, 2])])
+
+
+class TestLiquidFrame:
+
+    def test_columns(self):
+        frame = trades()
+        assert len(frame) == 3
+        assert frame["price"].dtype == np.float64
+        assert frame["size"].dtype == np.int64
+        assert frame["ok"].dtype == bool
+        assert frame["symbol"].dtype == object
+        assert frame["meta"].tolist() == [None, None, [1, 2]]
+        with pytest.raises(KeyError):
+            frame["missing"]
+
+    def test_rows(self):
+        frame = trades()
+        row = frame[-1]
+        assert isinstance(row, LiquidRow)
+        assert row.symbol == "C" and type(row.size) is int
+        assert row == Trade("C", 7.25, 40, False, [1, 2])
+        assert repr(row) == repr(Trade("C", 7.25, 40, False, [1, 2]))
+        row.size = 41
+        assert frame["size"][2] == 41
+        assert [r.symbol for r in frame] == ["A", "B", "C"]
+        with pytest.raises(IndexError):
+            frame[3]
+        with pytest.raises(FrozenInstanceError):
+            LiquidFrame(Point, [Point(1, 2)])[0].x = 3
+
+    def test_append_grows_geometrically(self):
+        frame = LiquidFrame(Point)
+        capacities = set()
+        for i in range(1000):
+            frame.append(Point(i, -i))
+            capacities.add(frame._capacity)
+        assert len(frame) == 1000
+        assert sorted(capacities) == [16, 32, 64, 128, 256, 512, 1024]
+        assert frame["x"].sum() == sum(range(1000))
+
+    def test_filter_sort_take(self):
+        frame = trades()
+        big = frame[frame["size"] > 10].sort("price")
+        assert big["symbol"].tolist() == ["C", "A"]
+        assert frame.sort("price", reverse=True)["symbol"].tolist() == ["A", "C", "B"]
+        assert frame[1:]["symbol"].tolist() == ["B", "C"]
+        assert frame[[2, 0]]["symbol"].tolist() == ["C", "A"]
+        with pytest.raises(ValueError):
+            frame.filter([True])
+
+    def test_sort_is_stable(self):
+        frame = LiquidFrame(Point, [Point(1, 0), Point(0, 1), Point(1, 2), Point(0, 3)])
+        assert frame.sort("x")["y"].tolist() == [1, 3, 0, 2]
+        assert frame.sort("x", reverse=True)["y"].tolist() == [0, 2, 1, 3]
+        assert frame.sort(["x", "y"], reverse=True)["y"].tolist() == [2, 0, 3, 1]
+
+    def test_to_instances(self):
+        rows = [Trade("A", 10.5, 100), Trade("C", 7.25, 40, False, [1, 2])]
+        instances = LiquidFrame(Trade, rows).to_instances()
+        assert instances == rows
+        assert type(instances[0].size) is int and type(instances[0].ok) is bool
+        assert LiquidFrame(Point, [Point(1, 2)])[0].to_instance() == Point(1, 2)
+
+    def test_values_kept_exactly(self):
+        frame = LiquidFrame(Trade, [Trade("A", 1, 2 ** 70), Trade("B", 2.5, None)])
+        assert frame["size"].dtype == object
+        assert frame.to_instances()[0].size == 2 ** 70
+        assert frame[1].size is None
+        frame = LiquidFrame(Trade, [Trade("A", 1.0, True)])
+        assert frame[0].size is True
+        # Ints past 2**53 would be rounded by a float64 column.
+        frame = LiquidFrame(Trade, [Trade("A", 2 ** 53 + 1, 1)])
+        assert frame["price"].dtype == object
+        assert frame[0].price == 2 ** 53 + 1
+        frame = trades()
+        frame[0].price = 2 ** 53
+        assert frame["price"].dtype == np.float64
+        frame[1].price = -2 ** 53 - 1
+        assert frame["price"].dtype == object
+        assert frame[1].price == -2 ** 53 - 1
+        frame = LiquidFrame.from_columns(Trade, {"symbol": ["A"], "price": np.array([2 ** 60 + 1]),
+                                                "size": [1], "ok": [True], "meta": [None]})
+        assert frame[0].price == 2 ** 60 + 1
+
+    def test_from_columns(self):
+        frame = LiquidFrame.from_columns(Point, {"x": np.arange(3), "y": [5, 6, 7]})
+        assert frame.to_instances() == [Point(0, 5), Point(1, 6), Point(2, 7)]
+        with pytest.raises(ValueError):
+            LiquidFrame.from_columns(Point, {"x": [1], "y": [1, 2]})
+        with pytest.raises(TypeError):
+            LiquidFrame.from_columns(Point, {"x": [1]})
+
+    def test_wrong_rows(self):
+        with pytest.raises(TypeError):
+            LiquidFrame(object)
+        with pytest.raises(TypeError):
+            LiquidFrame(Point, [Trade("A", 1.0, 1)])
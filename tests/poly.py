@@ -1,6 +1,13 @@
+import enum
+import gc
+import pickle
+import tracemalloc
+
+from typing import Dict, List, Literal, Optional, Set, Union
+
 import pytest
 
-from shapeless.main import Poly
+from shapeless.main import InternTable, Poly, intern_table, shapeless_array, type_cache
 
 
 class TestPoly:
@@ -12,6 +19,29 @@ class TestPoly:
         p = Poly("hello")
         assert p.determine() is str
 
+    def test_determine_shared_cache(self):
+        type_cache.invalidate()
+        type_cache.reset_stats()
+        Poly(1).determine()
+        Poly(2).determine()
+        stats = type_cache.stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+        assert int in type_cache
+
+    def test_determine_after_extend(self):
+        class MyClass:
+            pass
+
+        p = Poly(5)
+        assert p.determine() is int
+        p.extend(MyClass)
+        assert issubclass(p.determine(), MyClass)
+        p.extend(MyClass)
+        assert issubclass(p.determine(), MyClass)
+        assert len([t for t in type_cache._entries
+                    if getattr(t, '__poly_extension__', False)]) == 1
+
     def test_select(self):
         p = Poly(5)
         assert p.select(int) is int
@@ -37,11 +67,175 @@ class TestPoly:
         with pytest.raises(TypeError):
             p.validate(int)
 
+    def test_validate_generics(self):
+        assert Poly([1, 2]).validate(List[int])
+        assert Poly({"a": 1.0}).validate(Dict[str, float])
+        assert Poly(None).validate(Optional[int])
+        assert Poly("a").validate(Union[int, str])
+        assert Poly("r").validate(Literal["r", "w"])
+
+        with pytest.raises(TypeError):
+            Poly([1, "2"]).validate(List[int])
+        with pytest.raises(TypeError):
+            Poly(True).validate(Literal[1])
+
+    def test_validate_tuple_of_classes(self):
+        assert Poly(1).validate((int, str))
+        assert Poly(b"x").validate((int, (str, bytes)))
+        assert Poly([1]).validate((List[int], None))
+        with pytest.raises(TypeError):
+            Poly(1.5).validate((int, str))
+
+    def test_validators_bounded(self, monkeypatch):
+        from shapeless import typecheck
+
+        monkeypatch.setattr(typecheck, '_MAX_VALIDATORS', 8)
+        for n in range(20):
+            assert Poly(n).validate(Literal[n])
+        assert len(typecheck._validators) <= 8
+
+    def test_validate_sample(self):
+        data = list(range(100_000)) + ["x"]
+        with pytest.raises(TypeError):
+            Poly(data).validate(List[int])
+        assert Poly(list(range(100_000))).validate(List[int], sample=100)
+
+    def test_validate_sample_unordered(self):
+        # The bad key comes last, so the first 5 never include it; a
+        # random sample finds it sooner or later.
+        data = {i: i for i in range(10)}
+        data["x"] = 0
+        values = set(range(10)) | {"x"}
+        for annotation, value in ((Dict[int, int], data), (Set[int], values)):
+            for _ in range(200):
+                try:
+                    Poly(value).validate(annotation, sample=5)
+                except TypeError:
+                    break
+            else:
+                pytest.fail(f"sample never reached the bad item of {annotation}")
+
+    def test_validate_many(self):
+        failures = Poly.validate_many([1, "a", None, 2], Optional[int])
+        assert failures == [(1, "a")]
+
+    @pytest.mark.parametrize('workers', [0, 2])
+    def test_map_shift(self, workers):
+        values = (str(i) if i % 5 else 'x' for i in range(1, 26))
+        failures = []
+        shifted = list(Poly.map_shift(values, int, workers=workers, chunksize=4,
+                                      failures=failures, fill=-1))
+        assert shifted == [i if i % 5 else -1 for i in range(1, 26)]
+        assert failures == [(i - 1, 'x') for i in range(5, 26, 5)]
+
+    def test_map_shift_raises_in_order(self):
+        shifted = []
+        with pytest.raises(TypeError, match="Cannot shape shift x"):
+            shifted.extend(Poly.map_shift(['1', '2', '3', 'x', '5'], int,
+                                          workers=2, chunksize=2))
+        assert shifted == [1, 2, 3]
+
+    @pytest.mark.parametrize('workers', [0, 2])
+    def test_map_validate(self, workers):
+        values = [[1], [2, 'a'], [], None, [3]] * 3
+        failures = Poly.map_validate(values, List[int], workers=workers, chunksize=4)
+        assert failures == [(i, values[i]) for i in (1, 3, 6, 8, 11, 13)]
+        assert Poly.map_validate(values, list, workers=workers) == [(3, None), (8, None), (13, None)]
+
     def test_add_alias(self):
         p = Poly("5")
         p.add_alias("num", int)
         assert p.alias_mapping["num"] is int
 
+    def test_lazy_alias_mapping_and_lock(self):
+        p = Poly("5")
+        assert p._alias_mapping is None
+        assert p._lock is None
+        assert p.lock is p.lock
+        assert not hasattr(p, '__dict__')
+
+    def test_footprint(self):
+        data = object()
+        n = 10_000
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            polys = [Poly(data) for _ in range(n)]
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        # One slotted object per Poly plus the list slot holding it.
+        assert allocated / n <= 96
+        assert len(polys) == n
+
+    def test_of_interns_immutable_values(self):
+        class Color(enum.Enum):
+            RED = 1
+
+        assert Poly.of(5) is Poly.of(5)
+        assert Poly.of("buy") is Poly.of("buy")
+        assert Poly.of(Color.RED) is Poly.of(Color.RED)
+        assert Poly.of(None) is Poly.of(None)
+        # Equal values of different types are interned apart.
+        assert Poly.of(1) is not Poly.of(True)
+        assert type(Poly.of(True).data) is bool
+        assert isinstance(Poly.of(5), Poly)
+        assert Poly.of(5).determine() is int
+        assert pickle.loads(pickle.dumps(Poly.of(5))) is Poly.of(5)
+
+    def test_of_does_not_intern_mutable_values(self):
+        intern_table.reset_stats()
+        data = [1, 2]
+        first, second = Poly.of(data), Poly.of(data)
+        assert first is not second and first.data is data
+        first.extend(type('Tag', (), {}))
+        for value in (1.5, -0.0, (1, [2]), "x" * 1000):
+            assert Poly.of(value) is not Poly.of(value)
+            assert Poly.of(value).data is value
+        assert intern_table.stats()['uninternable'] == 14
+
+    def test_of_is_read_only(self):
+        shared = Poly.of("shared")
+        with pytest.raises(AttributeError):
+            shared.data = "changed"
+        with pytest.raises(AttributeError):
+            shared.extend(type('Tag', (), {}))
+        with pytest.raises(AttributeError):
+            shared.deserialize(Poly("other").serialize())
+        with pytest.raises(AttributeError):
+            shared.add_alias("text", str)
+        assert shared.data == "shared" and type(shared.data) is str
+        assert dict(shared.alias_mapping) == {}
+        assert shared.lock is shared.lock
+        # Poly() still gives a Poly of your own.
+        own = Poly("shared")
+        own.extend(type('Tag', (), {}))
+        assert Poly.of("shared").data == "shared"
+
+    def test_intern_table_bounded_and_weak(self):
+        table = InternTable(maxsize=2)
+        kept = table.intern("a")
+        table.intern("b")
+        table.intern("c")
+        table.intern("d")
+        assert len(table) == 2 and "a" not in table
+        assert table.stats()['evictions'] == 2
+        # "a" is still referenced, so it comes back as the same object...
+        assert table.intern("a") is kept
+        assert table.stats()['revived'] == 1
+        # ...while "b" was only held by the table.
+        gc.collect()
+        assert ("b" in table) is False and not table._dropped.get((str, "b"))
+        table.clear()
+        assert len(table) == 0 and table.intern("a") is not kept
+
+    def test_shapeless_array_does_not_intern(self):
+        intern_table.clear()
+        values = ["buy", "sell", 1, [1]] * 3
+        assert shapeless_array(*values) == values
+        assert len(intern_table) == 0
+
     def test_annotate(self):
         p = Poly("5")
         p.annotate(int)
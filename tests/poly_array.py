@@ -0,0 +1,79 @@
+from typing import List, Optional, Union
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from shapeless.array import PolyArray
+
+
+class TestPolyArray:
+
+    def test_determine(self):
+        assert PolyArray(["a", "b"]).determine() is str
+        assert PolyArray([1, 2]).determine() is int
+        assert PolyArray([1, "a"]).determine() is object
+
+    def test_shift(self):
+        result = PolyArray(["1", "2", "3"]).shift(int)
+        assert result.ok
+        assert result.values.tolist() == [1, 2, 3]
+
+    def test_shift_failures(self):
+        result = PolyArray(["1", "x", "3", "y"]).shift(float)
+        assert result.failed.tolist() == [False, True, False, True]
+        assert result.indices.tolist() == [1, 3]
+        assert result.values[0] == 1.0
+        assert np.isnan(result.values[1])
+
+    def test_shift_none_elements(self):
+        result = PolyArray([1, None, 'x', '4']).shift(int)
+        assert result.failed.tolist() == [False, True, True, False]
+        assert result.values[[0, 3]].tolist() == [1, 4]
+        result = PolyArray([1.5, None]).shift(float)
+        assert result.indices.tolist() == [1] and np.isnan(result.values[1])
+        with pytest.raises(TypeError, match="Cannot shape shift None"):
+            PolyArray([None]).shift(int, strict=True)
+
+    def test_shift_strict(self):
+        with pytest.raises(TypeError, match="Cannot shape shift x"):
+            PolyArray(["1", "x"]).shift(int, strict=True)
+
+    def test_shift_matches_poly(self):
+        result = PolyArray(["", "False"]).shift(bool)
+        assert result.values.tolist() == [False, True]
+
+        result = PolyArray(["99999999999999999999999"]).shift(int)
+        assert result.values.tolist() == [99999999999999999999999]
+
+    def test_shift_out_of_range(self):
+        for data in ([300, 1], [300.0, 1.0], ["300", "1"], [300, "1"]):
+            result = PolyArray(data).shift(np.int8)
+            assert result.indices.tolist() == [0], data
+            assert result.values[1] == 1
+        assert PolyArray([-1, 2]).shift(np.uint8).indices.tolist() == [0]
+        assert PolyArray([127.9, -128.9]).shift(np.int8).values.tolist() == [127, -128]
+        with pytest.raises(TypeError, match="Cannot shape shift 300"):
+            PolyArray([300]).shift(np.int8, strict=True)
+
+    def test_shift_str_bytes_matches_poly(self):
+        assert PolyArray(["ab"]).shift(bytes).indices.tolist() == [0]
+        assert PolyArray(["ab", b"x"]).shift(bytes).values[1] == b"x"
+        assert PolyArray([b"ab"]).shift(str).values.tolist() == ["b'ab'"]
+
+    def test_validate_annotations(self):
+        result = PolyArray([[1], ["a"], None]).validate(Optional[List[int]])
+        assert result.indices.tolist() == [1]
+        assert PolyArray([1, 2]).validate(Union[int, str]).ok
+        assert PolyArray([1, "a"]).validate((int, str)).ok
+        with pytest.raises(TypeError):
+            PolyArray([1.5]).validate(Optional[int], strict=True)
+
+    def test_validate(self):
+        result = PolyArray([1, "a", 2]).validate(int)
+        assert result.indices.tolist() == [1]
+
+        assert PolyArray(["a", "b"]).validate(str).ok
+
+        with pytest.raises(TypeError):
+            PolyArray(["a", "b"]).validate(int, strict=True)
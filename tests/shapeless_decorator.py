@@ -17,3 +17,38 @@ def test_shapeless():
     assert isinstance(obj.y, Poly)
     assert isinstance(obj.add, object)
 
+
+
+@shapeless(verbose=True)
+class Descriptors:
+    def add(self, a, b=1):
+        """Add a and b."""
+        return a + b
+
+    @staticmethod
+    def double(a):
+        return a * 2
+
+    @classmethod
+    def make(cls, a):
+        return cls, a
+
+
+def test_shapeless_descriptors():
+    obj = Descriptors()
+    assert obj.add(1) == 2
+    assert obj.add(1, b=3) == 4
+    assert Descriptors.double(2) == 4
+    assert obj.double(2) == 4
+    assert Descriptors.make(1) == (Descriptors, 1)
+    assert Descriptors.add.__name__ == "add"
+    assert Descriptors.add.__doc__ == "Add a and b."
+
+
+def test_shapeless_no_op_keeps_methods():
+    def add(self, a, b):
+        return a + b
+
+    cls = shapeless(type("Plain", (), {"add": add}))
+    assert cls.__dict__["add"] is add
+    assert cls().add(1, 2) == 3
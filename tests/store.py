@@ -0,0 +1,118 @@
+import io
+import os
+
+import pytest
+
+from shapeless import Poly, PolyStore
+from shapeless.store import BUFFER_THRESHOLD
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'values.plys')
+
+
+VALUES = [None, 1, 'two', [3.0, (4,)], {'five': b'6'}]
+
+
+class TestPolyStore:
+
+    def test_round_trip(self, path):
+        with PolyStore(path, 'w') as store:
+            assert store.append(Poly(VALUES[0])) == 0
+            store.extend(VALUES[1:])
+            assert len(store) == len(VALUES)
+            assert store[3] == VALUES[3]
+            store.append('more')
+            assert store[-1] == 'more'
+        with PolyStore(path, 'r') as store:
+            assert [store[i] for i in range(len(store))] == VALUES + ['more']
+            assert list(store) == VALUES + ['more']
+            with pytest.raises(IndexError):
+                store[len(store)]
+            with pytest.raises(io.UnsupportedOperation):
+                store.append(1)
+
+    def test_modes(self, path):
+        with PolyStore(path) as store:
+            store.extend(VALUES)
+        with PolyStore(path, 'a') as store:
+            store.append(6)
+            assert len(store) == len(VALUES) + 1
+        with PolyStore(path, 'w') as store:
+            assert len(store) == 0
+        with pytest.raises(ValueError):
+            PolyStore(path, 'x')
+        with open(path, 'wb') as f:
+            f.write(b'not a store')
+        with pytest.raises(ValueError, match='not a PolyStore'):
+            PolyStore(path, 'r')
+
+    def test_files_closed_on_failed_open(self, path, monkeypatch):
+        with PolyStore(path) as store:
+            store.extend(VALUES)
+        opened = []
+        recover = PolyStore._recover
+
+        def failing_recover(store):
+            recover(store)
+            opened.append(store)
+            raise OSError('disk gone')
+
+        monkeypatch.setattr(PolyStore, '_recover', failing_recover)
+        with pytest.raises(OSError, match='disk gone'):
+            PolyStore(path, 'a')
+        store, = opened
+        assert store._file is store._writer is store._index_writer is None
+        assert store._map is None
+
+    def test_buffers(self, path):
+        big = bytes(range(256)) * (BUFFER_THRESHOLD // 256)
+        with PolyStore(path, 'w') as store:
+            store.extend([big, bytearray(big), b'small'])
+        with PolyStore(path, 'r') as store:
+            assert store[0] == big and type(store[0]) is bytes
+            assert type(store[1]) is bytearray
+            view = store.buffer(0)
+            assert view.readonly and view == big
+            view.release()
+            with pytest.raises(TypeError):
+                store.buffer(2)
+            assert list(store) == [big, bytearray(big), b'small']
+
+    def test_pickle_is_opt_in(self, path):
+        np = pytest.importorskip('numpy')
+        array = np.arange(1000.0).reshape(10, 100)
+        with PolyStore(path, 'w') as store:
+            with pytest.raises(TypeError):
+                store.append(array)
+        with PolyStore(path, 'w', allow_pickle=True) as store:
+            store.extend([array, 'after'])
+        with PolyStore(path, 'r') as store:
+            assert store[1] == 'after'
+            with pytest.raises(ValueError, match='allow_pickle'):
+                store[0]
+        with PolyStore(path, 'r', allow_pickle=True) as store:
+            loaded = store[0]
+            assert (loaded == array).all()
+            # Mapped from the file, not copied.
+            assert not loaded.flags.writeable
+            assert loaded.ctypes.data % 64 == 0
+            assert (list(store)[0] == array).all()
+
+    def test_recovery(self, path):
+        with PolyStore(path, 'w') as store:
+            store.extend(VALUES)
+        # A crash that lost the last index entries and wrote half a record.
+        os.truncate(path + '.idx', os.path.getsize(path + '.idx') - 16)
+        with open(path, 'ab') as f:
+            f.write(b'\x10\x00\x00\x00\x00ab')
+        with PolyStore(path, 'r') as store:
+            assert list(store) == VALUES
+            assert store[-1] == VALUES[-1]
+        with PolyStore(path, 'a') as store:
+            assert len(store) == len(VALUES)
+            store.append('next')
+        os.remove(path + '.idx')
+        with PolyStore(path, 'r') as store:
+            assert [store[i] for i in range(len(store))] == VALUES + ['next']